@@ -1,9 +1,11 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404  # Needed for PinMessageView
 from users.models import User
+from users.audiences import audience_user_ids, bulk_add_members, is_valid_audience
 from rest_framework import generics
 
 from .models import ChatRoom, Message
@@ -185,28 +187,30 @@ class CreateChatRoomView(APIView):
 
     def post(self, request):
         participant_ids = request.data.get('participants', [])
+        # Optional audience keys (e.g. "MEMBER", "EVENT_CREW:12"), see users/audiences.py
+        audiences = request.data.get('audiences', [])
         name = request.data.get('name', 'New Chat')
         # Default type is 'GENERAL' unless specified (e.g., CREW)
         room_type = request.data.get('type', 'GENERAL') 
 
-        if not participant_ids:
+        if not participant_ids and not audiences:
              return Response({'error': 'Select at least one participant.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create Room
-        chat = ChatRoom.objects.create(name=name, type=room_type)
-        
-        # Add Creator (Admin)
-        chat.participants.add(request.user)
-        
-        # Add Selected Users
-        for uid in participant_ids:
-            try:
-                user = User.objects.get(pk=uid)
-                chat.participants.add(user)
-            except User.DoesNotExist:
-                continue
-        
-        return Response({'id': chat.id, 'message': 'Chat created'}, status=status.HTTP_201_CREATED)
+        invalid = [key for key in audiences if not is_valid_audience(key)]
+        if invalid:
+            return Response({'error': f"Unknown audience(s): {', '.join(invalid)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Create Room
+            chat = ChatRoom.objects.create(name=name, type=room_type)
+
+            # Creator (Admin) + selected users + audiences, resolved in one query
+            # and inserted with one bulk INSERT into the through-table
+            member_ids = list(audience_user_ids(audiences, participant_ids))
+            member_ids.append(request.user.id)
+            bulk_add_members(ChatRoom.participants, chat.id, member_ids)
+
+        return Response({'id': chat.id, 'message': 'Chat created', 'members': len(set(member_ids))}, status=status.HTTP_201_CREATED)
 
 class DeleteChatRoomView(generics.DestroyAPIView):
     """
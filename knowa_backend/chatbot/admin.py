@@ -1,8 +1,21 @@
 from django.contrib import admin
-from .models import FAQ
+from .models import FAQ, ChatSession, ChatTurn
 
 @admin.register(FAQ)
 class FAQAdmin(admin.ModelAdmin):
     list_display = ('question', 'target_role', 'order')
     list_filter = ('target_role',)
-    search_fields = ('question', 'answer')
\ No newline at end of file
+    search_fields = ('question', 'answer')
+
+
+class ChatTurnInline(admin.TabularInline):
+    model = ChatTurn
+    extra = 0
+    readonly_fields = ('question', 'reply', 'source', 'created_at')
+
+
+@admin.register(ChatSession)
+class ChatSessionAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'turn_count', 'last_active_at')
+    readonly_fields = ('key', 'summary', 'turn_count', 'unsummarized_turns')
+    inlines = [ChatTurnInline]
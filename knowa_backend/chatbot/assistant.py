@@ -0,0 +1,97 @@
+# chatbot/assistant.py
+# The KNOWA support assistant behind /api/users/chatbot/.
+#   1. Look the question up in the FAQ (chatbot/retrieval.py).
+#   2. A confident match is answered straight from the FAQ; no LLM call.
+#   3. Otherwise reuse a cached Gemini reply to the same (or a near-identical)
+#      question asked with the same events/FAQ context
+#      (chatbot/response_cache.py).
+#   4. Otherwise Gemini is asked, with the manual, the upcoming events and
+#      only the top few FAQs in the prompt (chatbot/context.py).
+import time
+
+from django.conf import settings
+
+from . import llm as gemini
+from .coalescing import flight_key, llm_flights
+from .context import build_prompt, events_section
+from .faq_index import audience_for
+from .llm import MissingAPIKey  # re-exported for callers of answer_question
+from .response_cache import context_key, estimate_tokens, response_cache
+from .retrieval import get_retriever
+
+DIRECT_ANSWER_THRESHOLD = 0.45  # retrieval confidence needed to skip the LLM
+TOP_K = 3                       # FAQs passed to the LLM otherwise
+
+
+def gemini_generate(prompt):
+    """Default LLM: one Gemini call on the shared client. Returns the reply text."""
+    return gemini.generate(prompt)
+
+
+def prepare_answer(question, user=None, threshold=DIRECT_ANSWER_THRESHOLD, k=TOP_K, use_cache=True,
+                   history=()):
+    """
+    Everything before the LLM call. Returns the answer dict of
+    answer_question() when the FAQ or the reply cache can answer; otherwise
+    the same dict with 'reply' None and 'prompt'/'context' set for the LLM.
+    `history` is the conversation so far (memory.history_blocks()). A
+    prompt with history is personal: it is never cached or shared, and its
+    'context' is None.
+    """
+    audience = audience_for(user)
+    matches = get_retriever(audience).search(question, k=k)
+    confidence = matches[0][1] if matches else 0.0
+    answer = {'reply': None, 'source': None, 'faq_id': None, 'confidence': confidence,
+              'prompt': None, 'context': None}
+    if matches and confidence >= threshold:
+        faq = matches[0][0]
+        answer.update(reply=faq.answer, source='faq', faq_id=faq.id)
+        return answer
+
+    events_text = events_section(audience)
+    if not history:
+        answer['context'] = context_key(audience, events_text)
+    if use_cache and answer['context']:
+        cached = response_cache.lookup(question, answer['context'])
+        if cached is not None:
+            answer.update(reply=cached, source='cache')
+            return answer
+
+    answer['prompt'] = build_prompt(question, [faq for faq, _ in matches], events_text, history=history)
+    return answer
+
+
+def remember_reply(question, answer, reply, latency):
+    """Stores an LLM reply in the response cache (unless the prompt was personal)."""
+    if answer['context'] is None:
+        return
+    response_cache.store(
+        question, answer['context'], reply,
+        latency=latency,
+        tokens=estimate_tokens(answer['prompt']) + estimate_tokens(reply),
+    )
+
+
+def answer_question(question, user=None, llm=None, threshold=DIRECT_ANSWER_THRESHOLD, k=TOP_K,
+                    use_cache=True, history=()):
+    """
+    Returns {'reply', 'source' ('faq', 'cache' or 'llm'), 'faq_id', 'confidence',
+    'prompt', 'context'}.
+    `llm` is any callable taking the prompt and returning text (tests and the
+    evaluation command pass a stub); it defaults to Gemini.
+    """
+    answer = prepare_answer(question, user, threshold, k, use_cache, history)
+    if answer['reply'] is not None:
+        return answer
+
+    # Identical questions asked at the same moment share one LLM call
+    started = time.monotonic()
+    reply = llm_flights.do(
+        flight_key(question, answer['context']),
+        lambda: (llm or gemini_generate)(answer['prompt']),
+        timeout=settings.GEMINI_TIMEOUT + 5,
+    )
+    if use_cache:
+        remember_reply(question, answer, reply, time.monotonic() - started)
+    answer.update(reply=reply, source='llm')
+    return answer
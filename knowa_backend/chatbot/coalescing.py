@@ -0,0 +1,109 @@
+# chatbot/coalescing.py
+# Single-flight: concurrent identical chatbot questions share one LLM call.
+# The first request for a key (the leader) makes the call; requests for the
+# same key that arrive while it is running wait for its result instead of
+# calling Gemini again. Later repeats are served by the response cache.
+#
+# Keys are (context key, normalized question), the same identity the reply
+# cache uses, so only questions that would get the same prompt are merged.
+import asyncio
+import threading
+import weakref
+
+from . import metrics
+from .response_cache import normalize
+
+
+def flight_key(question, context):
+    """None (never shared) for personal prompts and stop-word-only questions."""
+    normalized = normalize(question)
+    return (context, normalized) if normalized and context else None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """For sync (thread-per-request) callers."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """fn() once per key at a time; concurrent callers with the same key get its result."""
+        if key is None:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr('coalesced_requests')
+            if not call.done.wait(timeout):
+                raise TimeoutError
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr('llm_calls')
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    For the async streaming view. The leader streams its reply as usual;
+    followers wait for the whole reply and get it in one piece.
+    Futures belong to an event loop, so flights are kept per loop.
+    """
+
+    def __init__(self):
+        self._flights = weakref.WeakKeyDictionary()  # loop -> {key: Future}
+
+    def join(self, key):
+        """(future, is_leader). A leader must call finish() or fail() exactly once."""
+        loop = asyncio.get_running_loop()
+        flights = self._flights.setdefault(loop, {})
+        if key is not None and key in flights:
+            metrics.incr('coalesced_requests')
+            return flights[key], False
+        future = loop.create_future()
+        if key is not None:
+            flights[key] = future
+        metrics.incr('llm_calls')
+        return future, True
+
+    def _pop(self, key, future):
+        flights = self._flights.get(asyncio.get_running_loop(), {})
+        if key is not None and flights.get(key) is future:
+            del flights[key]
+
+    def finish(self, key, future, reply):
+        self._pop(key, future)
+        if not future.done():
+            future.set_result(reply)
+
+    def fail(self, key, future, error):
+        self._pop(key, future)
+        if not future.done():
+            future.set_exception(error)
+            future.exception()  # mark as retrieved when nobody was waiting
+
+
+llm_flights = SingleFlight()
+stream_flights = AsyncSingleFlight()
@@ -0,0 +1,153 @@
+# chatbot/context.py
+# Builds the prompt the chatbot sends to Gemini.
+#
+#   [static prefix]   instructions + app manual; a constant string
+#   [events]          digest of the next events for the caller's audience
+#   [conversation]    summary + recent turns of this chat (chatbot/memory.py)
+#   [FAQ]             the few FAQs retrieval picked for this question
+#   [question]
+#
+# The events digest is built once per 'events' namespace version (bumped on
+# every Event save/delete, see events/signals.py) and kept in the shared
+# cache, so a chatbot call normally runs no event queries. The parts that are
+# the same for everyone come first, which keeps the start of the prompt
+# identical between calls.
+#
+# Every section is fitted into a token budget (CHATBOT_PROMPT_TOKEN_BUDGET),
+# whole lines/FAQs at a time, so prompts stay bounded as sources are added.
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from events.models import Event
+from knowa_server.caching import cache_get_or_build, versioned_key
+from .faq_index import STAFF
+from .response_cache import estimate_tokens
+
+EVENTS_IN_PROMPT = 3      # events shown to the LLM
+DIGEST_SIZE = 10          # events kept in the digest, so it survives a few of them starting
+DIGEST_TIMEOUT = 10 * 60  # seconds; the digest also changes with the clock
+MAX_QUESTION_TOKENS = 300
+
+APP_MANUAL = (
+    "APP INSTRUCTIONS (KNOWA MANUAL):\n"
+    "1. REGISTRATION: Click 'Sign Up' on the Login screen.\n"
+    "2. MEMBERSHIP: Status starts as 'Pending'. Once approved by Admin, pay fees to become a 'Member'.\n"
+    "3. DONATIONS: Use the blue 'Donate' button on the Dashboard.\n"
+    "4. EVENTS: Check the 'Events' tab. Online events have Zoom/Meet links.\n"
+    "5. MEETINGS: Admins create meetings; see them in 'Calendar'.\n"
+    "6. PASSWORD: Use 'Forgot Password?' on the login screen to get a TAC code.\n"
+)
+
+PROMPT_PREFIX = (
+    "You are the friendly AI support for KNOWA app. "
+    "Answer using the manual, FAQ and event list below. "
+    "If not sure, say 'Contact admin@knowa.org'.\n\n"
+    f"{APP_MANUAL}\n"
+    "---------------------\n"
+)
+
+
+# --- 1. EVENTS DIGEST ---
+
+def _build_digest(audience):
+    """[(start_time, line)] for the next DIGEST_SIZE events this audience may hear about."""
+    if audience == STAFF:
+        # Staff also see drafts, and how full each event is
+        events = (
+            Event.objects
+            .filter(status__in=[Event.EventStatus.PUBLISHED, Event.EventStatus.DRAFT])
+            .upcoming()
+            .annotate(
+                participant_count=Count('participants', distinct=True),
+                crew_count=Count('crew', distinct=True),
+            )
+            .only('title', 'start_time', 'location', 'is_online', 'status',
+                  'capacity_participants', 'capacity_crew')[:DIGEST_SIZE]
+        )
+    else:
+        events = (
+            Event.objects.published().upcoming()
+            .only('title', 'start_time', 'location', 'is_online')[:DIGEST_SIZE]
+        )
+
+    digest = []
+    for event in events:
+        place = 'Online' if event.is_online else event.location
+        line = f"- {event.title} on {event.start_time.strftime('%b %d, %I:%M %p')} ({place})"
+        if audience == STAFF:
+            if event.status == Event.EventStatus.DRAFT:
+                line = f"- [DRAFT] {line[2:]}"
+            line += (
+                f" - participants {event.participant_count}/{event.capacity_participants},"
+                f" crew {event.crew_count}/{event.capacity_crew}"
+            )
+        digest.append((event.start_time, line))
+    return digest
+
+
+def events_digest(audience):
+    """The cached digest; rebuilt after any event change or every DIGEST_TIMEOUT."""
+    # Guests and members see the same (public) events
+    scope = 'staff' if audience == STAFF else 'public'
+    key = versioned_key('events', 'chatbot-digest', scope)
+    return cache_get_or_build('events', key, lambda: _build_digest(audience), DIGEST_TIMEOUT)
+
+
+def events_section(audience, now=None):
+    """'UPCOMING EVENTS:' text for the prompt."""
+    now = now or timezone.now()
+    lines = [line for start, line in events_digest(audience) if start >= now][:EVENTS_IN_PROMPT]
+    if not lines:
+        return "UPCOMING EVENTS:\nNo upcoming events found.\n"
+    return "UPCOMING EVENTS:\n" + "".join(line + "\n" for line in lines)
+
+
+# --- 2. PROMPT ASSEMBLY ---
+
+def _fit(blocks, budget):
+    """The blocks (kept in order) that fit in `budget` tokens, and the tokens they use."""
+    kept, used = [], 0
+    for block in blocks:
+        cost = estimate_tokens(block)
+        if used + cost <= budget:
+            kept.append(block)
+            used += cost
+    return kept, used
+
+
+def build_prompt(question, faqs, events_text, budget=None, history=()):
+    """
+    The full prompt. `faqs` are best first; `events_text` comes from
+    events_section(); `history` is memory.history_blocks(), oldest first.
+    What doesn't fit the budget is left out: the lowest ranked FAQs first,
+    then the oldest conversation, then the later events.
+    """
+    budget = budget or settings.CHATBOT_PROMPT_TOKEN_BUDGET
+    question = question[:MAX_QUESTION_TOKENS * 4]
+    tail = f"---------------------\nUSER QUESTION: {question}"
+    remaining = budget - estimate_tokens(PROMPT_PREFIX) - estimate_tokens(tail)
+
+    faq_blocks, used = _fit([f"Q: {faq.question}\nA: {faq.answer}\n" for faq in faqs], remaining)
+    remaining -= used
+
+    history_text = ""
+    if history:
+        header = "CONVERSATION SO FAR:\n"
+        # Newest turns matter most for a follow-up question
+        kept, used = _fit(list(reversed(history)), remaining - estimate_tokens(header))
+        if kept:
+            history_text = header + "".join(reversed(kept)) + "\n"
+            remaining -= used + estimate_tokens(header)
+
+    header, *event_lines = events_text.splitlines(keepends=True)
+    event_lines, _ = _fit(event_lines, remaining - estimate_tokens(header))
+
+    faq_text = "RELEVANT FAQ:\n" + "".join(faq_blocks) if faq_blocks else ""
+    return (
+        f"{PROMPT_PREFIX}"
+        f"{header}{''.join(event_lines)}\n"
+        f"{history_text}"
+        f"{faq_text}"
+        f"{tail}"
+    )
@@ -0,0 +1,112 @@
+# chatbot/faq_index.py
+# Process-local FAQ index.
+# FAQs only change through the admin or load_faqs.py, so the whole table is
+# read once, split into the three audiences the FAQ list serves, and each
+# audience is kept as ready-to-send JSON bytes.
+#
+# Invalidation: FAQ save/delete signals clear the index in this process and
+# bump the shared 'faqs' namespace (chatbot/signals.py). The index itself is
+# versioned by the table (row count, newest id, latest updated_at), checked
+# again whenever the namespace moves and at least every RECHECK_SECONDS, so
+# other processes catch up even when the shared cache is per-process memory
+# and never sees the bump.
+import threading
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from django.db.models import Count, Max
+
+from knowa_server.caching import namespace_version
+from .models import FAQ
+
+RECHECK_SECONDS = 5
+
+GUEST = 'guest'
+MEMBER = 'member'
+STAFF = 'staff'
+
+# Which target_role values each audience sees
+AUDIENCE_ROLES = {
+    GUEST: {'all'},
+    MEMBER: {'all', 'participant'},
+    STAFF: {'all', 'organizer'},
+}
+
+_index = None  # {'version', 'namespace', 'checked_at', 'faqs': {audience: [FAQ]}, 'json': {audience: bytes}}
+_lock = threading.Lock()
+
+
+def audience_for(user):
+    if not user or not user.is_authenticated:
+        return GUEST
+    if user.is_staff or user.is_superuser:
+        return STAFF
+    return MEMBER
+
+
+def _build(version):
+    from .serializers import FAQSerializer
+
+    faqs = {audience: [] for audience in AUDIENCE_ROLES}
+    for faq in FAQ.objects.order_by('order', 'id'):
+        for audience, roles in AUDIENCE_ROLES.items():
+            if faq.target_role in roles:
+                faqs[audience].append(faq)
+
+    renderer = JSONRenderer()
+    return {
+        'version': version,
+        'faqs': faqs,
+        'json': {
+            audience: renderer.render(FAQSerializer(items, many=True).data)
+            for audience, items in faqs.items()
+        },
+    }
+
+
+def table_version():
+    """Changes whenever an FAQ is added, edited or deleted."""
+    stats = FAQ.objects.aggregate(count=Count('pk'), last_id=Max('pk'), last_change=Max('updated_at'))
+    return (stats['count'], stats['last_id'], stats['last_change'])
+
+
+def _is_fresh(index, namespace):
+    return (
+        index is not None
+        and index['namespace'] == namespace
+        and time.monotonic() - index['checked_at'] < RECHECK_SECONDS
+    )
+
+
+def get_index():
+    global _index
+    namespace = namespace_version('faqs')
+    index = _index
+    if _is_fresh(index, namespace):
+        return index
+    with _lock:
+        if _is_fresh(_index, namespace):
+            return _index
+        version = table_version()
+        if _index is not None and _index['version'] == version:
+            # Nothing changed; the same index is good for another interval
+            _index = dict(_index, namespace=namespace, checked_at=time.monotonic())
+        else:
+            _index = dict(_build(version), namespace=namespace, checked_at=time.monotonic())
+        return _index
+
+
+def faqs_for(audience):
+    """FAQ instances an audience can see, in display order."""
+    return get_index()['faqs'][audience]
+
+
+def faq_json_for(audience):
+    """Pre-rendered JSON body of the FAQ list for an audience."""
+    return get_index()['json'][audience]
+
+
+def clear_faq_index():
+    global _index
+    _index = None
@@ -0,0 +1,124 @@
+# chatbot/llm.py
+# One shared Gemini client per process.
+# genai.Client keeps pooled HTTP connections (sync and async), so it is built
+# once instead of per request. Every call has a timeout, and streaming calls
+# also get an overall deadline and a per-process concurrency limit so slow
+# Gemini responses can't tie up every worker.
+import asyncio
+import threading
+import weakref
+
+from django.conf import settings
+
+from . import metrics
+
+GEMINI_MODEL = 'gemini-2.5-flash'
+
+_client = None
+_client_lock = threading.Lock()
+
+# asyncio.Semaphore belongs to one event loop; keep one per loop
+_semaphores = weakref.WeakKeyDictionary()
+
+
+class MissingAPIKey(Exception):
+    pass
+
+
+class LLMBusy(Exception):
+    """Every LLM slot in this process stayed taken for the whole queue timeout."""
+
+
+def get_client():
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            from google import genai
+            from google.genai import types
+
+            api_key = getattr(settings, 'GEMINI_API_KEY', None)
+            if not api_key:
+                raise MissingAPIKey('Missing API Key')
+            # GEMINI_BASE_URL points the client at another server (e.g. the
+            # fake_llm_server command for local testing)
+            http_options = types.HttpOptions(
+                base_url=settings.GEMINI_BASE_URL or None,
+                timeout=int(settings.GEMINI_TIMEOUT * 1000),  # milliseconds
+            )
+            _client = genai.Client(api_key=api_key, http_options=http_options)
+    return _client
+
+
+def reset_client():
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def generate(prompt):
+    """Blocking call: the full reply text."""
+    response = get_client().models.generate_content(model=GEMINI_MODEL, contents=prompt)
+    return response.text
+
+
+def _semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.CHATBOT_MAX_CONCURRENT_STREAMS)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def stream(prompt, deadline=None):
+    """
+    Async generator of reply text chunks.
+    Raises LLMBusy if no slot frees up within CHATBOT_QUEUE_TIMEOUT, and
+    TimeoutError once `deadline` seconds (default CHATBOT_STREAM_DEADLINE)
+    have passed since the call started.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = deadline or settings.CHATBOT_STREAM_DEADLINE
+    ends_at = loop.time() + deadline
+
+    semaphore = _semaphore()
+    queued_at = loop.time()
+    try:
+        await asyncio.wait_for(semaphore.acquire(), settings.CHATBOT_QUEUE_TIMEOUT)
+    except TimeoutError:
+        metrics.incr('llm_busy_rejections')
+        raise LLMBusy('The assistant is busy, please try again.')
+    metrics.observe('llm_queue_wait', loop.time() - queued_at)
+    metrics.incr('llm_streams_active')
+
+    try:
+        chunks = await asyncio.wait_for(
+            get_client().aio.models.generate_content_stream(model=GEMINI_MODEL, contents=prompt),
+            deadline,
+        )
+        iterator = chunks.__aiter__()
+        try:
+            while True:
+                remaining = ends_at - loop.time()
+                if remaining <= 0:
+                    metrics.incr('llm_timeouts')
+                    raise TimeoutError
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                except TimeoutError:
+                    metrics.incr('llm_timeouts')
+                    raise
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            # Close the HTTP stream early on timeout or client disconnect
+            close = getattr(iterator, 'aclose', None)
+            if close:
+                await close()
+    finally:
+        metrics.incr('llm_streams_active', -1)
+        semaphore.release()
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbot.memory import RECENT_TURNS, compact_sessions, evict_idle_sessions
+from chatbot.models import ChatSession
+
+
+class Command(BaseCommand):
+    help = 'Deletes idle chatbot sessions and folds old turns of the rest into their summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-days', type=int, default=settings.CHAT_SESSION_IDLE_DAYS)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        evicted = evict_idle_sessions(options['idle_days'], batch_size)
+        self.stdout.write(f"Deleted {evicted} idle session(s).")
+
+        # Walk the sessions that still have turns to fold, by id, a batch at a time
+        folded, last_id = 0, 0
+        pending = ChatSession.objects.filter(unsummarized_turns__gt=RECENT_TURNS).order_by('pk')
+        while True:
+            ids = list(pending.filter(pk__gt=last_id).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            folded += compact_sessions(ids)
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"Folded {folded} turn(s) into session summaries."))
@@ -0,0 +1,165 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from chatbot import assistant
+from chatbot.context import build_prompt, events_section
+from chatbot.faq_index import GUEST, MEMBER, STAFF, get_index
+from chatbot.models import FAQ
+from chatbot.retrieval import get_retriever
+from knowa_server.caching import bump_namespace
+
+# (question, expected FAQ question or None for "should go to the LLM", audience)
+# Expected answers refer to the FAQs in load_faqs.py.
+DEFAULT_CASES = [
+    ("what is knowa", "What is Knowa?", GUEST),
+    ("what is this app about?", "What is Knowa?", GUEST),
+    ("I forgot my password", "How do I reset my password?", GUEST),
+    ("reset password", "How do I reset my password?", GUEST),
+    ("how can I change my profile photo", "How do I edit my profile?", GUEST),
+    ("edit my name", "How do I edit my profile?", GUEST),
+    ("who are you, assistant?", "Who is the AI Assistant?", GUEST),
+    ("how to join event", "How do I join an event?", MEMBER),
+    ("I want to register for an event", "How do I join an event?", MEMBER),
+    ("where are the events I joined", "Where can I see my joined events?", MEMBER),
+    ("my schedule of joined events", "Where can I see my joined events?", MEMBER),
+    ("how do I message other members", "How do I chat with other members?", MEMBER),
+    ("group chat with members", "How do I chat with other members?", MEMBER),
+    ("what does the blue tick mean", "What does a Blue Tick mean?", MEMBER),
+    ("grey ticks in chat", "What does a Blue Tick mean?", MEMBER),
+    ("create a new event", "How do I create a new event?", STAFF),
+    ("how to publish an event", "How do I create a new event?", STAFF),
+    ("pin a message in the chat", "How do I pin a message?", STAFF),
+    # Not covered by the FAQ: these must reach the LLM
+    ("when is the next beach cleanup", None, GUEST),
+    ("how much is the membership fee", None, MEMBER),
+    ("can I donate with a credit card", None, GUEST),
+    ("what time does the charity run start", None, MEMBER),
+]
+
+
+class StubLLM:
+    """Stands in for Gemini: records prompts, returns a fixed reply."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return "stub reply"
+
+
+class Command(BaseCommand):
+    help = 'Offline evaluation of the chatbot FAQ retrieval stage (no LLM calls are made)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', help='JSONL file of {"question", "expected" (FAQ question or null), "audience"}')
+        parser.add_argument('--threshold', type=float, default=assistant.DIRECT_ANSWER_THRESHOLD)
+        parser.add_argument('--k', type=int, default=assistant.TOP_K)
+        parser.add_argument('--sweep', action='store_true', help='Also report results for a range of thresholds')
+        parser.add_argument('--sample-faqs', action='store_true',
+                            help='Evaluate against the FAQs from load_faqs.py (loaded in a rolled-back transaction)')
+        parser.add_argument('--show-cases', action='store_true', help='Print every case')
+
+    def handle(self, *args, **options):
+        cases = self.load_cases(options['cases'])
+        if options['sample_faqs']:
+            with transaction.atomic():
+                import load_faqs
+                load_faqs.run()
+                self.evaluate(cases, options)
+                transaction.set_rollback(True)
+            bump_namespace('faqs')  # rebuild indexes from the real FAQs
+        else:
+            if not FAQ.objects.exists():
+                raise CommandError('No FAQs in the database. Run load_faqs.py or pass --sample-faqs.')
+            self.evaluate(cases, options)
+
+    def load_cases(self, path):
+        if not path:
+            return DEFAULT_CASES
+        cases = []
+        with open(path) as handle:
+            for line in handle:
+                if line.strip():
+                    row = json.loads(line)
+                    cases.append((row['question'], row.get('expected'), row.get('audience', GUEST)))
+        return cases
+
+    def evaluate(self, cases, options):
+        get_index()
+        result = self.run_cases(cases, options['threshold'], options['k'], options['show_cases'])
+        self.report(result, options['threshold'], options['k'])
+
+        if options['sweep']:
+            self.stdout.write("\nthreshold  direct  correct-direct  wrong-direct  llm-calls")
+            for step in range(20, 85, 5):
+                threshold = step / 100
+                r = self.run_cases(cases, threshold, options['k'])
+                self.stdout.write(
+                    f"{threshold:9.2f}  {r['direct']:6d}  {r['correct_direct']:14d}  "
+                    f"{r['wrong_direct']:12d}  {r['llm_calls']:9d}"
+                )
+
+    def run_cases(self, cases, threshold, k, show=False):
+        stub = StubLLM()
+        r = {'cases': len(cases), 'answerable': 0, 'top1': 0, 'recall_k': 0, 'direct': 0,
+             'correct_direct': 0, 'wrong_direct': 0, 'llm_calls': 0, 'prompt_chars': 0,
+             'all_faq_prompt_chars': 0}
+        for question, expected, audience in cases:
+            events_text = events_section(audience)
+            retriever = get_retriever(audience)
+            matches = [faq.question for faq, _ in retriever.search(question, k=k)]
+            if expected is not None:
+                r['answerable'] += 1
+                r['top1'] += bool(matches) and matches[0] == expected
+                r['recall_k'] += expected in matches
+
+            user = _FakeUser(audience)
+            answer = assistant.answer_question(question, user=user, llm=stub, threshold=threshold, k=k, use_cache=False)
+            if answer['source'] == 'faq':
+                r['direct'] += 1
+                faq_question = FAQ.objects.filter(pk=answer['faq_id']).values_list('question', flat=True).first()
+                if faq_question == expected:
+                    r['correct_direct'] += 1
+                else:
+                    r['wrong_direct'] += 1
+            else:
+                r['llm_calls'] += 1
+                r['prompt_chars'] += len(answer['prompt'])
+                r['all_faq_prompt_chars'] += len(build_prompt(question, retriever.faqs, events_text, budget=10 ** 6))
+
+            if show:
+                self.stdout.write(
+                    f"[{answer['source']:3}] {answer['confidence']:.2f}  {question!r} -> "
+                    f"{matches[0] if matches else '-'!r} (expected {expected!r})"
+                )
+        return r
+
+    def report(self, r, threshold, k):
+        answerable = r['answerable'] or 1
+        llm_calls = r['llm_calls'] or 1
+        self.stdout.write(f"Cases: {r['cases']} ({r['answerable']} answerable by the FAQ)")
+        self.stdout.write(f"Retrieval top-1 accuracy: {r['top1'] / answerable:.0%}   recall@{k}: {r['recall_k'] / answerable:.0%}")
+        self.stdout.write(
+            f"Answered from FAQ (threshold {threshold:.2f}): {r['direct']}  "
+            f"correct: {r['correct_direct']}  wrong: {r['wrong_direct']}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"LLM calls: {r['llm_calls']} of {r['cases']} ({r['cases'] - r['llm_calls']} round-trips saved)"
+        ))
+        if r['llm_calls']:
+            self.stdout.write(
+                f"Avg prompt size: {r['prompt_chars'] // llm_calls} chars with top-{k} FAQs vs "
+                f"{r['all_faq_prompt_chars'] // llm_calls} chars with every FAQ"
+            )
+
+
+class _FakeUser:
+    """Just enough of a User for audience_for()."""
+
+    def __init__(self, audience):
+        self.is_authenticated = audience != GUEST
+        self.is_staff = audience == STAFF
+        self.is_superuser = False
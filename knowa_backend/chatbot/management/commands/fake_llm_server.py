@@ -0,0 +1,71 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a local stand-in for the Gemini API, for testing the chatbot without a key. '
+        'Point the app at it with GEMINI_BASE_URL=http://127.0.0.1:<port>/ and any GEMINI_API_KEY.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0.2, help='Seconds to wait before each streamed chunk')
+        parser.add_argument('--reply', default='This is a reply from the fake LLM server.')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), make_handler(options['reply'], options['delay']))
+        self.stdout.write(self.style.SUCCESS(f"Fake Gemini API on http://127.0.0.1:{options['port']}/"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def _candidate(text):
+    return {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}}]}
+
+
+def make_handler(reply, delay):
+    """Request handler answering generateContent and streamGenerateContent."""
+    words = reply.split(' ')
+    chunks = [word + ' ' for word in words[:-1]] + words[-1:]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if ':streamGenerateContent' in self.path:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                try:
+                    for chunk in chunks:
+                        time.sleep(delay)
+                        self.wfile.write(f"data: {json.dumps(_candidate(chunk))}\r\n\r\n".encode())
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (deadline or disconnect)
+                self.close_connection = True
+            elif ':generateContent' in self.path:
+                time.sleep(delay)
+                body = json.dumps(_candidate(reply)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self.send_error(404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
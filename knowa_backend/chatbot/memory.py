@@ -0,0 +1,160 @@
+# chatbot/memory.py
+# Conversation memory for the chatbot.
+# A ChatSession keeps the last few turns word for word plus a rolling
+# summary of everything older, so a follow-up question ("and when does it
+# start?") has context while the prompt stays bounded however long the
+# conversation gets:
+#   prompt history = summary (at most MAX_SUMMARY_CHARS) + RECENT_TURNS turns
+#
+# Older turns are folded into the summary and deleted ("compaction"): inline
+# once a session has COMPACT_AFTER unsummarized turns, and in batches by the
+# compact_chat_sessions command, which also deletes idle sessions.
+#
+# Sessions are opt-in: a request without a session key is a one-off question
+# and saves nothing. The client sends "session": "new" to start a
+# conversation and then the key it gets back.
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ChatSession, ChatTurn
+
+RECENT_TURNS = 4          # turns quoted in the prompt
+COMPACT_AFTER = 8         # unsummarized turns that trigger an inline compaction
+MAX_TURN_CHARS = 600      # per question/reply when quoted
+MAX_SUMMARY_CHARS = 1200
+NEW_SESSION = 'new'       # session key a client sends to start a conversation
+
+
+def _clip(text, limit):
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+def _owner_id(user):
+    return user.pk if user and user.is_authenticated else None
+
+
+def get_session(key, user):
+    """The caller's session for `key`, or None (no key, "new", unknown key or someone else's)."""
+    if not key or key == NEW_SESSION:
+        return None
+    try:
+        return ChatSession.objects.get(key=key, user_id=_owner_id(user))
+    except (ChatSession.DoesNotExist, ValidationError, ValueError):
+        return None
+
+
+def load_conversation(key, user):
+    """(session or None, history blocks) for a chatbot request."""
+    session = get_session(key, user)
+    return session, history_blocks(session)
+
+
+def history_blocks(session):
+    """Prompt blocks for the conversation so far, oldest first ([] for a new one)."""
+    if session is None or not session.turn_count:
+        return []
+    blocks = []
+    if session.summary:
+        blocks.append(f"Earlier in this conversation:\n{session.summary}\n")
+    recent = list(session.turns.order_by('-id')[:RECENT_TURNS])
+    for turn in reversed(recent):
+        blocks.append(
+            f"User: {_clip(turn.question, MAX_TURN_CHARS)}\n"
+            f"Assistant: {_clip(turn.reply, MAX_TURN_CHARS)}\n"
+        )
+    return blocks
+
+
+def record_turn(session, user, question, reply, source, start=False):
+    """
+    Saves one question/answer and returns the session. Without a session one
+    is created only if `start` (the client sent a session key: "new", or one
+    that has since expired); otherwise nothing is saved and None is returned.
+    """
+    if session is None and not start:
+        return None
+    with transaction.atomic():
+        if session is None:
+            session = ChatSession.objects.create(user_id=_owner_id(user))
+        ChatTurn.objects.create(session=session, question=question, reply=reply, source=source)
+        ChatSession.objects.filter(pk=session.pk).update(
+            turn_count=F('turn_count') + 1,
+            unsummarized_turns=F('unsummarized_turns') + 1,
+            last_active_at=timezone.now(),
+        )
+    session.turn_count += 1
+    session.unsummarized_turns += 1
+    if session.unsummarized_turns >= COMPACT_AFTER:
+        session.unsummarized_turns -= compact_sessions([session.pk])
+    return session
+
+
+# --- COMPACTION / EVICTION ---
+
+def _summarize_turn(turn):
+    first_sentence = turn.reply.strip().split('. ')[0]
+    return f"- Asked \"{_clip(turn.question, 120)}\"; told: {_clip(first_sentence, 160)}"
+
+
+def _fold(summary, turns):
+    """Appends one line per turn, keeping only the newest lines within MAX_SUMMARY_CHARS."""
+    lines = [line for line in summary.splitlines() if line] + [_summarize_turn(turn) for turn in turns]
+    kept, size = [], 0
+    for line in reversed(lines):
+        size += len(line) + 1
+        if size > MAX_SUMMARY_CHARS:
+            break
+        kept.append(line)
+    return '\n'.join(reversed(kept))
+
+
+def compact_sessions(session_ids):
+    """
+    Folds every turn but the RECENT_TURNS newest into the summary and
+    deletes it, for many sessions at once (three queries plus the delete).
+    Returns the number of turns folded.
+    """
+    sessions = {
+        session.pk: session
+        for session in ChatSession.objects.filter(pk__in=session_ids, unsummarized_turns__gt=RECENT_TURNS)
+    }
+    if not sessions:
+        return 0
+
+    turns = {}
+    for turn in ChatTurn.objects.filter(session_id__in=sessions).order_by('session_id', 'id'):
+        turns.setdefault(turn.session_id, []).append(turn)
+
+    folded = []
+    for session_id, session_turns in turns.items():
+        old = session_turns[:-RECENT_TURNS]
+        if not old:
+            continue
+        session = sessions[session_id]
+        session.summary = _fold(session.summary, old)
+        session.unsummarized_turns = len(session_turns) - len(old)
+        folded.extend(turn.pk for turn in old)
+
+    with transaction.atomic():
+        ChatSession.objects.bulk_update(sessions.values(), ['summary', 'unsummarized_turns'])
+        ChatTurn.objects.filter(pk__in=folded).delete()
+    return len(folded)
+
+
+def evict_idle_sessions(idle_days, batch_size=500):
+    """Deletes sessions (and their turns) untouched for `idle_days`. Returns how many."""
+    cutoff = timezone.now() - timedelta(days=idle_days)
+    deleted = 0
+    while True:
+        ids = list(
+            ChatSession.objects.filter(last_active_at__lt=cutoff).values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        ChatSession.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
@@ -0,0 +1,39 @@
+# chatbot/metrics.py
+# Per-process counters for the chatbot's protection layers: throttling,
+# request coalescing and the LLM stream queue. Read by ChatbotStatsView.
+import threading
+
+_counters = {}
+_timings = {}  # name -> [count, total seconds, max seconds]
+_lock = threading.Lock()
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name, seconds):
+    with _lock:
+        timing = _timings.setdefault(name, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+
+def snapshot():
+    with _lock:
+        data = dict(_counters)
+        for name, (count, total, longest) in _timings.items():
+            data[name] = {
+                'count': count,
+                'avg_s': round(total / count, 3) if count else 0.0,
+                'max_s': round(longest, 3),
+            }
+    return data
+
+
+def reset_metrics():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -1,3 +1,6 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 
 class FAQ(models.Model):
@@ -13,9 +16,46 @@ class FAQ(models.Model):
     answer = models.TextField()  # The solution steps
     target_role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='all')
     order = models.IntegerField(default=0)  # To control which question appears first
+    updated_at = models.DateTimeField(auto_now=True)  # part of the FAQ index version
 
     class Meta:
         ordering = ['order']
 
     def __str__(self):
-        return f"[{self.target_role}] {self.question}"
\ No newline at end of file
+        return f"[{self.target_role}] {self.question}"
+
+
+# --- CHATBOT CONVERSATIONS (chatbot/memory.py) ---
+class ChatSession(models.Model):
+    # Sent back by the client to continue a conversation; guests have no user
+    key = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='chat_sessions'
+    )
+    # Older turns, folded into a few lines once they leave the recent window
+    summary = models.TextField(blank=True)
+    turn_count = models.PositiveIntegerField(default=0)
+    unsummarized_turns = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_active_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Chat {self.key} ({self.turn_count} turns)"
+
+
+class ChatTurn(models.Model):
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='turns')
+    question = models.TextField()
+    reply = models.TextField()
+    source = models.CharField(max_length=10)  # faq / cache / llm
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.session_id}: {self.question[:50]}"
@@ -0,0 +1,153 @@
+# chatbot/response_cache.py
+# Cache of Gemini replies for the chatbot.
+# Many questions are near-duplicates ("how do I donate?", "how to donate"),
+# so replies are cached by normalized question, and a new question can also
+# reuse the reply of a very similar cached one (cosine similarity of hashed
+# bag-of-words vectors).
+#
+# Every entry belongs to a context key: the FAQ audience, the FAQ version and
+# a hash of the upcoming-events text that went into the prompt. When events
+# or FAQs change, the context key changes and the old replies are dropped.
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from knowa_server.caching import namespace_version
+from .retrieval import tokenize
+
+MAX_ENTRIES = 500
+TTL = 6 * 60 * 60            # seconds
+SIMILARITY_THRESHOLD = 0.8   # cosine similarity needed to reuse another question's reply
+VECTOR_SIZE = 1024
+
+
+def normalize(question):
+    """Lowercased, stemmed, stop words removed: 'How do I donate?' -> 'donate'."""
+    return ' '.join(tokenize(question))
+
+
+def vectorize(normalized):
+    """L2-normalised hashed counts of words and word pairs."""
+    words = normalized.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = np.zeros(VECTOR_SIZE, dtype=np.float32)
+    for feature in features:
+        vector[zlib.crc32(feature.encode()) % VECTOR_SIZE] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def context_key(audience, events_text):
+    events_hash = hashlib.md5(events_text.encode(), usedforsecurity=False).hexdigest()[:12]
+    return f"{audience}:{namespace_version('faqs')}:{events_hash}"
+
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English text
+    return max(1, len(text) // 4)
+
+
+class ResponseCache:
+    """In-process LRU with a TTL, partitioned by context key."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, similarity=SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries = OrderedDict()  # (context, normalized question) -> entry dict
+        self._current_context = {}     # audience -> latest context key
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self._stats = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0,
+                       'latency_saved_s': 0.0, 'tokens_saved': 0, 'invalidations': 0}
+
+    def _switch_context(self, context):
+        """Drops an audience's entries from older contexts (events or FAQs changed)."""
+        audience = context.split(':', 1)[0]
+        previous = self._current_context.get(audience)
+        if previous == context:
+            return
+        self._current_context[audience] = context
+        if previous is not None:
+            stale = [key for key in self._entries if key[0] == previous]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidations'] += 1
+
+    def _record_hit(self, kind, entry):
+        self._stats[kind] += 1
+        self._stats['latency_saved_s'] += entry['latency']
+        self._stats['tokens_saved'] += entry['tokens']
+
+    def lookup(self, question, context):
+        """Returns a cached reply for this question (or a near-identical one), or None."""
+        normalized = normalize(question)
+        now = time.monotonic()
+        with self._lock:
+            self._switch_context(context)
+            if not normalized:
+                # Nothing but stop words ("how do I?"): never treat as a repeat
+                self._stats['misses'] += 1
+                return None
+
+            entry = self._entries.get((context, normalized))
+            if entry is not None and now - entry['created'] <= self.ttl:
+                self._entries.move_to_end((context, normalized))
+                self._record_hit('exact_hits', entry)
+                return entry['reply']
+
+            candidates = [
+                (key, item) for key, item in self._entries.items()
+                if key[0] == context and now - item['created'] <= self.ttl
+            ]
+            if candidates:
+                scores = np.stack([item['vector'] for _, item in candidates]) @ vectorize(normalized)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    key, item = candidates[best]
+                    self._entries.move_to_end(key)
+                    self._record_hit('similar_hits', item)
+                    return item['reply']
+
+            self._stats['misses'] += 1
+            return None
+
+    def store(self, question, context, reply, latency, tokens):
+        normalized = normalize(question)
+        if not normalized:
+            return
+        with self._lock:
+            self._switch_context(context)
+            self._entries[(context, normalized)] = {
+                'reply': reply,
+                'created': time.monotonic(),
+                'latency': latency,
+                'tokens': tokens,
+                'vector': vectorize(normalized),
+            }
+            self._entries.move_to_end((context, normalized))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_context.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['exact_hits'] + stats['similar_hits'] + stats['misses']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 3) if lookups else None
+        stats['latency_saved_s'] = round(stats['latency_saved_s'], 3)
+        return stats
+
+
+response_cache = ResponseCache()
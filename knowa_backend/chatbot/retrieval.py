@@ -0,0 +1,135 @@
+# chatbot/retrieval.py
+# Local FAQ retrieval for the AI chatbot.
+# A BM25 index over FAQ question + answer text, held as NumPy arrays and
+# rebuilt only when the FAQ index (chatbot/faq_index.py) changes. Used to
+# answer questions the FAQ already covers without calling the LLM, and to
+# give the LLM only the few FAQs that matter when it is called.
+import re
+import threading
+
+import numpy as np
+
+from .faq_index import get_index
+
+# BM25 parameters (the usual defaults)
+K1 = 1.5
+B = 0.75
+
+# The question is the best summary of what an FAQ answers, so count it more
+QUESTION_WEIGHT = 2
+
+STOP_WORDS = {
+    'a', 'an', 'the', 'and', 'or', 'to', 'of', 'in', 'on', 'for', 'at', 'by',
+    'is', 'are', 'was', 'be', 'can', 'do', 'does', 'i', 'me', 'my', 'you',
+    'your', 'it', 'this', 'that', 'will', 'with', 'from', 'as', 'if', 'so',
+    'we', 'our', 'get',
+}
+# Question words ("where", "who", ...) are kept: they tell "how do I join an
+# event?" apart from "where can I see my joined events?". On their own they
+# say nothing about the topic, though.
+QUESTION_WORDS = {'how', 'what', 'where', 'when', 'which', 'who', 'why'}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word):
+    # Just enough to match "events"/"event", "donating"/"donate"
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    return [_stem(word) for word in _TOKEN_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+class BM25Index:
+    """
+    BM25 over a small document set. Term frequencies are a dense
+    (documents x vocabulary) matrix; FAQs number in the tens to hundreds,
+    so scoring a query is one small matrix slice.
+    """
+
+    def __init__(self, documents):
+        token_lists = [tokenize(document) for document in documents]
+        self.vocabulary = {}
+        for tokens in token_lists:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        self.tf = np.zeros((len(documents), len(self.vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(token_lists):
+            for token in tokens:
+                self.tf[row, self.vocabulary[token]] += 1
+
+        self.doc_lengths = self.tf.sum(axis=1)
+        self.avg_length = float(self.doc_lengths.mean()) if len(documents) else 0.0
+        doc_freq = (self.tf > 0).sum(axis=0)
+        n = len(documents)
+        self.idf = np.log(1 + (n - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        # Per-document length normalisation term, computed once
+        self.norm = K1 * (1 - B + B * self.doc_lengths / (self.avg_length or 1))
+
+    def scores(self, query):
+        columns = [self.vocabulary[token] for token in set(tokenize(query)) if token in self.vocabulary]
+        if not columns or not len(self.tf):
+            return np.zeros(len(self.tf), dtype=np.float32)
+        tf = self.tf[:, columns]
+        weights = tf * (K1 + 1) / (tf + self.norm[:, None])
+        return weights @ self.idf[columns]
+
+    def max_score(self, query):
+        """
+        Upper bound of scores() for this query: every term matched with a
+        very high term frequency. Query words the index has never seen count
+        at the highest idf, so off-topic questions get a low confidence.
+        """
+        terms = set(tokenize(query))
+        known = [self.vocabulary[token] for token in terms if token in self.vocabulary]
+        unknown = len(terms) - len(known)
+        top_idf = float(self.idf.max()) if len(self.idf) else 0.0
+        return (float(self.idf[known].sum()) + unknown * top_idf) * (K1 + 1)
+
+
+class FAQRetriever:
+    def __init__(self, faqs):
+        self.faqs = list(faqs)
+        self.index = BM25Index([
+            ' '.join([faq.question] * QUESTION_WEIGHT + [faq.answer]) for faq in self.faqs
+        ])
+
+    def search(self, query, k=3):
+        """
+        [(faq, confidence), ...] best first. Confidence is the BM25 score
+        divided by its upper bound for this query, so it is in [0, 1] and
+        comparable across queries.
+        """
+        if not self.faqs or not set(tokenize(query)) - QUESTION_WORDS:
+            return []
+        scores = self.index.scores(query)
+        ceiling = self.index.max_score(query)
+        if ceiling <= 0:
+            return []
+        k = min(k, len(self.faqs))
+        best = np.argsort(-scores, kind='stable')[:k]
+        return [(self.faqs[i], float(scores[i]) / ceiling) for i in best if scores[i] > 0]
+
+
+_retrievers = {}  # audience -> (faq index version, FAQRetriever)
+_lock = threading.Lock()
+
+
+def get_retriever(audience):
+    """The retriever for one FAQ audience (guest/member/staff), rebuilt when FAQs change."""
+    index = get_index()
+    cached = _retrievers.get(audience)
+    if cached is not None and cached[0] == index['version']:
+        return cached[1]
+    with _lock:
+        cached = _retrievers.get(audience)
+        if cached is None or cached[0] != index['version']:
+            cached = (index['version'], FAQRetriever(index['faqs'][audience]))
+            _retrievers[audience] = cached
+        return cached[1]
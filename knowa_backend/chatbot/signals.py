@@ -0,0 +1,12 @@
+# chatbot/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from knowa_server.caching import bump_namespace
+from .models import FAQ
+from .faq_index import clear_faq_index
+
+@receiver(post_save, sender=FAQ)
+@receiver(post_delete, sender=FAQ)
+def faq_changed(sender, **kwargs):
+    clear_faq_index()
+    bump_namespace('faqs')
@@ -1,3 +1,186 @@
-from django.test import TestCase
+# chatbot/tests.py
+# LLM streaming (chatbot/llm.py and ChatbotStreamView) against the
+# fake_llm_server command's handler, served from a thread on a free port;
+# the guest rate limit (chatbot/throttling.py); and who sees which FAQs.
+import asyncio
+import json
+import threading
+from http.server import ThreadingHTTPServer
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from knowa_server.caching import local_cache
+from users.models import User
+from . import llm, memory, metrics, throttling
+from .faq_index import clear_faq_index
+from .management.commands.fake_llm_server import make_handler
+from .models import FAQ, ChatSession
+
+REPLY = 'Bring water, a hat and closed shoes.'
+
+
+class FakeLLMTestCase(TestCase):
+    """Starts a fake Gemini API for the class and points chatbot/llm.py at it."""
+    chunk_delay = 0.01
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(REPLY, cls.chunk_delay))
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        host, port = cls.server.server_address
+        cls.llm_settings = override_settings(GEMINI_API_KEY='test-key', GEMINI_BASE_URL=f'http://{host}:{port}/')
+        cls.llm_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.llm_settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        llm.reset_client()
+        super().tearDownClass()
+
+    def setUp(self):
+        llm.reset_client()  # built against this class's server
+        metrics.reset_metrics()
+        cache.clear()
+        local_cache.clear()
+
+    async def collect(self, prompt='What should I bring?', **kwargs):
+        return [text async for text in llm.stream(prompt, **kwargs)]
+
+
+class LLMStreamTests(FakeLLMTestCase):
+    async def test_streams_the_reply_chunk_by_chunk(self):
+        chunks = await self.collect()
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), REPLY)
+        self.assertEqual(metrics.snapshot()['llm_streams_active'], 0)
+
+    async def test_view_sends_tokens_then_done(self):
+        response = await self.async_client.post(
+            '/api/chatbot/stream/', {'message': 'Which shoes for the mangrove walk?'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        events = [block.split('\n') for block in body.strip().split('\n\n')]
+        names = [lines[0].removeprefix('event: ') for lines in events]
+        data = [json.loads(lines[1].removeprefix('data: ')) for lines in events]
+        self.assertEqual(names[-1], 'done')
+        self.assertEqual(set(names[:-1]), {'token'})
+        self.assertEqual(''.join(item['text'] for item in data[:-1]), REPLY)
+        self.assertEqual(data[-1]['source'], 'llm')
+        # No session key: a one-off question, nothing is saved
+        self.assertIsNone(data[-1]['session'])
+        self.assertFalse(await ChatSession.objects.aexists())
+
+    async def test_session_new_starts_a_conversation(self):
+        response = await self.async_client.post(
+            '/api/chatbot/stream/', {'message': 'Which shoes for the mangrove walk?', 'session': memory.NEW_SESSION},
+            content_type='application/json',
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        done = json.loads(body.strip().split('\n\n')[-1].split('\n')[1].removeprefix('data: '))
+        session = await ChatSession.objects.aget(key=done['session'])
+        self.assertEqual(session.turn_count, 1)
+
+
+class LLMDeadlineTests(FakeLLMTestCase):
+    chunk_delay = 0.5
+
+    async def test_deadline_stops_a_slow_stream(self):
+        chunks = []
+        with self.assertRaises(TimeoutError):
+            async for text in llm.stream('What should I bring?', deadline=1.2):
+                chunks.append(text)
+        # A couple of chunks arrive before the deadline, never the whole reply
+        self.assertTrue(chunks)
+        self.assertNotEqual(''.join(chunks), REPLY)
+        self.assertTrue(REPLY.startswith(''.join(chunks)))
+        counters = metrics.snapshot()
+        self.assertEqual(counters['llm_timeouts'], 1)
+        self.assertEqual(counters['llm_streams_active'], 0)
+
+
+@override_settings(CHATBOT_MAX_CONCURRENT_STREAMS=1, CHATBOT_QUEUE_TIMEOUT=0.1)
+class LLMConcurrencyTests(FakeLLMTestCase):
+    chunk_delay = 0.2
+
+    async def test_busy_when_every_slot_stays_taken(self):
+        first = llm.stream('What should I bring?')
+        await first.__anext__()  # holds the only slot
+        try:
+            with self.assertRaises(llm.LLMBusy):
+                await self.collect()
+        finally:
+            await first.aclose()
+        self.assertEqual(metrics.snapshot()['llm_busy_rejections'], 1)
+
+        # The slot is free again once the first stream is closed
+        self.assertEqual(''.join(await self.collect()), REPLY)
+
+    async def test_client_disconnect_frees_the_slot(self):
+        first_chunk = asyncio.Event()
+
+        async def listener():
+            async for _ in llm.stream('What should I bring?'):
+                first_chunk.set()
+
+        # The ASGI server cancels the response task when the client goes away
+        task = asyncio.ensure_future(listener())
+        await asyncio.wait_for(first_chunk.wait(), 5)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual(metrics.snapshot()['llm_streams_active'], 0)
+        self.assertEqual(''.join(await self.collect()), REPLY)
+
+
+@override_settings(CHATBOT_THROTTLE={'anon': {'burst': 1, 'per_minute': 1}, 'user': {'burst': 1, 'per_minute': 1}})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def guest_request(self, forwarded_for):
+        return self.factory.post('/api/chatbot/stream/', HTTP_X_FORWARDED_FOR=forwarded_for, REMOTE_ADDR='10.0.0.1')
+
+    def test_spoofed_forwarded_for_shares_the_bucket(self):
+        # The platform proxy appends the real client address last
+        self.assertTrue(throttling.check(self.guest_request('198.51.100.7'), AnonymousUser())[0])
+        allowed, wait = throttling.check(self.guest_request('1.2.3.4, 198.51.100.7'), AnonymousUser())
+        self.assertFalse(allowed)
+        self.assertGreater(wait, 0)
+
+    def test_other_clients_have_their_own_bucket(self):
+        self.assertTrue(throttling.check(self.guest_request('198.51.100.7'), AnonymousUser())[0])
+        self.assertTrue(throttling.check(self.guest_request('198.51.100.8'), AnonymousUser())[0])
+
+
+class FAQListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        clear_faq_index()
+        self.client = APIClient()
+        for role in ('all', 'participant', 'organizer', 'crew'):
+            FAQ.objects.create(question=f'For {role}?', answer='Yes.', target_role=role)
+
+    def questions(self, user=None):
+        self.client.force_authenticate(user)
+        return {faq['question'] for faq in self.client.get('/api/chatbot/faqs/').json()}
+
+    def test_each_audience_sees_its_roles(self):
+        self.assertEqual(self.questions(), {'For all?'})
+        member = User.objects.create_user('gus', 'gus@example.com', 'Sup3r-secret!')
+        self.assertEqual(self.questions(member), {'For all?', 'For participant?'})
+        staff = User.objects.create_user('hal', 'hal@example.com', 'Sup3r-secret!', is_staff=True)
+        self.assertEqual(self.questions(staff), {'For all?', 'For organizer?'})
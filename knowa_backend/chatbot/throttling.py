@@ -0,0 +1,66 @@
+# chatbot/throttling.py
+# Token-bucket rate limits for the chatbot endpoints.
+# Guests get one bucket per IP address, logged-in users one per account
+# (CHATBOT_THROTTLE in settings). The guest's IP comes from DRF's get_ident(),
+# which trusts only the X-Forwarded-For entries added by our own proxies
+# (REST_FRAMEWORK['NUM_PROXIES']), so a made-up header can't open new buckets. A bucket holds up to `burst` tokens and
+# refills at `per_minute`; every chatbot request takes one.
+#
+# Buckets live in the shared cache so all workers draw from the same one.
+# The read-modify-write is not atomic across processes (the same trade-off
+# DRF's own throttles make); a few extra requests can slip through a race.
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+_lock = threading.Lock()
+
+
+def take(key, burst, per_minute, now=None):
+    """
+    Takes one token from the bucket `key`.
+    Returns (allowed, seconds until the next token if refused).
+    """
+    now = now or time.time()
+    rate = per_minute / 60.0
+    with _lock:
+        state = shared_cache.get(key)
+        tokens, updated = state if state else (burst, now)
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Expire once the bucket would be full again anyway
+        shared_cache.set(key, (tokens, now), int(burst / rate) + 60)
+    return allowed, 0 if allowed else (1 - tokens) / rate
+
+
+def check(request, user):
+    """
+    Applies the guest (per IP) or user bucket to a chatbot request.
+    Returns (allowed, retry_after seconds).
+    """
+    if user and user.is_authenticated:
+        scope, ident = 'user', user.pk
+    else:
+        scope, ident = 'anon', BaseThrottle().get_ident(request)
+    limits = settings.CHATBOT_THROTTLE[scope]
+    allowed, wait = take(f"chatbot-bucket:{scope}:{ident}", limits['burst'], limits['per_minute'])
+    metrics.incr('throttle_allowed' if allowed else f"throttle_rejected_{scope}")
+    return allowed, wait
+
+
+class ChatbotThrottle(BaseThrottle):
+    """DRF throttle class around check(), for the sync chatbot view."""
+
+    def allow_request(self, request, view):
+        allowed, self._wait = check(request, request.user)
+        return allowed
+
+    def wait(self):
+        return self._wait
@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import FAQListView
+from .views import ChatbotStatsView, ChatbotStreamView, FAQListView
 
 urlpatterns = [
     # ... your existing chat URLs ...
     path('faqs/', FAQListView.as_view(), name='faq-list'),
+    path('stream/', ChatbotStreamView.as_view(), name='chatbot-stream'),
+    path('stats/', ChatbotStatsView.as_view(), name='chatbot-stats'),
 ]
\ No newline at end of file
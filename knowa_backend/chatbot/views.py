@@ -1,31 +1,164 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions
-from django.db.models import Q
-from .models import FAQ
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.exceptions import AuthenticationFailed
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from knowa_server.caching import conditional_get
+from users.authentication import ClaimsJWTAuthentication
+from . import llm, memory, metrics, throttling
+from .assistant import prepare_answer, remember_reply
+from .coalescing import flight_key, stream_flights
+from .response_cache import response_cache
 from .serializers import FAQSerializer
+from .faq_index import audience_for, faq_json_for
 
 class FAQListView(generics.ListAPIView):
     # 1. Allow anyone (including guests) to read the FAQs
     permission_classes = [permissions.AllowAny]
     serializer_class = FAQSerializer
 
-    def get_queryset(self):
-        user = self.request.user
-        
-        # 2. Base rule: EVERYONE (Guests & Users) sees questions meant for 'all'
-        filters = Q(target_role='all')
-
-        # 3. Check if user is actually logged in
-        if user.is_authenticated:
-            # --- LOGGED IN LOGIC ---
-            if user.is_staff or user.is_superuser:
-                # Staff see 'all' + 'organizer'
-                filters |= Q(target_role='organizer')
+    # Served from the in-memory index (chatbot/faq_index.py): at most one
+    # small version query every few seconds and no serialization once it is
+    # built. Who sees which FAQs (by target_role) is defined there, in
+    # AUDIENCE_ROLES: guests get 'all', members add 'participant', staff
+    # add 'organizer'.
+    @conditional_get('faqs', vary_on='role')
+    def list(self, request, *args, **kwargs):
+        body = faq_json_for(audience_for(request.user))
+        return HttpResponse(body, content_type='application/json')
+
+
+def _sse(event, data):
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatbotStreamView(View):
+    """
+    Streaming version of /api/users/chatbot/ (needs the ASGI server).
+    POST {"message": "...", "session": "new" | "<key>" (optional)} returns text/event-stream:
+        event: token  data: {"text": "..."}   (one per chunk)
+        event: done   data: {"source": "faq" | "cache" | "llm", "session": "..." | null}
+        event: error  data: {"error": "..."}
+    While Gemini is streaming, the request holds no thread: other requests
+    keep being served by the same worker. Rate limited like the sync view
+    (429 with Retry-After).
+    """
+
+    async def post(self, request):
+        try:
+            body = json.loads(request.body or b'{}')
+            message, session_key = body.get('message'), body.get('session')
+        except (ValueError, AttributeError):
+            message = None
+        if not message:
+            return JsonResponse({'error': 'Message is required'}, status=400)
+
+        # Same JWT rules as the DRF views; guests are allowed
+        try:
+            auth = await sync_to_async(ClaimsJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            detail = e.detail.get('detail', '') if isinstance(e.detail, dict) else e.detail
+            return JsonResponse({'error': str(detail)}, status=401)
+        user = auth[0] if auth else AnonymousUser()
+
+        allowed, wait = await sync_to_async(throttling.check)(request, user)
+        if not allowed:
+            response = JsonResponse({'error': 'Too many questions, please wait a moment.'}, status=429)
+            response['Retry-After'] = str(int(wait) + 1)
+            return response
+
+        session, history = await sync_to_async(memory.load_conversation)(session_key, user)
+        answer = await sync_to_async(prepare_answer)(message, user, history=history)
+        # Keyless requests are one-off questions: no session is created for them
+        conversation = (session, bool(session_key))
+        response = StreamingHttpResponse(
+            self.events(message, answer, user, conversation), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # don't let a proxy buffer the stream
+        return response
+
+    async def events(self, message, answer, user, conversation):
+        if answer['reply'] is not None:
+            # FAQ or cached reply: nothing to wait for
+            yield _sse('token', {'text': answer['reply']})
+            yield await self.done(message, answer['reply'], answer['source'], user, conversation)
+            return
+
+        # The same question already streaming for someone else: wait for that reply
+        key = flight_key(message, answer['context'])
+        flight, leader = stream_flights.join(key)
+        if not leader:
+            try:
+                reply = await asyncio.wait_for(asyncio.shield(flight), settings.CHATBOT_STREAM_DEADLINE)
+            except Exception:
+                yield _sse('error', {'error': 'The assistant could not answer, please try again.'})
+                return
+            yield _sse('token', {'text': reply})
+            yield await self.done(message, reply, 'llm', user, conversation)
+            return
+
+        started = time.monotonic()
+        parts = []
+        reply = error = None
+        try:
+            async for text in llm.stream(answer['prompt']):
+                parts.append(text)
+                yield _sse('token', {'text': text})
+            reply = ''.join(parts)
+        except llm.LLMBusy as e:
+            error = str(e)
+        except TimeoutError:
+            error = 'The assistant took too long to answer.'
+        except llm.MissingAPIKey:
+            print("CRITICAL: Missing API Key in settings")
+            error = 'Missing API Key'
+        except Exception as e:
+            print(f"CRITICAL CHATBOT ERROR: {str(e)}")
+            error = str(e)
+        finally:
+            # Also runs when the client disconnects mid-stream, so anyone
+            # waiting on this flight is always released
+            if reply is None:
+                stream_flights.fail(key, flight, RuntimeError(error or 'Client disconnected'))
             else:
-                # Regular members see 'all' + 'participant'
-                filters |= Q(target_role='participant')
-        
-        # --- GUEST LOGIC ---
-        # We removed the 'else' block. 
-        # If they are not logged in, they only keep the base filter (target_role='all').
-
-        return FAQ.objects.filter(filters).distinct()
\ No newline at end of file
+                stream_flights.finish(key, flight, reply)
+
+        if error is not None:
+            yield _sse('error', {'error': error})
+            return
+        await sync_to_async(remember_reply)(message, answer, reply, time.monotonic() - started)
+        yield await self.done(message, reply, 'llm', user, conversation)
+
+    async def done(self, message, reply, source, user, conversation):
+        """Saves the turn to the conversation (if there is one); the final event."""
+        session, start = conversation
+        session = await sync_to_async(memory.record_turn)(session, user, message, reply, source, start=start)
+        return _sse('done', {'source': source, 'session': str(session.key) if session else None})
+
+
+class ChatbotStatsView(APIView):
+    """
+    GET /api/chatbot/stats/
+    Throttling, request coalescing and LLM queue counters, plus the reply
+    cache, for this worker process.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'limits': metrics.snapshot(),
+            'responses': response_cache.stats(),
+        })
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0002_donation_rejection_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='media_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
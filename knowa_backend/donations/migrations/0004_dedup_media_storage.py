@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:04
+
+from django.db import migrations, models
+import knowa_server.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0003_media_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='donation',
+            name='receipt',
+            field=models.FileField(storage=knowa_server.storage.DedupStorage(), upload_to='donation_receipts/'),
+        ),
+    ]
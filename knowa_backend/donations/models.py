@@ -1,6 +1,7 @@
 # donations/models.py
 from django.db import models
 from django.conf import settings
+from knowa_server.storage import dedup_storage
 
 class DonationStatus(models.TextChoices):
         PENDING = 'PENDING', 'Pending'
@@ -20,7 +21,10 @@ class Donation(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
 
     # The uploaded receipt
-    receipt = models.FileField(upload_to='donation_receipts/')
+    receipt = models.FileField(upload_to='donation_receipts/', storage=dedup_storage)  # one copy per distinct file
+    # Resized copies of the receipt when it is a photo (knowa_server/media.py)
+    media_variants = models.JSONField(default=dict, blank=True, editable=False)
+    MEDIA_FIELDS = ('receipt',)
 
     # The admin-verified status
     status = models.CharField(
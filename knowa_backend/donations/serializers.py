@@ -2,6 +2,7 @@
 from rest_framework import serializers
 from .models import Donation
 from users.models import User
+from knowa_server.media import media_url
 
 # Serializer for a user to SUBMIT a new donation
 class DonationCreateSerializer(serializers.ModelSerializer):
@@ -19,6 +20,8 @@ class DonationAdminSerializer(serializers.ModelSerializer):
 
     # Build the full, clickable URL for the receipt
     receipt_url = serializers.SerializerMethodField()
+    # Resized copy of a photographed receipt, for the review list (None for PDFs or until ready)
+    receipt_preview_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Donation
@@ -28,6 +31,7 @@ class DonationAdminSerializer(serializers.ModelSerializer):
             'username',
             'amount',
             'receipt_url', # Send the URL
+            'receipt_preview_url',
             'status',
             'submitted_at'
         ]
@@ -36,4 +40,7 @@ class DonationAdminSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if obj.receipt and hasattr(obj.receipt, 'url'):
             return request.build_absolute_uri(obj.receipt.url)
-        return None
\ No newline at end of file
+        return None
+
+    def get_receipt_preview_url(self, obj):
+        return media_url(self.context.get('request'), obj, 'receipt', fallback=False)
@@ -0,0 +1,38 @@
+# donations/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from knowa_server.caching import bump_namespace
+from knowa_server.media import media_variants_saved, queue_media_variants
+from knowa_server.storage import release_blobs, track_blobs, update_blob_refs
+from .models import Donation
+
+# The donation goal total only counts approved donations, but a status
+# change is a save, so bump on every save.
+@receiver(post_save, sender=Donation)
+@receiver(post_delete, sender=Donation)
+def donation_changed(sender, **kwargs):
+    bump_namespace('donations')
+
+@receiver(post_save, sender=Donation)
+def receipt_uploaded(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue_media_variants(instance)  # a preview of photographed receipts
+
+@receiver(media_variants_saved, sender=Donation)
+def receipt_resized(sender, **kwargs):
+    bump_namespace('donations')
+
+# --- DEDUPLICATED RECEIPTS (knowa_server/storage.py) ---
+# A re-uploaded receipt shares the stored file; these keep its use count
+
+@receiver(pre_save, sender=Donation)
+def remember_receipt_blob(sender, instance, update_fields=None, raw=False, **kwargs):
+    track_blobs(instance, update_fields, raw)
+
+@receiver(post_save, sender=Donation)
+def count_receipt_blob(sender, instance, **kwargs):
+    update_blob_refs(instance)
+
+@receiver(post_delete, sender=Donation)
+def release_receipt_blob(sender, instance, **kwargs):
+    release_blobs(instance)
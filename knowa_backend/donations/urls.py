@@ -7,7 +7,8 @@ from .views import (
     RejectDonationView,
     DonationGoalView,
     UserLatestIssueView,
-    FixDonationView
+    FixDonationView,
+    DonationExportView
 )
 
 urlpatterns = [
@@ -28,6 +29,9 @@ urlpatterns = [
     # POST /api/donations/admin/reject/<id>/
     path('admin/reject/<int:pk>/', RejectDonationView.as_view(), name='donation-reject'),
 
+    # GET /api/donations/admin/export/?year=&status=&type=csv|xlsx
+    path('admin/export/', DonationExportView.as_view(), name='donation-export'),
+
     path('my-latest-issue/', UserLatestIssueView.as_view(), name='my-latest-issue'),
 
     path('<int:pk>/fix/', FixDonationView.as_view(), name='fix-donation'),
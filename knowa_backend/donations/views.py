@@ -8,6 +8,8 @@ from django.db.models import Sum
 from django.shortcuts import get_object_or_404
 from rest_framework.parsers import MultiPartParser, FormParser
 from users.utils import notify_all_admins
+from knowa_server.caching import cache_response, conditional_get
+from knowa_server.exports import export_response
 
 # 1. API for a user to CREATE a new donation
 class DonationCreateView(generics.CreateAPIView):
@@ -89,6 +91,8 @@ class DonationGoalView(APIView):
     """
     permission_classes = [permissions.AllowAny] # Anyone can see this
 
+    @conditional_get('donations')
+    @cache_response('donations', timeout=10 * 60)
     def get(self, request, format=None):
         # Calculate the sum of all APPROVED donations
         total_donated = Donation.objects.filter(
@@ -146,4 +150,43 @@ class FixDonationView(APIView):
             donation.save()
             return Response({'status': 'fixed', 'message': 'Receipt updated successfully'}, status=status.HTTP_200_OK)
             
-        return Response({'error': 'No receipt file provided'}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response({'error': 'No receipt file provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+# 8. API for an ADMIN to download donations as CSV / XLSX
+class DonationExportView(APIView):
+    """
+    GET /api/donations/admin/export/?year=2025&status=APPROVED&type=csv|xlsx
+    Streams every matching donation (year-end donor reports), oldest first.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    COLUMNS = [
+        ('Donation ID', 'id'),
+        ('Submitted At', 'submitted_at'),
+        ('Username', 'user__username'),
+        ('Name', 'user__first_name'),
+        ('Email', 'user__email'),
+        ('Amount (RM)', 'amount'),
+        ('Status', 'status'),
+        ('Rejection Reason', 'rejection_reason'),
+    ]
+
+    def get(self, request):
+        donations = Donation.objects.all()
+        filename = 'donations'
+
+        donation_status = request.query_params.get('status')
+        if donation_status:
+            if donation_status not in DonationStatus.values:
+                return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+            donations = donations.filter(status=donation_status)
+            filename += f"-{donation_status.lower()}"
+
+        year = request.query_params.get('year')
+        if year:
+            if not year.isdigit():
+                return Response({'error': 'Invalid year'}, status=status.HTTP_400_BAD_REQUEST)
+            donations = donations.filter(submitted_at__year=int(year))
+            filename += f"-{year}"
+
+        return export_response(request, donations, self.COLUMNS, filename)
@@ -0,0 +1,46 @@
+# events/invites.py
+# Meeting invite pipeline: adds invitees with one bulk insert into the
+# participants through-table and notifies only the people who are new.
+from users.audiences import audience_user_ids, bulk_add_members
+from users.utils import notify_user_ids
+from .models import Meeting
+
+
+def invite_to_meeting(meeting, user_ids=(), audiences=(), notify=True):
+    """
+    Adds explicit `user_ids` plus everyone in `audiences` (see users.audiences)
+    to the meeting. Returns the ids that were newly invited.
+    Costs a fixed number of queries regardless of how many people are invited.
+    """
+    if not user_ids and not audiences:
+        return []
+
+    # 1. Resolve everyone in SQL, minus the organizer and people already invited
+    already = Meeting.participants.through.objects.filter(meeting_id=meeting.id).values('user_id')
+    new_ids = list(
+        audience_user_ids(audiences, user_ids, exclude_ids=[meeting.organizer_id])
+        .exclude(pk__in=already)
+    )
+    if not new_ids:
+        return []
+
+    # 2. One INSERT into the through-table
+    bulk_add_members(Meeting.participants, meeting.id, new_ids)
+
+    # 3. One INSERT for all the invite notifications
+    if notify:
+        when = meeting.start_time.strftime('%b %d, %I:%M %p')
+        notify_user_ids(
+            new_ids,
+            f"Meeting Invitation: {meeting.title}",
+            f"You have been invited to '{meeting.title}' on {when}.",
+            "INFO",
+        )
+    return new_ids
+
+
+def set_meeting_invitees(meeting, user_ids=(), audiences=(), notify=True):
+    """Makes the invite list exactly `user_ids` + `audiences` (used by PUT/PATCH)."""
+    keep = audience_user_ids(audiences, user_ids)
+    Meeting.participants.through.objects.filter(meeting_id=meeting.id).exclude(user_id__in=keep).delete()
+    return invite_to_meeting(meeting, user_ids, audiences, notify=notify)
@@ -0,0 +1,100 @@
+# events/management/commands/benchmark_event_queries.py
+# Seeds a large batch of synthetic events and times the hot time-range queries.
+# Everything runs inside a transaction that is rolled back, so no data is kept.
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from events.models import Event
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks event time-range queries (listing, overlap, reminders) against N synthetic events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000, help='Number of synthetic events to seed')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query (best/avg reported)')
+
+    def handle(self, *args, **options):
+        total = options['events']
+        batch_size = options['batch_size']
+        repeat = options['repeat']
+
+        try:
+            with transaction.atomic():
+                self.seed(total, batch_size)
+                self.run_queries(repeat)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write("Synthetic events rolled back.")
+
+    # --- 1. SEED ---
+    def seed(self, total, batch_size):
+        self.stdout.write(f"Seeding {total:,} events...")
+        now = timezone.now()
+        statuses = [choice for choice, _ in Event.EventStatus.choices]
+        rng = random.Random(42)
+        started = time.perf_counter()
+
+        created = 0
+        while created < total:
+            batch = []
+            for _ in range(min(batch_size, total - created)):
+                # Spread events over two years around "now", 1-8 hours long
+                start = now + timedelta(minutes=rng.randint(-525_600, 525_600))
+                batch.append(Event(
+                    title='Benchmark event',
+                    description='',
+                    start_time=start,
+                    end_time=start + timedelta(hours=rng.randint(1, 8)),
+                    status=rng.choice(statuses),
+                ))
+            Event.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    # --- 2. QUERIES ---
+    def run_queries(self, repeat):
+        now = timezone.now()
+        day = timedelta(days=1)
+        queries = {
+            'public listing (first page)': lambda: list(
+                Event.objects.published().upcoming(now)[:20]
+            ),
+            'overlapping next 7 days': lambda: list(
+                Event.objects.overlapping(now, now + 7 * day).values_list('id', flat=True)
+            ),
+            'reminder window (24h)': lambda: list(
+                Event.objects.published().starting_between(now, now + day).values_list('id', flat=True)
+            ),
+            'chatbot upcoming (3)': lambda: list(
+                Event.objects.published().upcoming(now).only('title', 'start_time', 'location')[:3]
+            ),
+            'dashboard active count': lambda: Event.objects.published().filter(end_time__gte=now).count(),
+        }
+
+        for label, query in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{label:<30} best {min(timings):8.2f} ms   avg {sum(timings) / len(timings):8.2f} ms"
+            )
+
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                sql, params = Event.objects.published().upcoming(now)[:20].query.sql_with_params()
+                cursor.execute(f"EXPLAIN {sql}", params)
+                self.stdout.write(f"EXPLAIN public listing: {cursor.fetchall()}")
@@ -2,6 +2,54 @@
 # defines the Event model, tells Django what an event is and what information it has
 from django.db import models
 from django.conf import settings 
+from django.utils import timezone
+
+
+# --- TIME-RANGE QUERIES ---
+# Shared by Event and Meeting so every listing, reminder run and dashboard
+# filters on start_time/end_time the same way (and hits the same indexes).
+class TimeRangeQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        """
+        Rows whose [start_time, end_time) overlaps the half-open window [start, end).
+        Either bound may be None to leave that side open.
+        """
+        qs = self
+        if end is not None:
+            qs = qs.filter(start_time__lt=end)
+        if start is not None:
+            qs = qs.filter(end_time__gt=start)
+        return qs
+
+    def starting_between(self, after, until):
+        """Rows that start after `after` and no later than `until` (reminder windows)."""
+        return self.filter(start_time__gt=after, start_time__lte=until)
+
+    def upcoming(self, now=None):
+        """Rows that have not started yet, soonest first."""
+        if now is None:
+            now = timezone.now()
+        return self.filter(start_time__gte=now).order_by('start_time')
+
+
+class EventQuerySet(TimeRangeQuerySet):
+    def published(self):
+        return self.filter(status=Event.EventStatus.PUBLISHED)
+
+    def for_user(self, user):
+        """Events the user organizes, joined as a participant or crews."""
+        return self.filter(
+            models.Q(participants=user) | models.Q(crew=user) | models.Q(organizer=user)
+        ).distinct()
+
+
+class MeetingQuerySet(TimeRangeQuerySet):
+    def for_user(self, user):
+        """Meetings the user organizes or was invited to."""
+        return self.filter(
+            models.Q(participants=user) | models.Q(organizer=user)
+        ).distinct()
+
 
 class Event(models.Model):
     # --- NEW STATUS CHOICES ---
@@ -17,6 +65,9 @@ class Event(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     event_image = models.ImageField(upload_to='event_images/', blank=True, null=True)
+    # Resized copies of the image above (knowa_server/media.py)
+    media_variants = models.JSONField(default=dict, blank=True, editable=False)
+    MEDIA_FIELDS = ('event_image',)
     organizer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL, 
@@ -49,6 +100,18 @@ class Event(models.Model):
     calendar_link = models.URLField(max_length=500, blank=True, null=True) # For "Calendar Link"
     is_online = models.BooleanField(default=False) # For "Online" / "Offline"
 
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Public listing / chatbot / reminders: status filter + start_time range & ordering
+            models.Index(fields=['status', 'start_time'], name='event_status_start_idx'),
+            # Overlap queries: start_time < to AND end_time > from
+            models.Index(fields=['start_time', 'end_time'], name='event_time_range_idx'),
+            # Dashboard "active events": status + end_time >= now
+            models.Index(fields=['status', 'end_time'], name='event_status_end_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -77,5 +140,12 @@ class Meeting(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = MeetingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_time', 'end_time'], name='meeting_time_range_idx'),
+        ]
+
     def __str__(self):
         return f"Meeting: {self.title}"
\ No newline at end of file
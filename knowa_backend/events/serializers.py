@@ -3,7 +3,10 @@
 # This file controls what event info is sent to users and how new events are created
 from rest_framework import serializers
 from .models import Event, Meeting
+from .invites import invite_to_meeting, set_meeting_invitees
+from users.audiences import is_valid_audience
 from users.models import User
+from knowa_server.media import media_url, media_variant_urls
 from django.utils import timezone
 
 class EventSerializer(serializers.ModelSerializer):
@@ -12,8 +15,11 @@ class EventSerializer(serializers.ModelSerializer):
         default=serializers.CurrentUserDefault()
     )
 
-    # --- A field that builds the full URL ---
+    # --- Fields that build the full URLs ---
+    # event_image_url is the 'medium' copy (knowa_server/media.py), not the multi-MB upload
     event_image_url = serializers.SerializerMethodField()
+    event_image_thumb_url = serializers.SerializerMethodField()
+    event_image_variants = serializers.SerializerMethodField()
 
     participants_count = serializers.SerializerMethodField()
     crew_count = serializers.SerializerMethodField()
@@ -30,6 +36,8 @@ class EventSerializer(serializers.ModelSerializer):
             'end_time', 
             'event_image',
             'event_image_url', # <-- We will use this new field
+            'event_image_thumb_url',
+            'event_image_variants',
 
             'organizer',
             'organizer_username',
@@ -46,6 +54,8 @@ class EventSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'organizer_username', 
             'event_image_url', 
+            'event_image_thumb_url',
+            'event_image_variants',
             'participants_count', 
             'crew_count'
         ]
@@ -53,12 +63,15 @@ class EventSerializer(serializers.ModelSerializer):
 
     # --- The function that builds the full URL ---
     def get_event_image_url(self, obj):
-        # Get the 'request' object from the context
-        request = self.context.get('request')
-        if obj.event_image and hasattr(obj.event_image, 'url'):
-            # Build the full, absolute URL (e.g., http://.../media/...)
-            return request.build_absolute_uri(obj.event_image.url)
-        return None # Return null if no image
+        # Full, absolute URL (e.g., http://.../media/...); the original until the copy is ready
+        return media_url(self.context.get('request'), obj, 'event_image')
+
+    def get_event_image_thumb_url(self, obj):
+        return media_url(self.context.get('request'), obj, 'event_image', size='thumb')
+
+    def get_event_image_variants(self, obj):
+        # Every size and format (WebP/JPEG), for clients that pick their own
+        return media_variant_urls(self.context.get('request'), obj, 'event_image')
     
     # --- The function that counts participants ---
     def get_participants_count(self, obj):
@@ -98,16 +111,62 @@ class EventSerializer(serializers.ModelSerializer):
             
         return False
     
+def validate_audience_keys(value):
+    invalid = [key for key in value if not is_valid_audience(key)]
+    if invalid:
+        raise serializers.ValidationError(f"Unknown audience(s): {', '.join(invalid)}")
+    return value
+
+class MeetingInviteSerializer(serializers.Serializer):
+    """Input of MeetingInviteView: the same invite fields as MeetingSerializer."""
+    participants = serializers.ListField(child=serializers.IntegerField(), required=False)
+    invite_groups = serializers.ListField(
+        child=serializers.CharField(), required=False, validators=[validate_audience_keys]
+    )
+
 class MeetingSerializer(serializers.ModelSerializer):
     participant_count = serializers.SerializerMethodField()
 
+    # Write-only invite inputs. Plain id lists (instead of a related field) so
+    # a large invite list is not validated one query per id.
+    participants = serializers.ListField(
+        child=serializers.IntegerField(), write_only=True, required=False
+    )
+    invite_groups = serializers.ListField(
+        child=serializers.CharField(), write_only=True, required=False,
+        validators=[validate_audience_keys],
+        help_text="Audience keys, e.g. MEMBER, VOLUNTEER, EVENT_CREW:<id>"
+    )
+
     class Meta:
         model = Meeting
         fields = [
             'id', 'title', 'description', 'start_time', 'end_time', 
-            'is_online', 'location', 'participant_count', 'participants'
+            'is_online', 'location', 'participant_count', 'participants', 'invite_groups'
         ]
-        extra_kwargs = {'participants': {'write_only': True}}
 
     def get_participant_count(self, obj):
-        return obj.participants.count()
\ No newline at end of file
+        # Listings annotate this; fall back to a COUNT for single objects
+        annotated = getattr(obj, 'participant_total', None)
+        if annotated is not None:
+            return annotated
+        return obj.participants.count()
+
+    def create(self, validated_data):
+        participant_ids = validated_data.pop('participants', [])
+        groups = validated_data.pop('invite_groups', [])
+        meeting = Meeting.objects.create(**validated_data)
+        invite_to_meeting(meeting, participant_ids, groups)
+        return meeting
+
+    def update(self, instance, validated_data):
+        participant_ids = validated_data.pop('participants', None)
+        groups = validated_data.pop('invite_groups', [])
+        instance = super().update(instance, validated_data)
+        if participant_ids is not None:
+            set_meeting_invitees(instance, participant_ids, groups)
+        elif groups:
+            invite_to_meeting(instance, audiences=groups)
+        # Any annotated count is stale now
+        instance.participant_total = None
+        return instance
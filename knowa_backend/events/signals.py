@@ -0,0 +1,28 @@
+# events/signals.py
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from knowa_server.caching import bump_namespace
+from knowa_server.media import media_variants_saved, queue_media_variants
+from .models import Event
+
+# Cached event lists/details include counts and "is_joined",
+# so any change to an event or its members invalidates them.
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed(sender, **kwargs):
+    bump_namespace('events')
+
+@receiver(post_save, sender=Event)
+def event_image_uploaded(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue_media_variants(instance)  # thumbnails for the event lists
+
+@receiver(media_variants_saved, sender=Event)
+def event_image_resized(sender, **kwargs):
+    bump_namespace('events')
+
+@receiver(m2m_changed, sender=Event.participants.through)
+@receiver(m2m_changed, sender=Event.crew.through)
+def event_members_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_namespace('events')
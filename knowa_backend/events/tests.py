@@ -1,3 +1,251 @@
+# events/tests.py
+# Response caching of the public event endpoints (knowa_server/caching.py),
+# run against the local-memory cache used when REDIS_URL is not set, the
+# ?from= / ?to= calendar window, input checks of the meeting invite endpoint,
+# resized copies of event images (knowa_server/media.py), and the admin
+# export (knowa_server/exports.py).
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
 from django.test import TestCase
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+from rest_framework.test import APIClient
+
+from knowa_server import exports, media
+from knowa_server.caching import local_cache
+from users.models import User
+from .models import Event, Meeting
+
+
+class EventCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.client = APIClient()
+        start = timezone.now() + timedelta(days=3)
+        self.event = Event.objects.create(
+            title='Beach Cleanup', description='Bring gloves.',
+            start_time=start, end_time=start + timedelta(hours=3),
+            status=Event.EventStatus.PUBLISHED,
+        )
+
+    def test_second_request_is_a_hit(self):
+        first = self.client.get('/api/events/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        second = self.client.get('/api/events/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+
+    def test_saving_an_event_bumps_the_namespace(self):
+        self.client.get(f'/api/events/{self.event.pk}/')
+        self.assertEqual(self.client.get(f'/api/events/{self.event.pk}/')['X-Cache'], 'HIT')
+
+        self.event.title = 'Beach Cleanup (moved)'
+        self.event.save()  # post_save -> bump_namespace('events')
+
+        response = self.client.get(f'/api/events/{self.event.pk}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['title'], 'Beach Cleanup (moved)')
+
+    def test_matching_etag_gets_304_until_bumped(self):
+        response = self.client.get(f'/api/events/{self.event.pk}/')
+        etag = response['ETag']
+
+        not_modified = self.client.get(f'/api/events/{self.event.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        self.event.title = 'Dune Planting'
+        self.event.save()
+
+        changed = self.client.get(f'/api/events/{self.event.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.json()['title'], 'Dune Planting')
+
+    def test_list_etag_changes_when_an_event_is_added(self):
+        etag = self.client.get('/api/events/')['ETag']
+        self.assertEqual(self.client.get('/api/events/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        start = timezone.now() + timedelta(days=5)
+        Event.objects.create(
+            title='Mangrove Walk', description='Low tide.',
+            start_time=start, end_time=start + timedelta(hours=2),
+            status=Event.EventStatus.PUBLISHED,
+        )
+
+        response = self.client.get('/api/events/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+
+class EventWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.client = APIClient()
+        self.start = (timezone.now() + timedelta(days=10)).replace(microsecond=0)
+        Event.objects.create(
+            title='Reef Survey', description='Snorkels provided.',
+            start_time=self.start, end_time=self.start + timedelta(hours=2),
+            status=Event.EventStatus.PUBLISHED,
+        )
+
+    def test_aware_window_is_converted(self):
+        # Same instant as the naive local value, written with an offset
+        window_from = timezone.make_aware(self.start - timedelta(hours=1)).isoformat()
+        window_to = timezone.make_aware(self.start + timedelta(hours=1)).isoformat()
+        response = self.client.get('/api/events/', {'from': window_from, 'to': window_to})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event['title'] for event in response.json()], ['Reef Survey'])
+
+        later = timezone.make_aware(self.start + timedelta(hours=3)).isoformat()
+        response = self.client.get('/api/events/', {'from': later})
+        self.assertEqual(response.json(), [])
+
+    def test_naive_and_invalid_values(self):
+        window_from = (self.start - timedelta(days=1)).isoformat()
+        response = self.client.get('/api/events/', {'from': window_from, 'to': 'not-a-date'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+
+class MeetingInviteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser('boss', 'boss@example.com', 'Sup3r-secret!')
+        self.guest = User.objects.create_user('dan', 'dan@example.com', 'Sup3r-secret!')
+        self.client.force_authenticate(self.admin)
+        start = timezone.now() + timedelta(days=2)
+        self.meeting = Meeting.objects.create(
+            title='Volunteer Briefing', start_time=start, end_time=start + timedelta(hours=1),
+            organizer=self.admin,
+        )
+        self.url = f'/api/events/meetings/{self.meeting.pk}/invite/'
+
+    def test_invites_by_id(self):
+        response = self.client.post(self.url, {'participants': [self.guest.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'invited': 1})
+        self.assertTrue(self.meeting.participants.filter(pk=self.guest.pk).exists())
+
+    def test_malformed_input_is_rejected(self):
+        for data in (
+            {'participants': ['dan']},
+            {'participants': self.guest.pk},
+            {'invite_groups': 'MEMBER'},
+            {'invite_groups': ['NOBODY']},
+        ):
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertFalse(self.meeting.participants.exists())
+
+
+class EventImageVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = self.settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        start = timezone.now() + timedelta(days=4)
+        self.event = Event(
+            title='Turtle Watch', description='Red torches only.',
+            start_time=start, end_time=start + timedelta(hours=2),
+            status=Event.EventStatus.PUBLISHED,
+        )
+        self.event.event_image.save('turtle.png', self.png(), save=False)
+        self.event.save()
+
+    def png(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), (30, 120, 90)).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue())
+
+    def variant_files(self):
+        folder = os.path.join(self.media_root, 'event_images', media.VARIANTS_DIR)
+        return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+    def test_variants_are_built_and_recorded(self):
+        media.process_instance('events.Event', self.event.pk)
+        self.event.refresh_from_db()
+        entry = self.event.media_variants['event_image']
+        self.assertEqual(entry['source'], self.event.event_image.name)
+        self.assertEqual(len(self.variant_files()), len(media.SIZES) * len(media.FORMATS))
+
+    def test_copies_of_a_replaced_file_are_removed(self):
+        build_variants = media.build_variants
+
+        def replaced_while_resizing(file_field):
+            entry = build_variants(file_field)
+            Event.objects.filter(pk=self.event.pk).update(event_image='event_images/newer.png')
+            return entry
+
+        with mock.patch.object(media, 'build_variants', replaced_while_resizing):
+            media.process_instance('events.Event', self.event.pk)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.media_variants, {})
+        self.assertEqual(self.variant_files(), [])
+
+
+class EventExportTests(TestCase):
+    TITLES = ['=HYPERLINK("http://evil.example","Click")', '@SUM(A1:A9)', 'Beach Cleanup', 'Mangrove Walk']
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('boss', 'boss@example.com', 'Sup3r-secret!'))
+        start = timezone.now() + timedelta(days=1)
+        for title in self.TITLES:
+            Event.objects.create(
+                title=title, description='', start_time=start, end_time=start + timedelta(hours=1),
+                status=Event.EventStatus.PUBLISHED,
+            )
+
+    def download(self, **params):
+        response = self.client.get('/api/events/admin/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_csv_streams_with_formulas_neutralised(self):
+        response = self.download()
+        self.assertEqual(response['Content-Type'], exports.CSV_TYPE)
+        self.assertIn('events.csv', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('"\'=HYPERLINK(""http://evil.example"",""Click"")"', body)
+        self.assertIn("'@SUM(A1:A9)", body)
+        self.assertEqual(len(body.strip().splitlines()), 1 + len(self.TITLES))
+
+    def test_xlsx_stops_at_the_row_limit(self):
+        with mock.patch.object(exports, 'XLSX_MAX_ROWS', 3):
+            response = self.download(type='xlsx')
+            self.assertEqual(response['Content-Type'], exports.XLSX_TYPE)
+            rows = list(load_workbook(io.BytesIO(b''.join(response.streaming_content))).active.values)
+        # Header, the two rows that fit, then the note
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0][1], 'Title')
+        self.assertEqual([row[1] for row in rows[1:3]], ["'" + self.TITLES[0], "'" + self.TITLES[1]])
+        self.assertTrue(rows[3][0].startswith('TRUNCATED'))
+
+    def test_xlsx_stops_reading_pages_at_the_limit(self):
+        read = []
+
+        def pages():
+            for title in self.TITLES:
+                read.append(title)
+                yield [(title,)]
 
-# Create your tests here.
+        with mock.patch.object(exports, 'XLSX_MAX_ROWS', 3):
+            b''.join(exports.xlsx_chunks(['Title'], pages()))
+        self.assertEqual(read, self.TITLES[:3])
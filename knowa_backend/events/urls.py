@@ -6,8 +6,12 @@ from .views import (
     EventDetailView,
     JoinEventAsParticipantView,  
     JoinEventAsCrewView,
+    LeaveEventView,
     MeetingCreateView,
-    MeetingDetailView        
+    MeetingDetailView,
+    MeetingListView,
+    MeetingInviteView,
+    EventExportView,
 )
 
 urlpatterns = [
@@ -27,6 +31,13 @@ urlpatterns = [
     
     # POST /api/events/1/join-crew/
     path('<int:pk>/join-crew/', JoinEventAsCrewView.as_view(), name='event-join-crew'),
+
+    # POST /api/events/1/leave/
+    path('<int:pk>/leave/', LeaveEventView.as_view(), name='event-leave'),
+    # GET: /api/events/admin/export/ (CSV/XLSX download - Admin only)
+    path('admin/export/', EventExportView.as_view(), name='event-export'),
+    path('meetings/', MeetingListView.as_view(), name='meeting-list'),
     path('meetings/create/', MeetingCreateView.as_view(), name='meeting-create'),
+    path('meetings/<int:pk>/invite/', MeetingInviteView.as_view(), name='meeting-invite'),
     path('meetings/<int:pk>/', MeetingDetailView.as_view(), name='meeting-detail'),
 ]
\ No newline at end of file
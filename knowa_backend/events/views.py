@@ -7,9 +7,34 @@ from rest_framework import status
 from .models import Event
 from .serializers import EventSerializer
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from users.models import User
 from .models import Meeting          
-from .serializers import MeetingSerializer
+from .serializers import MeetingInviteSerializer, MeetingSerializer
+from .invites import invite_to_meeting
+from django.db.models import Count
+from knowa_server.caching import cache_response, conditional_get
+from knowa_server.exports import export_response
+
+def parse_time_window(params):
+    """
+    Reads the optional ?from= and ?to= query params (ISO 8601).
+    Missing or invalid values come back as None (open-ended window).
+    USE_TZ is off, so the database holds naive local times: values with an
+    offset ('...Z', '+08:00') are converted to one.
+    """
+    def _parse(value):
+        if not value:
+            return None
+        try:
+            moment = parse_datetime(value)
+        except ValueError:
+            return None
+        if moment is not None and timezone.is_aware(moment):
+            moment = timezone.make_naive(moment)
+        return moment
+
+    return _parse(params.get('from')), _parse(params.get('to'))
 
 # This view will handle BOTH:
 # 1. GET: Listing all events (for everyone)
@@ -25,6 +50,12 @@ class EventListCreateView(generics.ListCreateAPIView):
         # Anyone can GET (view)
         return [permissions.AllowAny()]
 
+    # Per user because of 'is_joined'; short TTL because "upcoming" moves with the clock
+    @conditional_get('events', vary_on='user', time_bucket=60)
+    @cache_response('events', timeout=60, vary_on='user')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         # This is also correct:
         serializer.save(organizer=self.request.user)
@@ -37,14 +68,17 @@ class EventListCreateView(generics.ListCreateAPIView):
         # Check if the user is logged in AND is an Admin (is_staff)
         if user.is_authenticated and user.is_staff:
             # If they are an Admin, send them ALL events
-            return Event.objects.all().order_by('start_time')
+            queryset = Event.objects.order_by('start_time')
         else:
             # If they are a Public User (or not logged in),
             # send them ONLY Published events that haven't happened yet.
-            return Event.objects.filter(
-                status=Event.EventStatus.PUBLISHED,
-                start_time__gte=timezone.now() # gte = "greater than or equal to now"
-            ).order_by('start_time')
+            queryset = Event.objects.published().upcoming()
+
+        # Optional calendar window: ?from=...&to=... returns events overlapping [from, to)
+        window_start, window_end = parse_time_window(self.request.query_params)
+        if window_start or window_end:
+            queryset = queryset.overlapping(window_start, window_end)
+        return queryset
 
 
 # This view will handle GET, PUT, DELETE for a single event
@@ -64,6 +98,11 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_serializer_context(self):
         # Pass the request context to the serializer
         return {'request': self.request}
+
+    @conditional_get('events', vary_on='user')
+    @cache_response('events', timeout=300, vary_on='user')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
 # 3. View for a PUBLIC user to join as a PARTICIPANT
 class JoinEventAsParticipantView(APIView):
@@ -123,6 +162,67 @@ class JoinEventAsCrewView(APIView):
         event.crew.add(user)
         return Response({'status': 'Successfully registered as crew.'}, status=status.HTTP_200_OK)
     
+# 5. View for a user to LEAVE an event (participant or crew)
+class LeaveEventView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk, format=None):
+        try:
+            event = Event.objects.get(pk=pk)
+        except Event.DoesNotExist:
+            return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        user = request.user
+        was_participant = event.participants.filter(pk=user.pk).exists()
+        was_crew = event.crew.filter(pk=user.pk).exists()
+        if not was_participant and not was_crew:
+            return Response({'error': 'You have not joined this event.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Activity counters are adjusted by the m2m_changed signal (users/signals.py)
+        if was_participant:
+            event.participants.remove(user)
+        if was_crew:
+            event.crew.remove(user)
+        return Response({'status': 'Successfully left the event.'}, status=status.HTTP_200_OK)
+
+class MeetingListView(generics.ListAPIView):
+    """
+    Lists meetings (soonest first) with participant counts computed in the same query.
+    """
+    serializer_class = MeetingSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_queryset(self):
+        queryset = Meeting.objects.annotate(participant_total=Count('participants')).order_by('start_time')
+        window_start, window_end = parse_time_window(self.request.query_params)
+        if window_start or window_end:
+            queryset = queryset.overlapping(window_start, window_end)
+        return queryset
+
+class MeetingInviteView(APIView):
+    """
+    POST {"participants": [ids], "invite_groups": ["MEMBER", "VOLUNTEER", "EVENT_CREW:<id>"]}
+    Adds invitees to an existing meeting in bulk.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, pk):
+        try:
+            meeting = Meeting.objects.get(pk=pk)
+        except Meeting.DoesNotExist:
+            return Response({'error': 'Meeting not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = MeetingInviteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        new_ids = invite_to_meeting(
+            meeting,
+            serializer.validated_data.get('participants', []),
+            serializer.validated_data.get('invite_groups', []),
+        )
+        return Response({'invited': len(new_ids)}, status=status.HTTP_200_OK)
+
 class MeetingCreateView(generics.CreateAPIView):
     """
     Allows Admins to create a new meeting with selected participants.
@@ -139,6 +239,51 @@ class MeetingDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Handles GET, PUT, PATCH, DELETE for a specific meeting.
     """
-    queryset = Meeting.objects.all()
+    queryset = Meeting.objects.annotate(participant_total=Count('participants'))
     serializer_class = MeetingSerializer
-    permission_classes = [permissions.IsAdminUser] # Only Admins can edit/delete
\ No newline at end of file
+    permission_classes = [permissions.IsAdminUser] # Only Admins can edit/delete
+
+class EventExportView(APIView):
+    """
+    GET /api/events/admin/export/?year=2025&status=COMPLETED&type=csv|xlsx
+    Streams events with their sign-up counts as a CSV (or XLSX) download.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    COLUMNS = [
+        ('Event ID', 'id'),
+        ('Title', 'title'),
+        ('Status', 'status'),
+        ('Start', 'start_time'),
+        ('End', 'end_time'),
+        ('Location', 'location'),
+        ('Online', 'is_online'),
+        ('Organizer', 'organizer__username'),
+        ('Participants', 'participant_count'),
+        ('Participant Capacity', 'capacity_participants'),
+        ('Crew', 'crew_count'),
+        ('Crew Capacity', 'capacity_crew'),
+    ]
+
+    def get(self, request):
+        events = Event.objects.annotate(
+            participant_count=Count('participants', distinct=True),
+            crew_count=Count('crew', distinct=True),
+        )
+        filename = 'events'
+
+        event_status = request.query_params.get('status')
+        if event_status:
+            if event_status not in Event.EventStatus.values:
+                return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+            events = events.filter(status=event_status)
+            filename += f"-{event_status.lower()}"
+
+        year = request.query_params.get('year')
+        if year:
+            if not year.isdigit():
+                return Response({'error': 'Invalid year'}, status=status.HTTP_400_BAD_REQUEST)
+            events = events.filter(start_time__year=int(year))
+            filename += f"-{year}"
+
+        return export_response(request, events, self.COLUMNS, filename)
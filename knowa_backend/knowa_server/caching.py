@@ -0,0 +1,244 @@
+# knowa_server/caching.py
+# Project-wide caching layer.
+#
+# Two tiers:
+#   1. a small per-process LRU (no network, a few seconds of freshness)
+#   2. the shared Django cache (Redis, or a database table; see settings.CACHES)
+#
+# Invalidation is by namespace version: every key is built with the current
+# version of its namespace ("events", "faqs", ...), and bump_namespace() makes
+# all of them unreachable at once. Versions are always read from the shared
+# tier, so a bump made by one worker is seen by every other worker at once.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.core.cache import cache as shared_cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+LOCAL_MAX_ENTRIES = 512
+LOCAL_TTL = 5  # seconds; also the most a local entry can outlive its shared copy
+
+
+# --- 1. LOCAL (PER-PROCESS) TIER ---
+
+class LocalLRU:
+    """Thread-safe LRU with a per-entry expiry."""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=LOCAL_TTL):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalLRU()
+
+
+# --- 2. HIT / MISS METRICS ---
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _count(namespace, outcome):
+    with _stats_lock:
+        counters = _stats.setdefault(namespace, {'local_hits': 0, 'shared_hits': 0, 'misses': 0})
+        counters[outcome] += 1
+
+
+def cache_stats():
+    """{namespace: {local_hits, shared_hits, misses, hit_rate}} for this process."""
+    with _stats_lock:
+        snapshot = {namespace: dict(counters) for namespace, counters in _stats.items()}
+    for counters in snapshot.values():
+        total = counters['local_hits'] + counters['shared_hits'] + counters['misses']
+        counters['hit_rate'] = round((total - counters['misses']) / total, 3) if total else None
+    return snapshot
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# --- 3. NAMESPACE VERSIONS ---
+
+def _version_key(namespace):
+    return f"ns-version:{namespace}"
+
+
+def namespace_version(namespace):
+    return namespace_versions(namespace)[namespace]
+
+
+def namespace_versions(*namespaces):
+    """
+    {namespace: version} in one round trip. A version is the time_ns() of the
+    last bump; a namespace seen for the first time starts at "now".
+    """
+    found = shared_cache.get_many([_version_key(namespace) for namespace in namespaces])
+    versions = {}
+    for namespace in namespaces:
+        version = found.get(_version_key(namespace))
+        if version is None:
+            shared_cache.add(_version_key(namespace), time.time_ns(), None)
+            version = shared_cache.get(_version_key(namespace))
+        versions[namespace] = version
+    return versions
+
+
+def bump_namespace(*namespaces):
+    """Invalidates every key built under these namespaces."""
+    # Time-based stamps never repeat, even if a version key was evicted
+    stamp = time.time_ns()
+    shared_cache.set_many({_version_key(namespace): stamp for namespace in namespaces}, None)
+
+
+def versioned_key(namespace, *parts):
+    return ':'.join([namespace, str(namespace_version(namespace))] + [str(part) for part in parts])
+
+
+# --- 4. TWO-TIER GET / SET ---
+
+def cache_get(namespace, key):
+    value = local_cache.get(key)
+    if value is not None:
+        _count(namespace, 'local_hits')
+        return value
+    value = shared_cache.get(key)
+    if value is not None:
+        _count(namespace, 'shared_hits')
+        local_cache.set(key, value)
+        return value
+    _count(namespace, 'misses')
+    return None
+
+
+def cache_set(namespace, key, value, timeout):
+    shared_cache.set(key, value, timeout)
+    local_cache.set(key, value, min(LOCAL_TTL, timeout))
+
+
+def cache_get_or_build(namespace, key, build, timeout):
+    value = cache_get(namespace, key)
+    if value is None:
+        value = build()
+        cache_set(namespace, key, value, timeout)
+    return value
+
+
+# --- 5. DRF RESPONSE CACHING ---
+
+def _audience(request, vary_on):
+    user = request.user
+    if not user or not user.is_authenticated:
+        return 'anon'
+    if vary_on == 'user':
+        return f"user-{user.pk}"
+    if vary_on == 'role':
+        return 'staff' if (user.is_staff or user.is_superuser) else 'member'
+    return 'any'
+
+
+def cache_response(namespace, timeout=60, vary_on=None):
+    """
+    Caches the data of a successful GET response of a DRF view method.
+
+    vary_on: None  - one copy for everyone
+             'role' - separate copies for guests, members and staff
+             'user' - separate copy per logged-in user (guests share one)
+    The key also includes the host (absolute URLs) and the full path with
+    query string. Bump the namespace to invalidate.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            key = versioned_key(
+                namespace, 'response', request.get_host(), request.get_full_path(),
+                _audience(request, vary_on),
+            )
+            data = cache_get(namespace, key)
+            if data is not None:
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache_set(namespace, key, response.data, timeout)
+                response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+# --- 6. CONDITIONAL GET (ETag / Last-Modified) ---
+
+def conditional_get(*namespaces, vary_on=None, time_bucket=None):
+    """
+    Adds ETag and Last-Modified to a DRF GET view method and answers
+    If-None-Match / If-Modified-Since with 304 *before* the view runs, so an
+    unchanged resource costs two cache reads and no queries or serialization.
+
+    The validators come from the namespace versions (bumped by signals), the
+    caller's audience (see cache_response) and the request path. Responses
+    that change with the clock ("upcoming events") pass `time_bucket`
+    seconds so the ETag rolls over at least that often.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            versions = namespace_versions(*namespaces)
+            changed_at = max(versions.values()) / 1e9
+            parts = [request.get_full_path(), _audience(request, vary_on)]
+            parts += [f"{namespace}={versions[namespace]}" for namespace in namespaces]
+            if time_bucket:
+                bucket = int(time.time() // time_bucket)
+                parts.append(f"t={bucket}")
+                changed_at = max(changed_at, bucket * time_bucket)
+
+            etag = quote_etag(hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest())
+            last_modified = int(changed_at)
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_method(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            if vary_on:
+                patch_vary_headers(response, ['Authorization'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+# knowa_server/exports.py
+# Streaming CSV / XLSX downloads for the admin export endpoints.
+#
+# Rows are read in keyset pages ("id > last id, LIMIT n") of a values_list()
+# projection, so memory stays the same whatever the row count. A plain
+# .iterator() is not enough on its own: MySQL's driver buffers the whole
+# result set client-side, so a 1M-row year-end report would still be loaded
+# at once.
+#
+# Under ASGI (the Procfile) the body has to be an async iterator, otherwise
+# Django collects the whole response in memory before sending it. Under WSGI
+# (runserver) it has to be a sync one. stream_response() picks.
+#
+# Text cells come from users (names, addresses, donation notes). Excel and
+# Sheets run a cell starting with = + - @ (or a tab / carriage return before
+# one) as a formula, so those get a leading ' and open as plain text.
+import csv
+import os
+import tempfile
+
+import openpyxl
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+CHUNK_SIZE = 2000
+XLSX_MAX_ROWS = 1048575  # Excel's sheet limit, minus the header row
+
+CSV_TYPE = 'text/csv'
+XLSX_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+# --- 1. READING ---
+
+def iterate_rows(queryset, fields, chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of value tuples (one list per page) for `fields`, in primary
+    key order. The pk is always fetched for paging but not returned.
+    """
+    last_pk = None
+    while True:
+        page = queryset.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        rows = list(page.values_list('pk', *fields)[:chunk_size].iterator(chunk_size=chunk_size))
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield [row[1:] for row in rows]
+        if len(rows) < chunk_size:
+            return
+
+
+# --- 2. FILE FORMATS ---
+
+def safe_cell(value):
+    """Text a spreadsheet would read as a formula, made literal with a leading '."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _safe_rows(rows, format_row=None):
+    for row in rows:
+        if format_row:
+            row = format_row(row)
+        yield [safe_cell(value) for value in row]
+
+
+def csv_chunks(header, pages, format_row=None):
+    """One CSV text chunk per page of rows."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for rows in pages:
+        yield ''.join(writer.writerow(row) for row in _safe_rows(rows, format_row))
+
+
+def xlsx_chunks(header, pages, format_row=None, title='Export'):
+    """
+    The workbook is written row by row to a temporary file (openpyxl's
+    write-only mode keeps memory flat), then sent in blocks. Past Excel's
+    row limit the export stops, and a final row says it was cut off.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(header)
+    # The sheet's last row is kept for the note on a cut-off export
+    limit = XLSX_MAX_ROWS - 1
+    written = 0
+    truncated = False
+    for rows in pages:
+        for row in _safe_rows(rows, format_row):
+            if written == limit:
+                truncated = True
+                break
+            sheet.append(row)
+            written += 1
+        if truncated:
+            break  # no more pages are read
+    if truncated:
+        sheet.append([f"TRUNCATED: only the first {limit:,} rows fit in a spreadsheet. Download the CSV for every row."])
+
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as xlsx_file:
+            while True:
+                block = xlsx_file.read(64 * 1024)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(path)
+
+
+# --- 3. RESPONSE ---
+
+def _next_chunk(chunks):
+    return next(chunks, None)
+
+
+async def _async_chunks(chunks):
+    # Each step runs in Django's sync thread, where the database connection lives
+    chunks = iter(chunks)
+    while True:
+        chunk = await sync_to_async(_next_chunk)(chunks)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def stream_response(request, chunks, content_type, filename):
+    """Streams `chunks` as a file download without buffering it."""
+    django_request = getattr(request, '_request', request)  # DRF Request -> HttpRequest
+    if isinstance(django_request, ASGIRequest):
+        chunks = _async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def export_response(request, queryset, columns, filename, format_row=None):
+    """
+    CSV (default) or XLSX (?type=xlsx) download of `queryset`.
+    columns: [(header, field lookup), ...]; format_row(tuple) may tidy values.
+    """
+    header = [title for title, _ in columns]
+    pages = iterate_rows(queryset, [field for _, field in columns])
+    if request.query_params.get('type') == 'xlsx':
+        chunks = xlsx_chunks(header, pages, format_row, title=filename[:31])
+        return stream_response(request, chunks, XLSX_TYPE, f"{filename}.xlsx")
+    return stream_response(request, csv_chunks(header, pages, format_row), CSV_TYPE, f"{filename}.csv")
@@ -0,0 +1,217 @@
+# knowa_server/media.py
+# Resized copies of uploaded images, made in the background.
+#
+# Every uploaded image gets a 'thumb' (lists, badges) and a 'medium' (detail
+# screens) copy, each as WebP and JPEG, stored next to the original:
+#   event_images/beach.jpg -> event_images/variants/beach_thumb.webp, ...
+# The names are kept in the model's `media_variants` JSON field, keyed by
+# file field, together with the original they were made from:
+#   {'event_image': {'source': 'event_images/beach.jpg',
+#                    'thumb': {'webp': ..., 'jpg': ...}, 'medium': {...}}}
+#
+# Models opt in with MEDIA_FIELDS = ('field', ...) and call
+# queue_media_variants() from a post_save receiver. Work runs after the
+# transaction commits, on a small thread pool, so an upload request doesn't
+# wait for Pillow. Until a copy is ready (or for files that aren't images,
+# e.g. a PDF resume), media_url() falls back to the original.
+#
+# The finished entry is written with a single-column UPDATE, never by saving
+# the instance loaded before the (slow) resize: that copy may be stale by
+# then (a donation approved meanwhile), and saving it would run the model's
+# post_save logic on old data. Apps drop their cached payloads in a
+# media_variants_saved receiver instead.
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+VARIANTS_DIR = 'variants'
+SIZES = {'thumb': 320, 'medium': 1280}  # longest side, in pixels
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Sent with sender=<model class> and instance=<row> once new variants are stored
+media_variants_saved = Signal()
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.MEDIA_VARIANT_WORKERS, thread_name_prefix='media')
+    return _executor
+
+
+# --- 1. MAKING VARIANTS ---
+
+def _variant_name(source, size, ext):
+    folder, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(folder, VARIANTS_DIR, f"{stem}_{size}.{ext}")
+
+
+def _encode(image, fmt):
+    pil_format, options = FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        # No transparency in JPEG: flatten onto white
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(file_field):
+    """
+    Writes the resized copies of one file. Returns its `media_variants` entry;
+    for a file that isn't an image the entry only records the source, so it
+    isn't tried again.
+    """
+    entry = {'source': file_field.name}
+    storage = file_field.storage
+    try:
+        with storage.open(file_field.name, 'rb') as original:
+            image = Image.open(original)
+            image = ImageOps.exif_transpose(image)  # phone photos are often stored sideways
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        print(f"Media: no variants for {file_field.name}: {e}")
+        return entry
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    entry['width'], entry['height'] = image.size
+
+    for size, longest in SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((longest, longest), Image.LANCZOS)  # never upscales
+        entry[size] = {
+            ext: storage.save(_variant_name(file_field.name, size, ext), _encode(resized, ext))
+            for ext in FORMATS
+        }
+    return entry
+
+
+def _delete_variants(storage, entry):
+    is_shared = getattr(storage, 'is_shared', None)
+    for size in SIZES:
+        for name in (entry or {}).get(size, {}).values():
+            if is_shared and is_shared(name):
+                continue  # other rows may use the same copies; see knowa_server/storage.py
+            try:
+                storage.delete(name)
+            except OSError:
+                pass
+
+
+def pending_media_fields(instance):
+    """MEDIA_FIELDS whose current file has no variants yet."""
+    variants = instance.media_variants or {}
+    pending = []
+    for field in type(instance).MEDIA_FIELDS:
+        name = getattr(instance, field).name or ''
+        if name != (variants.get(field) or {}).get('source', ''):
+            pending.append(field)
+    return pending
+
+
+def process_instance(model_label, pk):
+    """(Re)builds the variants of one row's changed files and saves them."""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    pending = pending_media_fields(instance)
+    if not pending:
+        return
+
+    variants = dict(instance.media_variants or {})
+    built = []
+    for field in pending:
+        file_field = getattr(instance, field)
+        _delete_variants(file_field.storage, variants.pop(field, None))
+        if file_field.name:
+            variants[field] = build_variants(file_field)
+            built.append(field)
+
+    # The file may have been replaced again meanwhile; then the next job handles
+    # it, and nothing will ever point at the copies just made
+    current = model.objects.filter(pk=pk).values(*pending).first()
+    if current is None or any(current[field] != getattr(instance, field).name for field in pending):
+        for field in built:
+            _delete_variants(getattr(instance, field).storage, variants[field])
+        return
+    model.objects.filter(pk=pk).update(media_variants=variants)
+    instance.media_variants = variants
+    media_variants_saved.send(sender=model, instance=instance)
+
+
+def _run(model_label, pk):
+    try:
+        process_instance(model_label, pk)
+    except Exception as e:
+        print(f"Media processing failed for {model_label} {pk}: {e}")
+    finally:
+        connection.close()  # this thread's connection
+
+
+def queue_media_variants(instance):
+    """Call from post_save: schedules variants for any newly uploaded file."""
+    if not pending_media_fields(instance):
+        return
+    label = instance._meta.label
+    pk = instance.pk
+    transaction.on_commit(lambda: _get_executor().submit(_run, label, pk))
+
+
+# --- 2. URLS ---
+
+def _absolute(request, storage, name):
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def _ready_entry(instance, field):
+    file_field = getattr(instance, field)
+    entry = (instance.media_variants or {}).get(field)
+    if entry and entry.get('source') == file_field.name:
+        return entry
+    return None
+
+
+def media_url(request, instance, field, size='medium', fmt='webp', fallback=True):
+    """
+    URL of a resized copy of instance.<field>. Falls back to the original
+    while the copy isn't ready (or None with fallback=False).
+    """
+    file_field = getattr(instance, field)
+    if not file_field:
+        return None
+    entry = _ready_entry(instance, field)
+    if entry and size in entry:
+        return _absolute(request, file_field.storage, entry[size][fmt])
+    return _absolute(request, file_field.storage, file_field.name) if fallback else None
+
+
+def media_variant_urls(request, instance, field):
+    """{'original': url, 'thumb': {'webp': url, 'jpg': url}, 'medium': {...}}; only ready sizes."""
+    file_field = getattr(instance, field)
+    if not file_field:
+        return None
+    urls = {'original': _absolute(request, file_field.storage, file_field.name)}
+    entry = _ready_entry(instance, field) or {}
+    for size in SIZES:
+        if size in entry:
+            urls[size] = {ext: _absolute(request, file_field.storage, name) for ext, name in entry[size].items()}
+    return urls
@@ -139,6 +139,43 @@ else:
     }
 
 
+# --- CACHE ---
+# Shared tier of knowa_server/caching.py. Every worker has to see the same
+# namespace versions, or a bump made by one worker is missed by the others.
+# Redis when REDIS_URL is set. Without it, a database table when gunicorn runs
+# several workers (WEB_CONCURRENCY; `manage.py createcachetable`, run before
+# migrate, makes the table), and local memory for a single process (dev
+# server, tests).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'knowa',
+            'TIMEOUT': 300,
+        }
+    }
+elif int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'knowa_cache',
+            'KEY_PREFIX': 'knowa',
+            'TIMEOUT': 300,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'knowa-default',
+            'TIMEOUT': 300,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -190,11 +227,17 @@ AUTH_USER_MODEL = 'users.User'
 # Configure Django REST Framework to use JWTs for authentication
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication that trusts the signed claims on reads (users/authentication.py)
+        'users.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    ]
+    ],
+    # Proxies in front of the app (the hosting platform's router). Client IPs
+    # for throttling are read from the X-Forwarded-For entry the last of them
+    # appended; anything earlier in the header is client-supplied and ignored.
+    # 0 = use the socket address (no proxy, e.g. runserver).
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
 SIMPLE_JWT = {
@@ -208,11 +251,23 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Rejects refresh tokens issued before a revocation (users/authentication.py)
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.VersionedTokenRefreshSerializer',
 }
 
 # Settings for user-uploaded files (like profile pics or event photos)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Threads per worker process that make resized copies of uploads (knowa_server/media.py)
+MEDIA_VARIANT_WORKERS = int(os.getenv('MEDIA_VARIANT_WORKERS', 1))
+# Unused deduplicated uploads are kept this long after their last upload (knowa_server/storage.py)
+MEDIA_BLOB_GRACE_SECONDS = int(os.getenv('MEDIA_BLOB_GRACE_SECONDS', 60 * 60))
+
+# CSV member imports started from the admin API (users/bulk_import.py)
+# Password hashing processes per import; the import_members command defaults to the CPU count
+MEMBER_IMPORT_WORKERS = int(os.getenv('MEMBER_IMPORT_WORKERS', 2))
+# An import that has not reported progress for this long died with its worker; polls mark it failed
+MEMBER_IMPORT_STALE_SECONDS = int(os.getenv('MEMBER_IMPORT_STALE_SECONDS', 10 * 60))
 
 # --- EMAIL CONFIGURATION (RESEND via HTTPS) ---
 # Uses Port 443 (Allowed on Railway Free Tier)
@@ -236,6 +291,24 @@ SERVER_EMAIL = "support@knowa-app.online"
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# --- CHATBOT LLM LIMITS (chatbot/llm.py) ---
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL')                    # unset = Google's API
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 20))           # seconds per HTTP call
+CHATBOT_STREAM_DEADLINE = float(os.getenv('CHATBOT_STREAM_DEADLINE', 30))  # seconds per streamed answer
+CHATBOT_MAX_CONCURRENT_STREAMS = int(os.getenv('CHATBOT_MAX_CONCURRENT_STREAMS', 8))  # per worker process
+CHATBOT_QUEUE_TIMEOUT = float(os.getenv('CHATBOT_QUEUE_TIMEOUT', 2))  # seconds to wait for a free slot
+CHATBOT_PROMPT_TOKEN_BUDGET = int(os.getenv('CHATBOT_PROMPT_TOKEN_BUDGET', 1500))  # chatbot/context.py
+
+# Token buckets for the chatbot endpoints (chatbot/throttling.py):
+# guests per IP, logged-in users per account
+CHATBOT_THROTTLE = {
+    'anon': {'burst': int(os.getenv('CHATBOT_ANON_BURST', 5)), 'per_minute': float(os.getenv('CHATBOT_ANON_PER_MINUTE', 6))},
+    'user': {'burst': int(os.getenv('CHATBOT_USER_BURST', 10)), 'per_minute': float(os.getenv('CHATBOT_USER_PER_MINUTE', 20))},
+}
+
+# Chat sessions untouched this long are deleted by `compact_chat_sessions`
+CHAT_SESSION_IDLE_DAYS = int(os.getenv('CHAT_SESSION_IDLE_DAYS', 7))
+
 # --- UPDATED: Trust Railway Domain ---
 # This prevents "Forbidden (403)" errors on the Admin Login page in production
 CSRF_TRUSTED_ORIGINS = ['https://*.up.railway.app']
\ No newline at end of file
@@ -0,0 +1,234 @@
+# knowa_server/storage.py
+# Content-addressed storage for uploaded documents (receipts, IDs, resumes).
+#
+# A file is stored once under the SHA-256 of its bytes:
+#   blobs/3f/a2/3fa2...c9.jpg
+# so re-uploading the same receipt or IC photo points the new row at the
+# file already on disk instead of writing another copy.
+#
+# Each stored file has a users.MediaBlob row counting the model rows that use
+# it. The counts are kept by signals (see track_blobs / update_blob_refs,
+# called from users/signals.py and donations/signals.py): a row that stops
+# using a file (file replaced, row deleted) releases it. A file nobody uses
+# any more is deleted with its resized copies (knowa_server/media.py):
+# straight away when it is released, or by the collect_media_blobs command.
+# Before a file goes, the rows themselves are checked for it, so a count that
+# drifted (a queryset update() skips the signals) is corrected instead.
+# A file is never deleted within MEDIA_BLOB_GRACE_SECONDS of being uploaded,
+# so an upload that is saved but not yet attached to its row is safe.
+#
+# Files uploaded before this existed are moved in by dedupe_media_files.
+import hashlib
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+from .media import VARIANTS_DIR
+
+BLOB_PREFIX = 'blobs/'
+
+
+def _blob_model():
+    # users.models imports this module for its FileFields
+    return apps.get_model('users', 'MediaBlob')
+
+
+@deconstructible
+class DedupStorage(FileSystemStorage):
+    """FileSystemStorage that names uploads by content hash and stores each content once."""
+
+    def is_shared(self, name):
+        """True for files in the blob tree, which several rows may point at."""
+        return bool(name) and name.startswith(BLOB_PREFIX)
+
+    def is_derived(self, name):
+        """Resized copies (knowa_server/media.py) are saved under the name they are given."""
+        return VARIANTS_DIR in name.split('/')[:-1]
+
+    def blob_name(self, digest, original_name):
+        ext = os.path.splitext(original_name)[1].lower()[:10]
+        return f"{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def save(self, name, content, max_length=None):
+        # Files derived from a blob (its resized copies) have fixed names; same
+        # name, same bytes, so an existing one is reused
+        if self.is_shared(name) and self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def _save(self, name, content):
+        if self.is_shared(name) or self.is_derived(name):
+            return super()._save(name, content)
+
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+
+        blob = self.blob_name(digest.hexdigest(), name)
+        # Recorded (and its grace period restarted) before the file is checked,
+        # so the garbage collector leaves it alone from here on
+        _blob_model().objects.update_or_create(name=blob, defaults={'size': size, 'touched_at': timezone.now()})
+        if not self.exists(blob):
+            written = super()._save(blob, content)
+            if written != blob:
+                # Another upload of the same bytes got there first
+                super().delete(written)
+        return blob
+
+    def delete_blob(self, name):
+        """Deletes a blob file and its resized copies."""
+        super().delete(name)
+        folder, filename = os.path.split(name)
+        stem = os.path.splitext(filename)[0]
+        variants = os.path.join(folder, VARIANTS_DIR)
+        try:
+            copies = self.listdir(variants)[1]
+        except FileNotFoundError:
+            return
+        for copy in copies:
+            if copy.startswith(f"{stem}_"):
+                super().delete(os.path.join(variants, copy))
+
+
+dedup_storage = DedupStorage()
+
+
+# --- REFERENCE COUNTING ---
+
+def blob_fields(model):
+    """Names of the model's file fields stored in dedup_storage."""
+    return [
+        field.name for field in model._meta.concrete_fields
+        if isinstance(getattr(field, 'storage', None), DedupStorage)
+    ]
+
+
+def _acquire(name):
+    blobs = _blob_model().objects
+    if blobs.filter(name=name).update(ref_count=F('ref_count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            blobs.create(name=name, ref_count=1)
+    except IntegrityError:
+        blobs.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def _release(names):
+    if not names:
+        return
+    _blob_model().objects.filter(name__in=names, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: collect_blobs(names))
+
+
+def track_blobs(instance, update_fields=None, raw=False):
+    """pre_save: remembers which blobs the row used before this save."""
+    fields = blob_fields(type(instance))
+    instance._previous_blobs = None
+    if raw or not fields:
+        return
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return  # the save leaves the files alone
+    previous = {}
+    if instance.pk is not None:
+        previous = type(instance).objects.filter(pk=instance.pk).values(*fields).first() or {}
+    instance._previous_blobs = {field: previous.get(field) or '' for field in fields}
+
+
+def update_blob_refs(instance):
+    """post_save: takes a reference on newly attached blobs and releases replaced ones."""
+    previous = getattr(instance, '_previous_blobs', None)
+    if previous is None:
+        return
+    instance._previous_blobs = None
+    released = []
+    for field, old in previous.items():
+        new = getattr(instance, field).name or ''
+        if new == old:
+            continue
+        if dedup_storage.is_shared(new):
+            _acquire(new)
+        if dedup_storage.is_shared(old):
+            released.append(old)
+    _release(released)
+
+
+def release_blobs(instance):
+    """post_delete: releases every blob the deleted row used."""
+    names = [getattr(instance, field).name for field in blob_fields(type(instance))]
+    _release([name for name in names if dedup_storage.is_shared(name)])
+
+
+# --- GARBAGE COLLECTION ---
+
+COLLECT_BATCH_SIZE = 500
+
+
+def blob_references(names):
+    """How many file fields point at each of `names`, counted from the rows themselves."""
+    names = list(names)
+    counts = Counter()
+    for model in apps.get_models():
+        for field in blob_fields(model):
+            counts.update(
+                model._base_manager.filter(**{f'{field}__in': names}).values_list(field, flat=True)
+            )
+    return counts
+
+
+def collect_blobs(names=None, grace_seconds=None):
+    """
+    Deletes unused blobs (all of them, or those in `names`) untouched for the
+    grace period. Each row is claimed before its file goes. Returns how many.
+    A blob whose count says unused but that a row still points at keeps its
+    file, and its count is corrected.
+    """
+    if grace_seconds is None:
+        grace_seconds = settings.MEDIA_BLOB_GRACE_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+    blobs = _blob_model().objects
+    unused = blobs.filter(ref_count=0, touched_at__lt=cutoff)
+    if names is not None:
+        unused = unused.filter(name__in=list(names))
+
+    candidates = list(unused.values_list('pk', 'name'))
+    deleted = 0
+    for start in range(0, len(candidates), COLLECT_BATCH_SIZE):
+        batch = candidates[start:start + COLLECT_BATCH_SIZE]
+        deleted += _collect_batch(blobs, batch, cutoff)
+    return deleted
+
+
+def _collect_batch(blobs, batch, cutoff):
+    # The counts are kept by signals, which a queryset .update() or a raw
+    # import skips; recount from the file fields before anything is deleted
+    in_use = blob_references(name for _, name in batch)
+    deleted = 0
+    for blob_id, name in batch:
+        if in_use[name]:
+            blobs.filter(pk=blob_id, ref_count=0).update(ref_count=in_use[name])
+            print(f"Media blob {name} is still used by {in_use[name]} row(s); kept and recounted")
+            continue
+        # Claim the row; an upload or a new reference since the query keeps it
+        if not blobs.filter(pk=blob_id, ref_count=0, touched_at__lt=cutoff).delete()[0]:
+            continue
+        try:
+            dedup_storage.delete_blob(name)
+        except OSError as e:
+            print(f"Could not delete media blob {name}: {e}")
+        deleted += 1
+    return deleted
@@ -0,0 +1,61 @@
+# users/activity.py
+# Maintained activity counters on UserProfile (total_events_joined,
+# total_donations_made). Every change is a single atomic UPDATE with an F()
+# expression, so concurrent joins never lose a count. reconcile_counters()
+# recomputes everything from the source tables with set-based SQL.
+from collections import Counter
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import UserProfile
+from .profile_cache import bump_all_users, bump_users
+
+
+def _apply(field, deltas):
+    """deltas: {user_id: change}. Groups users by delta so each group is one UPDATE."""
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in by_delta.items():
+        UserProfile.objects.filter(user_id__in=user_ids).update(
+            **{field: Greatest(F(field) + delta, Value(0))}
+        )
+    bump_users(deltas)
+
+
+def adjust_events_joined(user_ids, delta=1):
+    """`user_ids` may repeat a user (e.g. removed from several events at once)."""
+    _apply('total_events_joined', {
+        user_id: count * delta for user_id, count in Counter(user_ids).items()
+    })
+
+
+def adjust_donations_made(user_id, delta=1):
+    _apply('total_donations_made', {user_id: delta})
+
+
+def reconcile_counters():
+    """
+    Recomputes both counters for every profile in one UPDATE with correlated
+    subqueries. Returns the number of profiles updated.
+    """
+    from events.models import Event
+    from donations.models import Donation, DonationStatus
+
+    def count_of(queryset):
+        return Coalesce(Subquery(
+            queryset.filter(user_id=OuterRef('user_id'))
+            .order_by().values('user_id').annotate(total=Count('*')).values('total')
+        ), Value(0))
+
+    updated = UserProfile.objects.update(
+        total_events_joined=(
+            count_of(Event.participants.through.objects.all()) +
+            count_of(Event.crew.through.objects.all())
+        ),
+        total_donations_made=count_of(Donation.objects.filter(status=DonationStatus.APPROVED)),
+    )
+    bump_all_users()
+    return updated
@@ -0,0 +1,93 @@
+# users/audiences.py
+# Audience primitives: named groups of users ("all members", "crew of event 12")
+# that resolve to a SQL filter, so callers never have to load User rows into
+# Python just to find out who should receive something.
+#
+# Audience keys:
+#   STAFF, MEMBER, VOLUNTEER          - by role / membership status
+#   EVENT_CREW:<event_id>             - crew of one event
+#   EVENT_PARTICIPANTS:<event_id>     - participants of one event
+#   MEETING:<meeting_id>              - people invited to a meeting
+from django.db.models import Count, Q
+
+from .models import User
+
+STATIC_AUDIENCES = {
+    'STAFF': ('All Admins', Q(is_staff=True)),
+    'MEMBER': ('All NGO Members', Q(member_status=User.MemberStatus.MEMBER)),
+    'VOLUNTEER': ('All Volunteers', Q(member_status=User.MemberStatus.VOLUNTEER)),
+}
+
+SCOPED_AUDIENCES = {
+    'EVENT_CREW': 'joined_events_as_crew',
+    'EVENT_PARTICIPANTS': 'joined_events_as_participant',
+    'MEETING': 'meeting_invites',
+}
+
+
+class InvalidAudience(ValueError):
+    pass
+
+
+def audience_q(key):
+    """Q object selecting the users in one audience."""
+    if key in STATIC_AUDIENCES:
+        return STATIC_AUDIENCES[key][1]
+
+    prefix, _, object_id = str(key).partition(':')
+    if prefix in SCOPED_AUDIENCES and object_id.isdigit():
+        return Q(**{SCOPED_AUDIENCES[prefix]: int(object_id)})
+
+    raise InvalidAudience(f"Unknown audience '{key}'.")
+
+
+def is_valid_audience(key):
+    try:
+        audience_q(key)
+        return True
+    except InvalidAudience:
+        return False
+
+
+def audience_user_ids(keys=(), user_ids=(), exclude_ids=()):
+    """
+    Lazy `values_list('id')` queryset for the union of the given audiences
+    plus any explicit user ids. Use it directly as a subquery
+    (`filter(user_id__in=...)`) or iterate it to get the ids.
+    """
+    condition = Q(pk__in=list(user_ids)) if user_ids else Q(pk__in=[])
+    for key in keys:
+        condition |= audience_q(key)
+    queryset = User.objects.filter(condition, is_active=True)
+    if exclude_ids:
+        queryset = queryset.exclude(pk__in=list(exclude_ids))
+    return queryset.order_by().values_list('id', flat=True).distinct()
+
+
+def bulk_add_members(relation, owner_id, user_ids):
+    """
+    Inserts (owner, user) rows into an M2M through-table in one statement.
+    `relation` is the forward M2M descriptor, e.g. ChatRoom.participants.
+    Existing rows are skipped. Returns the number of ids submitted.
+    """
+    through = relation.through
+    owner_field = relation.field.m2m_field_name()
+    user_field = relation.field.m2m_reverse_field_name()
+    rows = [
+        through(**{f"{owner_field}_id": owner_id, f"{user_field}_id": user_id})
+        for user_id in set(user_ids)
+    ]
+    through.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def audience_summary():
+    """Available role audiences with their sizes (one aggregate query)."""
+    counts = User.objects.filter(is_active=True).aggregate(**{
+        key: Count('pk', filter=condition)
+        for key, (_, condition) in STATIC_AUDIENCES.items()
+    })
+    return [
+        {'key': key, 'label': label, 'count': counts[key]}
+        for key, (label, _) in STATIC_AUDIENCES.items()
+    ]
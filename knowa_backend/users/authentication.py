@@ -0,0 +1,213 @@
+# users/authentication.py
+# JWT authentication that avoids loading the User row on every request.
+#
+# Access tokens carry signed claims (user id, username, is_staff,
+# member_status, ...; see MyTokenObtainPairSerializer) plus 'ver', the
+# user's token_version at login. Bumping User.token_version revokes every
+# token issued before it: on a password reset, and whenever is_staff,
+# is_superuser or is_active changes (users/signals.py).
+#
+# member_status changes during normal use (applying, approval, interviews,
+# payment), so it does not revoke tokens. Its current value is kept in the
+# same stamp as the version and replaces the token's (possibly old) claim.
+#
+# - Safe methods (GET/HEAD/OPTIONS): the token's 'ver' and the account's
+#   is_active are checked against a small per-user stamp in the shared cache
+#   (one cache read, no query). The user then comes from a small in-process
+#   LRU of recently loaded users, or is rebuilt from the token claims; either
+#   way member_status is taken from the stamp.
+# - Writes: the user is loaded from the database and the token's 'ver' must
+#   match, so revoked tokens can't change anything.
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60  # seconds a loaded user is reused for reads
+AUTH_STATE_TTL = 24 * 60 * 60  # the stamp is rewritten on every change; the TTL only frees memory
+
+CACHED_FIELDS = [field.attname for field in User._meta.concrete_fields]
+
+# token claim -> User field, for users rebuilt from a token
+CLAIM_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'phone': 'phone',
+    'member_status': 'member_status',
+    'is_staff': 'is_staff',
+    'is_superuser': 'is_superuser',
+    'ver': 'token_version',
+}
+
+
+class UserLRUCache:
+    """
+    Thread-safe LRU of users with a TTL. Stores plain field values and hands
+    out a fresh User each time, so requests never share an instance (or its
+    cached relations).
+    """
+
+    def __init__(self, max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (loaded_at, field values)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            values = entry[1]
+        return User.from_db('default', CACHED_FIELDS, values)
+
+    def put(self, user):
+        values = [getattr(user, name) for name in CACHED_FIELDS]
+        with self._lock:
+            self._entries[user.pk] = (time.monotonic(), values)
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserLRUCache()
+
+
+def forget_user(user_id):
+    """Drops a user from this process's cache (e.g. after their tokens are revoked)."""
+    user_cache.discard(user_id)
+
+
+# --- AUTH STATE STAMP (shared cache) ---
+
+def _state_key(user_id):
+    return f"auth-state:{user_id}"
+
+
+def forget_auth_state(user_ids):
+    """
+    Call when token_version, is_active or member_status changed (see
+    users/signals.py). The stamps are dropped once the transaction commits
+    and reloaded on next use.
+    """
+    user_ids = list(user_ids)
+
+    def drop():
+        cache.delete_many([_state_key(user_id) for user_id in user_ids])
+        for user_id in user_ids:
+            forget_user(user_id)
+
+    transaction.on_commit(drop)
+
+
+def auth_state(user_id):
+    """
+    (token_version, is_active, member_status) for a user; (None, False, None)
+    if the account is gone.
+    """
+    state = cache.get(_state_key(user_id))
+    if state is None or len(state) != 3:  # stamps written before member_status was added
+        row = User.objects.filter(pk=user_id).values_list('token_version', 'is_active', 'member_status').first()
+        state = tuple(row) if row else (None, False, None)
+        cache.set(_state_key(user_id), state, AUTH_STATE_TTL)
+    return state
+
+
+def check_token_state(validated_token, user_id):
+    """
+    Rejects tokens that were revoked or belong to a deactivated or deleted
+    account. Returns the auth_state() stamp.
+    """
+    state = auth_state(user_id)
+    version, is_active, _ = state
+    if not is_active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    if validated_token.get('ver', 0) != version:
+        raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+    return state
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Drop-in replacement for simplejwt's JWTAuthentication.
+    Tokens issued before the 'ver' claim existed are handled the old way
+    (one user lookup per request).
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if request.method in SAFE_METHODS and 'ver' in validated_token:
+            return self.get_read_user(validated_token), validated_token
+        return self.get_write_user(validated_token), validated_token
+
+    def get_read_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        state = check_token_state(validated_token, user_id)
+        cached = user_cache.get(user_id)
+        if cached is not None and cached.token_version == validated_token['ver']:
+            cached.member_status = state[2]
+            return cached
+        return self.user_from_claims(validated_token, state)
+
+    def get_write_user(self, validated_token):
+        # Full row, so permission changes and revocations apply immediately
+        user = self.get_user(validated_token)
+        self._check_version(validated_token, user)
+        user_cache.put(user)
+        return user
+
+    def user_from_claims(self, validated_token, state=None):
+        """
+        A User built only from the token. Fields without a claim (email,
+        password, ...) are deferred, so they load from the database on first
+        access instead of silently being blank. Only called once
+        check_token_state() has passed, hence is_active; its `state` stamp
+        overrides the token's member_status claim.
+        """
+        known = {'id': self._user_id(validated_token), 'is_active': True}
+        for claim, field in CLAIM_FIELDS.items():
+            if claim in validated_token:
+                known[field] = validated_token[claim]
+        if state is not None and state[2] is not None:
+            known['member_status'] = state[2]
+        # from_db() expects values in model field order
+        names = [name for name in CACHED_FIELDS if name in known]
+        return User.from_db('default', names, [known[name] for name in names])
+
+    def _user_id(self, validated_token):
+        try:
+            return int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise AuthenticationFailed('Token contained no recognizable user identification', code='token_not_valid')
+
+    def _check_version(self, validated_token, user):
+        if validated_token.get('ver', 0) != user.token_version:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
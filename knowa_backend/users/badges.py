@@ -0,0 +1,105 @@
+# users/badges.py
+# Badge engine.
+# Badges are awarded once, when a user's activity crosses a Badge threshold,
+# and stored in UserProfile.earned_badges. Reading badges is then just a
+# prefetch; nothing is recomputed per request.
+import threading
+import time
+
+from .models import Badge, UserProfile
+from .profile_cache import bump_users
+
+# The Badge catalog changes only through the admin, so keep it in memory.
+# Signals clear it in this process; the TTL covers other worker processes.
+CATALOG_TTL = 300  # seconds
+
+_catalog = None
+_catalog_loaded_at = 0
+_catalog_lock = threading.Lock()
+
+
+def get_badge_catalog():
+    """
+    {criteria_type: [Badge, ...]} with each list sorted by threshold.
+    """
+    global _catalog, _catalog_loaded_at
+    if _catalog is not None and time.monotonic() - _catalog_loaded_at < CATALOG_TTL:
+        return _catalog
+
+    with _catalog_lock:
+        if _catalog is None or time.monotonic() - _catalog_loaded_at >= CATALOG_TTL:
+            catalog = {}
+            for badge in Badge.objects.order_by('threshold', 'id'):
+                catalog.setdefault(badge.criteria_type, []).append(badge)
+            _catalog = catalog
+            _catalog_loaded_at = time.monotonic()
+    return _catalog
+
+
+def clear_badge_catalog():
+    global _catalog
+    _catalog = None
+
+
+def eligible_badge_ids(event_count, donation_count):
+    catalog = get_badge_catalog()
+    ids = []
+    for criteria_type, count in (('EVENT', event_count), ('DONATION', donation_count)):
+        for badge in catalog.get(criteria_type, []):
+            if badge.threshold > count:
+                break
+            ids.append(badge.id)
+    return ids
+
+
+def award_badges(user_id, event_count=None, donation_count=None):
+    """
+    Adds any badges the user now qualifies for. Idempotent; badges are never
+    taken away. Returns the ids of newly awarded badges.
+    """
+    if event_count is None or donation_count is None:
+        # Read the maintained activity counters
+        row = UserProfile.objects.filter(user_id=user_id).values_list(
+            'id', 'total_events_joined', 'total_donations_made'
+        ).first()
+        if row is None:
+            return []
+        profile_id, event_count, donation_count = row
+    else:
+        profile_id = None
+
+    eligible = eligible_badge_ids(event_count, donation_count)
+    if not eligible:
+        return []
+
+    if profile_id is None:
+        profile_id = UserProfile.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+        if profile_id is None:
+            return []
+
+    Earned = UserProfile.earned_badges.through
+    already = set(
+        Earned.objects.filter(userprofile_id=profile_id).values_list('badge_id', flat=True)
+    )
+    new_ids = [badge_id for badge_id in eligible if badge_id not in already]
+    if new_ids:
+        Earned.objects.bulk_create(
+            [Earned(userprofile_id=profile_id, badge_id=badge_id) for badge_id in new_ids],
+            ignore_conflicts=True,
+        )
+        bump_users([user_id])
+    return new_ids
+
+
+def sync_all_badges(batch_size=500):
+    """
+    Backfill: awards every badge each user qualifies for, based on the
+    activity counters. Returns the number of badges awarded.
+    """
+    awarded = 0
+    profiles = UserProfile.objects.order_by('id').values_list(
+        'user_id', 'total_events_joined', 'total_donations_made'
+    )
+    for user_id, event_count, donation_count in profiles.iterator(chunk_size=batch_size):
+        awarded += len(award_badges(user_id, event_count, donation_count))
+    return awarded
@@ -0,0 +1,180 @@
+# users/bulk_import.py
+# CSV import of existing members (onboarding an NGO).
+#
+# The file is read once, a batch of BATCH_SIZE rows at a time:
+#   1. every row is checked (required columns, username/email format,
+#      password rules, duplicates in the file and in the database)
+#   2. passwords are hashed in a process pool (users/hashing.py)
+#   3. users and their UserProfile rows are written with bulk_create
+#      (bulk_create skips post_save: UserProfile.objects.create_missing(),
+#      and the caches the User signals would have invalidated are bumped here)
+#   4. the batch's welcome emails go out on one background connection
+# Memory depends on the batch size, not the file size.
+import csv
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from . import leaderboards
+from .authentication import forget_auth_state
+from .hashing import HashingPool
+from .models import User, UserProfile
+from .profile_cache import bump_users
+from .serializers import password_problem
+from .utils import queue_messages_bulk, welcome_email
+
+REQUIRED_COLUMNS = ['username', 'email', 'first_name']
+OPTIONAL_COLUMNS = ['last_name', 'phone', 'interests', 'password', 'member_status']
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+
+
+def _clean(row):
+    """(cleaned row, None) or (None, error message)."""
+    data = {column: (row.get(column) or '').strip() for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+    for column in REQUIRED_COLUMNS:
+        if not data[column]:
+            return None, f"'{column}' is required"
+
+    try:
+        User.username_validator(data['username'])
+        validate_email(data['email'])
+    except ValidationError as e:
+        return None, e.messages[0]
+    if len(data['username']) > 150:
+        return None, "Username is too long"
+    data['email'] = data['email'].lower()
+
+    if data['password']:
+        problem = password_problem(data['password'])
+        if problem:
+            return None, problem
+
+    data['member_status'] = data['member_status'].upper() or User.MemberStatus.PUBLIC
+    if data['member_status'] not in User.MemberStatus.values:
+        return None, f"Unknown member_status '{data['member_status']}'"
+    return data, None
+
+
+class MemberImport:
+    """One import run. Call run(file); the result is in .result."""
+
+    def __init__(self, dry_run=False, send_email=True, workers=None, batch_size=BATCH_SIZE, progress=None):
+        self.dry_run = dry_run
+        self.send_email = send_email
+        self.batch_size = batch_size
+        self.progress = progress  # called with .result after every batch
+        self.pool = HashingPool(workers)
+        self.result = {'processed': 0, 'valid': 0, 'created': 0, 'error_count': 0, 'errors': []}
+        self._seen_usernames = set()
+        self._seen_emails = set()
+
+    def error(self, line, message):
+        self.result['error_count'] += 1
+        if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+            self.result['errors'].append({'line': line, 'error': message})
+
+    def run(self, text_file):
+        reader = csv.DictReader(text_file)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+        try:
+            batch = []
+            for line, row in enumerate(reader, start=2):  # line 1 is the header
+                self.result['processed'] += 1
+                data, problem = _clean(row)
+                if problem:
+                    self.error(line, problem)
+                    continue
+                # Duplicates within the file (case-insensitive usernames, like logins)
+                if data['username'].lower() in self._seen_usernames:
+                    self.error(line, f"Username '{data['username']}' appears twice in the file")
+                    continue
+                if data['email'] in self._seen_emails:
+                    self.error(line, f"Email '{data['email']}' appears twice in the file")
+                    continue
+                self._seen_usernames.add(data['username'].lower())
+                self._seen_emails.add(data['email'])
+
+                batch.append((line, data))
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+            if batch:
+                self.flush(batch)
+        finally:
+            self.pool.close()
+        return self.result
+
+    def flush(self, batch):
+        # Duplicates of existing accounts: two queries per batch
+        usernames = [data['username'] for _, data in batch]
+        taken_usernames = {
+            name.lower() for name in
+            User.objects.annotate(name=Lower('username'))
+            .filter(name__in=[name.lower() for name in usernames]).values_list('name', flat=True)
+        }
+        taken_emails = set(
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=[data['email'] for _, data in batch])
+            .values_list('email_lower', flat=True)
+        )
+        fresh = []
+        for line, data in batch:
+            if data['username'].lower() in taken_usernames:
+                self.error(line, f"Username '{data['username']}' is already taken")
+            elif data['email'] in taken_emails:
+                self.error(line, f"Email '{data['email']}' is already registered")
+            else:
+                fresh.append((line, data))
+        self.result['valid'] += len(fresh)
+
+        if fresh and not self.dry_run:
+            self.create(fresh)
+        if self.progress:
+            self.progress(self.result)
+
+    def create(self, rows):
+        hashes = self.pool.hash([data['password'] or None for _, data in rows])
+        users = [
+            User(
+                username=data['username'],
+                email=data['email'],
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                phone=data['phone'],
+                interests=data['interests'],
+                member_status=data['member_status'],
+                password=password_hash,
+            )
+            for (_, data), password_hash in zip(rows, hashes)
+        ]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users, batch_size=self.batch_size)
+                # Not every backend returns ids from bulk_create (MySQL doesn't)
+                ids = list(User.objects.filter(username__in=[user.username for user in users]).values_list('id', flat=True))
+                UserProfile.objects.create_missing(ids, batch_size=self.batch_size)
+        except IntegrityError as e:
+            # Someone registered one of these names meanwhile: report the batch.
+            # The database's message names tables and values; it goes to the log only
+            print(f"Member import batch failed: {e}")
+            for line, _ in rows:
+                self.error(line, "Not imported: an account with a username or email in this batch "
+                                 "was created meanwhile. Import these rows again.")
+            self.result['valid'] -= len(rows)
+            return
+
+        # What post_save would have done: ids can be reused after a delete, so
+        # nothing cached for an old account may be served to a new one
+        bump_users(ids)
+        forget_auth_state(ids)
+        leaderboards.invalidate()
+
+        self.result['created'] += len(users)
+        if self.send_email:
+            queue_messages_bulk([welcome_email(user, imported=True) for user in users if user.email])
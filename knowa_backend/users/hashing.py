@@ -0,0 +1,56 @@
+# users/hashing.py
+# Password hashing in worker processes, for bulk imports.
+# Django's PBKDF2 hasher is deliberately slow (hundreds of ms per password)
+# and holds the GIL, so only separate processes hash in parallel.
+# Kept free of model imports: 'spawn' workers import this module on start.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+INLINE_LIMIT = 32  # fewer passwords than this are hashed in-process
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _hash(password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(password)
+
+
+class HashingPool:
+    """
+    make_password() over many passwords. The worker processes start on first
+    use and live until close(). 'spawn' is used because forking a web
+    worker with running threads is unsafe.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def hash(self, passwords):
+        """Hashes in order; None gives an unusable password."""
+        passwords = list(passwords)
+        # Unusable passwords cost nothing; only real ones go to the workers
+        real = [password for password in passwords if password is not None]
+        if len(real) < INLINE_LIMIT or self.workers == 1:
+            return [_hash(password) for password in passwords]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'knowa_server.settings'),),
+            )
+        chunksize = max(1, len(real) // (self.workers * 4))
+        hashed = iter(self._executor.map(_hash, real, chunksize=chunksize))
+        return [_hash(None) if password is None else next(hashed) for password in passwords]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,242 @@
+# users/leaderboards.py
+# Leaderboards for "top volunteers" (events crewed) and "top donors"
+# (approved donation amount), per calendar month and all-time.
+#
+# Scores live in LeaderboardScore and are bumped incrementally by signals
+# (users/signals.py). Each (board, period) also has a bounded, sorted top-K
+# snapshot in the cache that is patched in place on every score change, so
+# reading a leaderboard is a cache hit plus one name lookup.
+#
+# A user's own rank ("you are #412") is a count of the scores above theirs.
+# With Redis (REDIS_URL) each (board, period) is mirrored in a sorted set and
+# that count is a ZCOUNT, O(log n). Without it, the count is done in the
+# database and stops at RANK_SCAN_LIMIT, so it never scans more than that many
+# index entries; lower ranks are reported as "RANK_SCAN_LIMIT+".
+from bisect import insort
+from decimal import Decimal
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import LeaderboardScore, User
+
+ALL_TIME = 'ALL'
+MAX_K = 100             # largest leaderboard we keep a snapshot for
+SNAPSHOT_TTL = 10 * 60  # safety net for concurrent patches from other workers
+RANK_SCAN_LIMIT = 1000  # without Redis: most scores counted for one rank
+RANK_SET_TTL = 24 * 60 * 60  # Redis sorted sets are reloaded from the table at least daily
+
+Board = LeaderboardScore.Board
+
+
+def period_key(moment):
+    return moment.strftime('%Y-%m')
+
+
+def _version():
+    return cache.get_or_set('leaderboard:version', 1, None)
+
+
+def _snapshot_key(board, period):
+    return f"leaderboard:{_version()}:{board}:{period}"
+
+
+# --- 1. WRITES ---
+
+def record(board, user_id, amount, when):
+    """Adds `amount` (may be negative) to the user's score for `when`'s month and all-time."""
+    if not user_id or not amount:
+        return
+    amount = Decimal(amount)
+    for period in (period_key(when), ALL_TIME):
+        score = _bump(board, period, user_id, amount)
+        _patch_snapshot(board, period, user_id, score)
+        _patch_rank_set(board, period, user_id, score)
+
+
+def _bump(board, period, user_id, amount):
+    rows = LeaderboardScore.objects.filter(board=board, period=period, user_id=user_id)
+    if not rows.update(score=F('score') + amount):
+        try:
+            with transaction.atomic():
+                LeaderboardScore.objects.create(board=board, period=period, user_id=user_id, score=amount)
+        except IntegrityError:
+            # Another request created the row first
+            rows.update(score=F('score') + amount)
+    return rows.values_list('score', flat=True).first() or Decimal(0)
+
+
+def _patch_snapshot(board, period, user_id, score):
+    """Moves the user to their new place in the cached top-K list (if one is cached)."""
+    key = _snapshot_key(board, period)
+    entries = cache.get(key)
+    if entries is None:
+        return  # built lazily on the next read
+
+    # Entries are (-score, user_id) so ascending order == leaderboard order.
+    # A list shorter than MAX_K holds every positive score, so any change can be
+    # applied exactly. In a full list, a score going down could let an uncached
+    # user overtake, so drop the snapshot instead.
+    previous = next((entry for entry in entries if entry[1] == user_id), None)
+    if previous is not None and len(entries) >= MAX_K and score < -previous[0]:
+        cache.delete(key)
+        return
+
+    entries = [entry for entry in entries if entry[1] != user_id]
+    if score > 0:
+        insort(entries, (-score, user_id))
+    cache.set(key, entries[:MAX_K], SNAPSHOT_TTL)
+
+
+# --- 2. REDIS SORTED SETS (rank lookups) ---
+
+def _redis():
+    """(cache backend, raw Redis client), or (None, None) without Redis."""
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        return backend, backend._cache.get_client(write=True)
+    return None, None
+
+
+def _rank_set_key(backend, board, period):
+    return backend.make_key(f"leaderboard-z:{_version()}:{board}:{period}")
+
+
+def _patch_rank_set(board, period, user_id, score):
+    backend, client = _redis()
+    if client is None:
+        return
+    key = _rank_set_key(backend, board, period)
+    if not client.exists(key):
+        return  # loaded in full on the next rank lookup
+    if score > 0:
+        client.zadd(key, {user_id: float(score)})
+    else:
+        client.zrem(key, user_id)
+
+
+def _load_rank_set(client, key, board, period, batch_size=1000):
+    """Copies the period's scores into the sorted set; swapped in atomically with RENAME."""
+    loading = f"{key}:loading"
+    client.delete(loading)
+    rows = LeaderboardScore.objects.filter(board=board, period=period, score__gt=0).values_list('user_id', 'score')
+    batch = {}
+    for user_id, score in rows.iterator(chunk_size=batch_size):
+        batch[user_id] = float(score)
+        if len(batch) == batch_size:
+            client.zadd(loading, batch)
+            batch = {}
+    if batch:
+        client.zadd(loading, batch)
+    if client.exists(loading):
+        client.rename(loading, key)
+        client.expire(key, RANK_SET_TTL)
+
+
+# --- 3. READS ---
+
+def _snapshot(board, period):
+    key = _snapshot_key(board, period)
+    entries = cache.get(key)
+    if entries is None:
+        # Index range scan: LIMIT MAX_K on (board, period, -score)
+        rows = LeaderboardScore.objects.filter(
+            board=board, period=period, score__gt=0
+        ).order_by('-score', 'user_id').values_list('score', 'user_id')[:MAX_K]
+        entries = [(-score, user_id) for score, user_id in rows]
+        cache.set(key, entries, SNAPSHOT_TTL)
+    return entries
+
+
+def top(board, period, limit=10):
+    """[{'rank', 'user_id', 'name', 'score'}, ...] for the best `limit` users."""
+    entries = _snapshot(board, period)[:min(limit, MAX_K)]
+    names = {
+        row['id']: row['first_name'] or row['username']
+        for row in User.objects.filter(pk__in=[user_id for _, user_id in entries]).values('id', 'first_name', 'username')
+    }
+
+    results = []
+    rank = 0
+    previous = None
+    for position, (neg_score, user_id) in enumerate(entries, start=1):
+        if neg_score != previous:
+            rank = position  # ties share a rank
+            previous = neg_score
+        results.append({'rank': rank, 'user_id': user_id, 'name': names.get(user_id, ''), 'score': -neg_score})
+    return results
+
+
+def rank_of(board, period, user_id):
+    """
+    (rank, score, capped) for one user, or (None, 0, False) if they have no
+    score. Ties share a rank. `capped` means the rank is only known to be
+    below RANK_SCAN_LIMIT (no Redis); rank is then RANK_SCAN_LIMIT + 1.
+    """
+    score = LeaderboardScore.objects.filter(
+        board=board, period=period, user_id=user_id
+    ).values_list('score', flat=True).first()
+    if not score or score <= 0:
+        return None, 0, False
+
+    backend, client = _redis()
+    if client is not None:
+        key = _rank_set_key(backend, board, period)
+        if not client.exists(key):
+            _load_rank_set(client, key, board, period)
+        # ZCOUNT of the scores strictly above this one: O(log n)
+        ahead = client.zcount(key, f"({float(score)}", '+inf')
+        return ahead + 1, score, False
+
+    # COUNT over at most RANK_SCAN_LIMIT entries of the (board, period, score) index
+    ahead = LeaderboardScore.objects.filter(
+        board=board, period=period, score__gt=score
+    ).order_by()[:RANK_SCAN_LIMIT].count()
+    if ahead >= RANK_SCAN_LIMIT:
+        return RANK_SCAN_LIMIT + 1, score, True
+    return ahead + 1, score, False
+
+
+# --- 4. FULL REBUILD ---
+
+def rebuild(batch_size=1000):
+    """Recomputes every leaderboard from history with GROUP BY queries."""
+    from events.models import Event
+    from donations.models import Donation, DonationStatus
+
+    crew = Event.crew.through.objects.order_by()
+    approved = Donation.objects.filter(status=DonationStatus.APPROVED, user__isnull=False).order_by()
+
+    sources = [
+        (Board.VOLUNTEERS,
+         crew.annotate(month=TruncMonth('event__start_time')).values('user_id', 'month').annotate(total=Count('*')),
+         crew.values('user_id').annotate(total=Count('*'))),
+        (Board.DONORS,
+         approved.annotate(month=TruncMonth('submitted_at')).values('user_id', 'month').annotate(total=Sum('amount')),
+         approved.values('user_id').annotate(total=Sum('amount'))),
+    ]
+
+    rows = []
+    for board, monthly, all_time in sources:
+        for row in monthly:
+            rows.append(LeaderboardScore(board=board, period=period_key(row['month']), user_id=row['user_id'], score=row['total']))
+        for row in all_time:
+            rows.append(LeaderboardScore(board=board, period=ALL_TIME, user_id=row['user_id'], score=row['total']))
+
+    with transaction.atomic():
+        LeaderboardScore.objects.all().delete()
+        LeaderboardScore.objects.bulk_create(rows, batch_size=batch_size)
+
+    invalidate()
+    return len(rows)
+
+
+def invalidate():
+    """Drops every cached snapshot and sorted set at once; they reload on the next read."""
+    try:
+        cache.incr('leaderboard:version')
+    except ValueError:
+        cache.set('leaderboard:version', 2, None)
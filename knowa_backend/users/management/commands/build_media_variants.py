@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from knowa_server.media import pending_media_fields, process_instance
+
+class Command(BaseCommand):
+    help = 'Makes the resized copies (knowa_server/media.py) of uploads that have none yet, e.g. files uploaded before the pipeline existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in apps.get_models():
+            fields = getattr(model, 'MEDIA_FIELDS', None)
+            if not fields:
+                continue
+            has_file = Q()
+            for field in fields:
+                has_file |= ~Q(**{field: ''}) & Q(**{f'{field}__isnull': False})
+            rows = model.objects.filter(has_file).order_by('pk').only('pk', 'media_variants', *fields)
+
+            processed, last_pk = 0, 0
+            while True:
+                batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                for instance in batch:
+                    if pending_media_fields(instance):
+                        process_instance(instance._meta.label, instance.pk)
+                        processed += 1
+                last_pk = batch[-1].pk
+            self.stdout.write(f"{model._meta.label}: processed {processed} row(s).")
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from knowa_server.storage import collect_blobs
+
+class Command(BaseCommand):
+    help = 'Deletes deduplicated uploads (knowa_server/storage.py) that no donation or profile uses any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-seconds', type=int, default=None,
+                            help='Keep unused files uploaded more recently than this (default: MEDIA_BLOB_GRACE_SECONDS)')
+
+    def handle(self, *args, **options):
+        deleted = collect_blobs(grace_seconds=options['grace_seconds'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} unused file(s).'))
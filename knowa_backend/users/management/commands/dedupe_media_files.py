@@ -0,0 +1,54 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from knowa_server.storage import BLOB_PREFIX, blob_fields, dedup_storage
+
+class Command(BaseCommand):
+    help = 'Moves uploads saved before deduplication into the content-addressed store (knowa_server/storage.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in apps.get_models():
+            fields = blob_fields(model)
+            if not fields:
+                continue
+            moved, last_pk = 0, 0
+            rows = model.objects.order_by('pk').only('pk', *fields)
+            while True:
+                batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                for instance in batch:
+                    moved += self.move_files(instance, fields)
+                last_pk = batch[-1].pk
+            self.stdout.write(f"{model._meta.label}: moved {moved} file(s).")
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def move_files(self, instance, fields):
+        old_names = {}
+        for field in fields:
+            name = getattr(instance, field).name
+            if not name or name.startswith(BLOB_PREFIX):
+                continue
+            if not dedup_storage.exists(name):
+                self.stderr.write(f"Missing file {name} ({instance._meta.label} {instance.pk})")
+                continue
+            with dedup_storage.open(name, 'rb') as original:
+                setattr(instance, field, dedup_storage.save(name, original))
+            old_names[field] = name
+        if not old_names:
+            return 0
+
+        with transaction.atomic():
+            # A normal save, so the signals count the references and redo the resized copies
+            instance.save(update_fields=list(old_names))
+            # Old upload names were unique to this row
+            transaction.on_commit(lambda: self.delete_files(old_names.values()))
+        return len(old_names)
+
+    def delete_files(self, names):
+        for name in names:
+            dedup_storage.delete(name)
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk_import import BATCH_SIZE, MemberImport
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates users from a CSV file. Columns: username, email, first_name (required); '
+        'last_name, phone, interests, password, member_status (optional). '
+        'Users without a password get a welcome email asking them to use Forgot Password.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; create nothing')
+        parser.add_argument('--no-email', action='store_true', help="Don't send welcome emails")
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default: CPU count)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        job = MemberImport(
+            dry_run=options['dry_run'],
+            send_email=not options['no_email'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            progress=lambda result: self.stdout.write(
+                f"  {result['processed']} rows read, {result['created']} created, {result['error_count']} errors"
+            ),
+        )
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as csv_file:
+                result = job.run(csv_file)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['error']}"))
+        if result['error_count'] > len(result['errors']):
+            self.stdout.write(f"... and {result['error_count'] - len(result['errors'])} more error(s)")
+
+        verb = 'would be created' if options['dry_run'] else 'created'
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['valid']} of {result['processed']} user(s) {verb} "
+            f"in {time.monotonic() - started:.1f}s ({result['error_count']} error(s))."
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from users.models import OneTimeCode
+
+class Command(BaseCommand):
+    help = 'Deletes login / password reset codes that expired and no longer count toward a lock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = OneTimeCode.objects.purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} one-time code(s).'))
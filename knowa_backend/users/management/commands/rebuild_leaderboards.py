@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from users.leaderboards import rebuild
+
+class Command(BaseCommand):
+    help = 'Rebuilds all volunteer and donor leaderboards from event crew and approved donation history'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Rebuilding leaderboards...")
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Leaderboards rebuilt ({rows} score rows).'))
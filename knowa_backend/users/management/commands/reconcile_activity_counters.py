@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from users.activity import reconcile_counters
+from users.badges import sync_all_badges
+
+class Command(BaseCommand):
+    help = 'Recomputes UserProfile.total_events_joined / total_donations_made from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-badges', action='store_true', help="Don't award badges after reconciling")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconciling activity counters...")
+        updated = reconcile_counters()
+        self.stdout.write(f"Updated {updated} profile(s).")
+
+        if not options['skip_badges']:
+            awarded = sync_all_badges()
+            self.stdout.write(f"Awarded {awarded} badge(s).")
+
+        self.stdout.write(self.style.SUCCESS('Reconciliation complete.'))
@@ -15,11 +15,7 @@ class Command(BaseCommand):
         self.stdout.write("Checking for upcoming events and meetings...")
 
         # --- 1. CHECK EVENTS ---
-        events = Event.objects.filter(
-            start_time__gt=now,
-            start_time__lte=upcoming_window,
-            status='PUBLISHED'
-        )
+        events = Event.objects.published().starting_between(now, upcoming_window).select_related('organizer')
 
         for event in events:
             time_until = event.start_time - now
@@ -46,10 +42,7 @@ class Command(BaseCommand):
                     self.stdout.write(f"Sent event reminder to {user.username}")
 
         # --- 2. CHECK MEETINGS ---
-        meetings = Meeting.objects.filter(
-            start_time__gt=now,
-            start_time__lte=upcoming_window
-        )
+        meetings = Meeting.objects.starting_between(now, upcoming_window).select_related('organizer')
 
         for meeting in meetings:
             time_until = meeting.start_time - now
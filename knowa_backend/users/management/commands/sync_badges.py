@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from users.badges import sync_all_badges
+
+class Command(BaseCommand):
+    help = 'Awards every badge users already qualify for (backfill for UserProfile.earned_badges)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        self.stdout.write("Checking badge milestones for all users...")
+        awarded = sync_all_badges(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Awarded {awarded} badge(s).'))
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.25 on 2026-10-19 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_userfeedback'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interview',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=30),
+        ),
+        migrations.AddIndex(
+            model_name='interview',
+            index=models.Index(fields=['interviewer', 'status', 'date_time'], name='interview_busy_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.25 on 2026-10-19 19:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('VOLUNTEERS', 'Top Volunteers'), ('DONORS', 'Top Donors')], max_length=20)),
+                ('period', models.CharField(max_length=7)),
+                ('score', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', 'period', '-score'], name='leaderboard_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardscore',
+            constraint=models.UniqueConstraint(fields=('board', 'period', 'user'), name='unique_leaderboard_entry'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:05
+
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    # The post_save signal now only creates profiles for new users, so give
+    # older accounts that never had one (e.g. early admins) a profile now.
+    User = apps.get_model('users', 'User')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    missing = User.objects.filter(profile__isnull=True).values_list('pk', flat=True)
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id) for user_id in missing],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_backfill_user_profiles'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='tac_code',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='tac_expiry',
+        ),
+        migrations.CreateModel(
+            name='OneTimeCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purpose', models.CharField(choices=[('LOGIN', 'Login (2FA)'), ('PASSWORD_RESET', 'Password Reset')], max_length=20)),
+                ('code_hash', models.CharField(max_length=64)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('issued_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='one_time_codes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='onetimecode',
+            constraint=models.UniqueConstraint(fields=('user', 'purpose'), name='one_code_per_user_purpose'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:04
+
+from django.db import migrations, models
+import django.utils.timezone
+import knowa_server.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0024_media_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='identification',
+            field=models.FileField(blank=True, null=True, storage=knowa_server.storage.DedupStorage(), upload_to='identifications/'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='payment_receipt',
+            field=models.FileField(blank=True, null=True, storage=knowa_server.storage.DedupStorage(), upload_to='receipts/'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='resume',
+            field=models.FileField(blank=True, null=True, storage=knowa_server.storage.DedupStorage(), upload_to='resumes/'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('touched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'touched_at'], name='mediablob_unused_idx')],
+            },
+        ),
+    ]
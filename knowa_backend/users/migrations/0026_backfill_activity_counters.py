@@ -0,0 +1,44 @@
+# Generated by Django 4.2.25 on 2026-10-19 21:10
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def reconcile_counters(apps, schema_editor):
+    # total_events_joined / total_donations_made are now kept up to date by
+    # signals (users/activity.py) instead of being counted on read. Fill them
+    # in for existing users; same SQL as activity.reconcile_counters().
+    UserProfile = apps.get_model('users', 'UserProfile')
+    Event = apps.get_model('events', 'Event')
+    Donation = apps.get_model('donations', 'Donation')
+
+    def count_of(queryset):
+        return Coalesce(Subquery(
+            queryset.filter(user_id=OuterRef('user_id'))
+            .order_by().values('user_id').annotate(total=Count('*')).values('total')
+        ), Value(0))
+
+    UserProfile.objects.update(
+        total_events_joined=(
+            count_of(Event.participants.through.objects.all()) +
+            count_of(Event.crew.through.objects.all())
+        ),
+        total_donations_made=count_of(Donation.objects.filter(status='APPROVED')),
+    )
+
+    from users.profile_cache import bump_all_users
+    bump_all_users()  # cached /me payloads still show the old counts
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0025_dedup_media_storage'),
+        ('events', '0007_media_variants'),
+        ('donations', '0004_dedup_media_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconcile_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.25 on 2026-10-19 21:15
+
+from django.db import migrations
+
+COUNTER_FOR = {'EVENT': 'total_events_joined', 'DONATION': 'total_donations_made'}
+
+
+def award_earned_badges(apps, schema_editor):
+    # Badges are now stored in earned_badges when they are earned (users/badges.py)
+    # instead of being worked out on read. Award what existing users already
+    # qualify for, from the counters 0026 filled in; same rule as sync_badges.
+    Badge = apps.get_model('users', 'Badge')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    Earned = UserProfile.earned_badges.through
+
+    for badge in Badge.objects.all():
+        counter = COUNTER_FOR.get(badge.criteria_type)
+        if counter is None:
+            continue
+        profile_ids = (
+            UserProfile.objects.filter(**{f'{counter}__gte': badge.threshold})
+            .exclude(earned_badges=badge)
+            .values_list('pk', flat=True)
+        )
+        Earned.objects.bulk_create(
+            [Earned(userprofile_id=profile_id, badge_id=badge.pk) for profile_id in profile_ids.iterator()],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+    from users.profile_cache import bump_all_users
+    bump_all_users()  # cached /me payloads still show no badges
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0026_backfill_activity_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(award_earned_badges, migrations.RunPython.noop),
+    ]
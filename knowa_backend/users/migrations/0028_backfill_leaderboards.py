@@ -0,0 +1,54 @@
+# Generated by Django 4.2.25 on 2026-10-19 21:30
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def rebuild_leaderboards(apps, schema_editor):
+    # Scores are bumped by signals as activity happens (users/leaderboards.py),
+    # so history from before the leaderboards existed has to be counted once.
+    # Same GROUP BY queries as leaderboards.rebuild().
+    LeaderboardScore = apps.get_model('users', 'LeaderboardScore')
+    Event = apps.get_model('events', 'Event')
+    Donation = apps.get_model('donations', 'Donation')
+
+    crew = Event.crew.through.objects.order_by()
+    approved = Donation.objects.filter(status='APPROVED', user__isnull=False).order_by()
+    sources = [
+        ('VOLUNTEERS',
+         crew.annotate(month=TruncMonth('event__start_time')).values('user_id', 'month').annotate(total=Count('*')),
+         crew.values('user_id').annotate(total=Count('*'))),
+        ('DONORS',
+         approved.annotate(month=TruncMonth('submitted_at')).values('user_id', 'month').annotate(total=Sum('amount')),
+         approved.values('user_id').annotate(total=Sum('amount'))),
+    ]
+
+    rows = []
+    for board, monthly, all_time in sources:
+        for row in monthly:
+            period = row['month'].strftime('%Y-%m')
+            rows.append(LeaderboardScore(board=board, period=period, user_id=row['user_id'], score=row['total']))
+        for row in all_time:
+            rows.append(LeaderboardScore(board=board, period='ALL', user_id=row['user_id'], score=row['total']))
+
+    LeaderboardScore.objects.all().delete()
+    LeaderboardScore.objects.bulk_create(rows, batch_size=1000)
+
+    # Cached top-K snapshots and rank sets are keyed by this version
+    from django.core.cache import cache
+    try:
+        cache.incr('leaderboard:version')
+    except ValueError:
+        cache.set('leaderboard:version', 2, None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0027_backfill_earned_badges'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_leaderboards, migrations.RunPython.noop),
+    ]
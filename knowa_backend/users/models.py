@@ -1,12 +1,16 @@
 # users/models.py
 # define what user is, what info they have and what they can do
-from django.db import models
+from django.db import connections, models
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
-import random
+from django.db.models import F
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
 import datetime
+import secrets
+import uuid
+from knowa_server.storage import dedup_storage
 
 
 class User(AbstractUser):
@@ -31,9 +35,13 @@ class User(AbstractUser):
     phone = models.CharField(max_length=20, blank=True) # For Phone Number
     interests = models.CharField(max_length=255, blank=True) # Will store "Education,Arts"
 
-    # --- 2FA FIELDS ---
-    tac_code = models.CharField(max_length=6, blank=True, null=True)
-    tac_expiry = models.DateTimeField(blank=True, null=True)
+    # --- 2FA ---
+    # Login and password reset codes live in OneTimeCode (below), not on this row
+
+    # --- TOKEN REVOCATION ---
+    # Copied into every JWT as the 'ver' claim; bumping it revokes old tokens
+    # (see users/authentication.py)
+    token_version = models.PositiveIntegerField(default=0)
 
     # --- FIX from last time ---
     groups = models.ManyToManyField(
@@ -57,31 +65,148 @@ class User(AbstractUser):
         related_query_name="user",
     )
 
+    class Meta(AbstractUser.Meta):
+        swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            # Prefix (typeahead) search in the user directory; username is already unique-indexed
+            models.Index(fields=['first_name'], name='user_first_name_idx'),
+            models.Index(fields=['email'], name='user_email_idx'),
+            # Role filters (members, volunteers, pending applicants)
+            models.Index(fields=['member_status', 'username'], name='user_status_username_idx'),
+        ]
+
     # --- HELPER FUNCTIONS ---
-    def generate_tac(self):
-        """Generates a 6-digit TAC and sets expiry time for 5 minutes."""
-        tac = str(random.randint(100000, 999999))
-        self.tac_code = tac
-        self.tac_expiry = timezone.now() + datetime.timedelta(minutes=5)
-        self.save(update_fields=['tac_code', 'tac_expiry'])
-        return tac
-
-    def is_tac_valid(self, tac):
-        """Checks if the provided TAC is correct and not expired."""
-        if tac == self.tac_code and timezone.now() < self.tac_expiry:
-            # TAC is valid, clear it to prevent reuse
-            self.tac_code = None
-            self.tac_expiry = None
-            self.save(update_fields=['tac_code', 'tac_expiry'])
-            return True
+    def revoke_tokens(self):
+        """Invalidates every JWT issued so far. Call before save()."""
+        self.token_version += 1
+
+    def generate_tac(self, purpose=None):
+        """Issues a new 6-digit TAC (valid for 5 minutes) for `purpose` and returns it; None if throttled."""
+        return OneTimeCode.objects.issue(self, purpose or OneTimeCode.Purpose.LOGIN)
+
+    def is_tac_valid(self, tac, purpose=None):
+        """Checks the TAC for `purpose`. A correct code is used up; wrong guesses are counted."""
+        return OneTimeCode.objects.verify(self, purpose or OneTimeCode.Purpose.LOGIN, tac)
+
+
+# --- ONE-TIME CODES ---
+# Login (2FA) and password reset codes. Kept in their own small table so
+# issuing and checking a code never writes the wide users_user row, and only
+# a hash of the code is stored. One live code per user and purpose: a new
+# request replaces the old code, at most once every RESEND_SECONDS. Wrong
+# guesses carry over to the new code for LOCK_SECONDS, so asking for code
+# after code doesn't buy more guesses.
+
+class OneTimeCodeQuerySet(models.QuerySet):
+    def issue(self, user, purpose):
+        """
+        Creates (or replaces) the user's code for `purpose`. Returns the plain
+        code, or None if the last one was issued under RESEND_SECONDS ago or
+        is locked after MAX_ATTEMPTS wrong guesses (until LOCK_SECONDS pass).
+        """
+        now = timezone.now()
+        attempts = 0
+        previous = self.filter(user=user, purpose=purpose).values('attempts', 'issued_at').first()
+        if previous and previous['issued_at'] > now - datetime.timedelta(seconds=OneTimeCode.LOCK_SECONDS):
+            if previous['attempts'] >= OneTimeCode.MAX_ATTEMPTS:
+                return None
+            if previous['issued_at'] > now - datetime.timedelta(seconds=OneTimeCode.RESEND_SECONDS):
+                return None
+            attempts = previous['attempts']
+
+        code = f"{secrets.randbelow(900000) + 100000}"
+        entry = OneTimeCode(
+            user=user, purpose=purpose, attempts=attempts,
+            code_hash=OneTimeCode.hash_code(user.pk, purpose, code),
+            expires_at=now + datetime.timedelta(seconds=OneTimeCode.TTL_SECONDS),
+        )
+        # One upsert query (INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE)
+        # instead of update_or_create's locked SELECT then INSERT or UPDATE.
+        # MySQL picks the conflicting unique key itself and can't be told.
+        features = connections[self.db].features
+        self.bulk_create(
+            [entry],
+            update_conflicts=True,
+            unique_fields=['user', 'purpose'] if features.supports_update_conflicts_with_target else None,
+            update_fields=['code_hash', 'expires_at', 'attempts', 'issued_at'],
+        )
+        return code
+
+    def verify(self, user, purpose, code):
+        """
+        True if `code` is the user's live code for `purpose`; the code is then
+        deleted so it can't be reused. A wrong guess counts an attempt, and
+        after MAX_ATTEMPTS the code stops working until a new one is issued.
+        """
+        live = self.filter(user=user, purpose=purpose, expires_at__gt=timezone.now(),
+                           attempts__lt=OneTimeCode.MAX_ATTEMPTS)
+        entry = live.only('pk', 'code_hash').first()
+        if entry is None or not code:
+            return False
+        if constant_time_compare(entry.code_hash, OneTimeCode.hash_code(user.pk, purpose, str(code))):
+            # Deleting is the claim: of two requests with the same code, only one wins
+            return self.filter(pk=entry.pk).delete()[0] > 0
+        live.filter(pk=entry.pk).update(attempts=F('attempts') + 1)
         return False
 
+    def purge_expired(self, batch_size=1000):
+        """
+        Deletes codes that expired more than LOCK_SECONDS after being issued,
+        a batch at a time. Returns how many. Younger rows still carry their
+        wrong-guess count to the next code, so they stay.
+        """
+        # expires_at is issued_at + TTL_SECONDS (and indexed)
+        past_lock = datetime.timedelta(seconds=OneTimeCode.LOCK_SECONDS - OneTimeCode.TTL_SECONDS)
+        stale = self.filter(expires_at__lte=timezone.now() - past_lock)
+        deleted = 0
+        while True:
+            ids = list(stale.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            self.filter(pk__in=ids).delete()
+            deleted += len(ids)
+
+class OneTimeCode(models.Model):
+    TTL_SECONDS = 5 * 60
+    MAX_ATTEMPTS = 5
+    RESEND_SECONDS = 60      # a new code at most once a minute
+    LOCK_SECONDS = 15 * 60   # wrong guesses count across new codes for this long
+
+    class Purpose(models.TextChoices):
+        LOGIN = 'LOGIN', 'Login (2FA)'
+        PASSWORD_RESET = 'PASSWORD_RESET', 'Password Reset'
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='one_time_codes')
+    purpose = models.CharField(max_length=20, choices=Purpose.choices)
+    code_hash = models.CharField(max_length=64)
+    expires_at = models.DateTimeField(db_index=True)  # purge_one_time_codes
+    attempts = models.PositiveSmallIntegerField(default=0)
+    issued_at = models.DateTimeField(auto_now=True)
+
+    objects = OneTimeCodeQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'purpose'], name='one_code_per_user_purpose'),
+        ]
+
+    @staticmethod
+    def hash_code(user_id, purpose, code):
+        # Keyed with SECRET_KEY, so a leaked table can't be brute-forced offline
+        return salted_hmac('users.OneTimeCode', f"{user_id}:{purpose}:{code}", algorithm='sha256').hexdigest()
+
+    def __str__(self):
+        return f"{self.get_purpose_display()} code for user {self.user_id}"
+
 class Badge(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     
     # Store the Canva image here
     image = models.ImageField(upload_to='badges/', null=True, blank=True)
+    # Resized copies of the image above (knowa_server/media.py)
+    media_variants = models.JSONField(default=dict, blank=True, editable=False)
+    MEDIA_FIELDS = ('image',)
     
     # Logic for auto-awarding
     TYPE_CHOICES = [('EVENT', 'Event Joined'), ('DONATION', 'Donation Made')]
@@ -92,6 +217,25 @@ class Badge(models.Model):
         return f"{self.name} ({self.threshold})"
 
     # This model holds all the extra application data
+class UserProfileQuerySet(models.QuerySet):
+    def create_missing(self, user_ids=None, batch_size=500):
+        """
+        Creates an empty profile for every user (or every user in `user_ids`)
+        that has none, in bulk. Safe to call repeatedly or concurrently.
+        For users made with bulk_create, which skips the post_save signal.
+        Returns how many profiles were created.
+        """
+        users = User.objects.filter(profile__isnull=True)
+        if user_ids is not None:
+            users = users.filter(pk__in=list(user_ids))
+        missing = list(users.values_list('pk', flat=True))
+        self.bulk_create(
+            [UserProfile(user_id=user_id) for user_id in missing],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        return len(missing)
+
 class UserProfile(models.Model):
     # Link this profile to a specific user
     user = models.OneToOneField(
@@ -120,6 +264,8 @@ class UserProfile(models.Model):
     total_events_joined = models.IntegerField(default=0)
     total_donations_made = models.IntegerField(default=0)
 
+    objects = UserProfileQuerySet.as_manager()
+
     # --- Background Fields (from image_1b2dc9.png) ---
     education = models.CharField(max_length=255, blank=True, null=True)
     occupation = models.CharField(max_length=255, blank=True, null=True)
@@ -130,9 +276,13 @@ class UserProfile(models.Model):
 
     # --- Attached Files (from image_1b26a2.png) ---
     # We need Pillow installed for this (which you already have)
-    resume = models.FileField(upload_to='resumes/', blank=True, null=True)
-    identification = models.FileField(upload_to='identifications/', blank=True, null=True)
-    payment_receipt = models.FileField(upload_to='receipts/', blank=True, null=True)
+    # Stored once per distinct content (knowa_server/storage.py)
+    resume = models.FileField(upload_to='resumes/', storage=dedup_storage, blank=True, null=True)
+    identification = models.FileField(upload_to='identifications/', storage=dedup_storage, blank=True, null=True)
+    payment_receipt = models.FileField(upload_to='receipts/', storage=dedup_storage, blank=True, null=True)
+    # Resized copies of the files above that are images (knowa_server/media.py)
+    media_variants = models.JSONField(default=dict, blank=True, editable=False)
+    MEDIA_FIELDS = ('resume', 'identification', 'payment_receipt')
     rejection_reason = models.TextField(blank=True, null=True)
 
     def __str__(self):
@@ -151,12 +301,23 @@ class Interview(models.Model):
     # ----------------------------------------------------
     
     date_time = models.DateTimeField()
+    duration_minutes = models.PositiveIntegerField(default=30) # Used for conflict detection
     location = models.CharField(max_length=255, default="Google Meet")
     meeting_link = models.URLField(blank=True, null=True)
     status = models.CharField(max_length=20, default='SCHEDULED')
     report = models.TextField(blank=True, null=True, help_text="Interviewer's notes/report")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Busy-interval lookups for the scheduler
+            models.Index(fields=['interviewer', 'status', 'date_time'], name='interview_busy_idx'),
+        ]
+
+    @property
+    def end_time(self):
+        return self.date_time + datetime.timedelta(minutes=self.duration_minutes)
+
     def __str__(self):
         return f"Interview: {self.applicant.username} with {self.interviewer.username if self.interviewer else 'Admin'}"
     
@@ -186,4 +347,98 @@ class UserFeedback(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user.username} - {self.category}"
\ No newline at end of file
+        return f"{self.user.username} - {self.category}"
+class LeaderboardScore(models.Model):
+    """
+    One row per (board, period, user). The (board, period, score) index keeps each
+    period's scores sorted, so top-K and rank lookups never scan history.
+    """
+    class Board(models.TextChoices):
+        VOLUNTEERS = 'VOLUNTEERS', 'Top Volunteers'  # events crewed
+        DONORS = 'DONORS', 'Top Donors'              # approved donation amount
+
+    board = models.CharField(max_length=20, choices=Board.choices)
+    period = models.CharField(max_length=7)  # 'YYYY-MM' or 'ALL'
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_scores')
+    score = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'period', 'user'], name='unique_leaderboard_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['board', 'period', '-score'], name='leaderboard_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.board} {self.period}: {self.user.username} ({self.score})"
+
+# --- DEDUPLICATED UPLOADS ---
+class MediaBlob(models.Model):
+    """
+    One file in knowa_server.storage.dedup_storage, with the number of rows
+    (donations, profiles) pointing at it. Unused ones are garbage-collected.
+    """
+    name = models.CharField(max_length=255, unique=True)  # blobs/ab/cd/<sha256>.<ext>
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    touched_at = models.DateTimeField(default=timezone.now)  # last upload of these bytes
+
+    class Meta:
+        indexes = [
+            # collect_media_blobs: unused and old
+            models.Index(fields=['ref_count', 'touched_at'], name='mediablob_unused_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+# --- MEMBER IMPORT JOBS (users/bulk_import.py) ---
+class MemberImportJob(models.Model):
+    """
+    Progress of a CSV import started from the admin API. Kept in the
+    database so any worker can answer the status poll.
+    """
+    class State(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    state = models.CharField(max_length=10, choices=State.choices, default=State.QUEUED)
+    # MemberImport.result: processed / valid / created / error_count / errors
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    started_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def fail_if_stale(self, seconds):
+        """
+        Marks a queued or running job FAILED when it has not reported progress
+        for `seconds` (its thread died with a restarted worker). True if it did.
+        """
+        cutoff = timezone.now() - datetime.timedelta(seconds=seconds)
+        stopped = MemberImportJob.objects.filter(
+            pk=self.pk, state__in=[self.State.QUEUED, self.State.RUNNING], updated_at__lt=cutoff
+        ).update(
+            state=self.State.FAILED, updated_at=timezone.now(),
+            error='The import stopped responding. Check which members were created before running it again.',
+        )
+        if stopped:
+            self.refresh_from_db()
+        return bool(stopped)
+
+    def as_status(self):
+        """The status poll's response body."""
+        status = {'state': self.state, **self.result}
+        if self.error:
+            status['error'] = self.error
+        return status
+
+    def __str__(self):
+        return f"Import {self.pk} ({self.state})"
@@ -0,0 +1,48 @@
+# users/profile_cache.py
+# Cached /api/users/me/ payloads.
+# Every user has a version stamp in the cache, and so does the whole catalog
+# (badge names/images). Anything that changes what UserSerializer returns for
+# a user bumps their stamp, so stale payloads are simply never looked up again.
+import time
+
+from django.core.cache import cache
+from knowa_server import caching
+
+ME_TTL = 60 * 60  # entries are versioned, the TTL only frees memory
+ALL_USERS_KEY = 'me-version:all'
+
+
+def _version_key(user_id):
+    return f"me-version:{user_id}"
+
+
+def _new_stamp():
+    # Time-based rather than incr(): never reuses an old stamp, even if the
+    # version key was evicted in between.
+    return time.time_ns()
+
+
+def bump_users(user_ids):
+    """Invalidates the cached /me payload of each user."""
+    stamp = _new_stamp()
+    cache.set_many({_version_key(user_id): stamp for user_id in set(user_ids)}, None)
+
+
+def bump_all_users():
+    """Invalidates every cached /me payload (e.g. a Badge was edited)."""
+    cache.set(ALL_USERS_KEY, _new_stamp(), None)
+
+
+def me_cache_key(user_id, host):
+    """
+    Key for one user's payload. Absolute URLs in the payload depend on the
+    host, so it is part of the key.
+    """
+    user_key = _version_key(user_id)
+    versions = cache.get_many([ALL_USERS_KEY, user_key])
+    return f"me:{user_id}:{host}:{versions.get(ALL_USERS_KEY, 0)}:{versions.get(user_key, 0)}"
+
+
+def get_or_build(user_id, host, build):
+    """Returns the cached payload, or calls `build()` and caches its result."""
+    return caching.cache_get_or_build('me', me_cache_key(user_id, host), build, ME_TTL)
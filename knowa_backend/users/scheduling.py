@@ -0,0 +1,281 @@
+# users/scheduling.py
+# Interview scheduling engine.
+# Keeps every user's busy time (interviews, meetings, events they crew) as a
+# sorted list of merged intervals, so "does this conflict?" is a binary search
+# and "next free slot" only walks the busy blocks it actually has to skip.
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from events.models import Event, Meeting
+from .models import Interview
+
+# --- DEFAULTS ---
+DEFAULT_INTERVIEW_MINUTES = 30
+WORK_DAY_START = time(9, 0)
+WORK_DAY_END = time(17, 0)
+SLOT_GRANULARITY = timedelta(minutes=15)
+# An interview has to fit inside one working day
+WORK_DAY_MINUTES = (WORK_DAY_END.hour * 60 + WORK_DAY_END.minute) - (WORK_DAY_START.hour * 60 + WORK_DAY_START.minute)
+
+# Interviews only store their start, so look back this far when loading
+# a window to catch ones that started earlier but are still running.
+MAX_INTERVIEW_LENGTH = timedelta(minutes=WORK_DAY_MINUTES)
+
+
+# --- REQUEST INPUT ---
+
+def parse_duration_minutes(value):
+    """
+    Interview length in minutes from request input (blank = the default).
+    Raises ValueError unless it is a whole number from 1 to WORK_DAY_MINUTES.
+    """
+    if value is None or value == '':
+        return DEFAULT_INTERVIEW_MINUTES
+    try:
+        minutes = int(value)
+    except TypeError:
+        raise ValueError(value)
+    if not 1 <= minutes <= WORK_DAY_MINUTES:
+        raise ValueError(value)
+    return minutes
+
+
+def parse_local_datetime(value):
+    """
+    An ISO date-time from request input as a naive local time (USE_TZ is off,
+    so the database holds naive values); '...Z' / '+08:00' inputs are
+    converted. None if it can't be parsed.
+    """
+    try:
+        moment = parse_datetime(str(value or ''))
+    except ValueError:  # well formed but out of range, e.g. month 13
+        return None
+    if moment is not None and timezone.is_aware(moment):
+        moment = timezone.make_naive(moment)
+    return moment
+
+
+class IntervalSet:
+    """
+    Non-overlapping [start, end) intervals kept sorted by start.
+    Overlapping or touching intervals are merged on insert.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end):
+        if end <= start:
+            return
+        # Intervals i..j-1 overlap or touch [start, end); ends[] is sorted
+        # because the intervals are disjoint and sorted by start.
+        i = bisect_left(self.ends, start)
+        j = bisect_right(self.starts, end)
+        if i < j:
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j - 1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def find_conflict(self, start, end):
+        """Returns the busy (start, end) block overlapping [start, end), or None."""
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] > start:
+            return self.starts[i], self.ends[i]
+        i += 1
+        if i < len(self.starts) and self.starts[i] < end:
+            return self.starts[i], self.ends[i]
+        return None
+
+    def conflicts(self, start, end):
+        return self.find_conflict(start, end) is not None
+
+
+def _round_up(moment, step=SLOT_GRANULARITY):
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = moment - midnight
+    remainder = elapsed % step
+    if remainder:
+        moment += step - remainder
+    return moment.replace(microsecond=0)
+
+
+def _clamp_to_working_hours(moment, duration, day_start=WORK_DAY_START, day_end=WORK_DAY_END):
+    """Moves `moment` forward until [moment, moment + duration) fits inside working hours."""
+    opening = datetime.combine(moment.date(), day_start, tzinfo=moment.tzinfo)
+    closing = datetime.combine(moment.date(), day_end, tzinfo=moment.tzinfo)
+    if moment < opening:
+        return opening
+    if moment + duration > closing:
+        return opening + timedelta(days=1)
+    return moment
+
+
+class BusyCalendar:
+    """Busy intervals per user id."""
+
+    def __init__(self):
+        self._busy = defaultdict(IntervalSet)
+
+    def add(self, user_id, start, end):
+        self._busy[user_id].add(start, end)
+
+    def find_conflict(self, user_ids, start, end):
+        for user_id in user_ids:
+            if user_id is None or user_id not in self._busy:
+                continue
+            block = self._busy[user_id].find_conflict(start, end)
+            if block:
+                return user_id, block
+        return None
+
+    def conflicts(self, user_ids, start, end):
+        return self.find_conflict(user_ids, start, end) is not None
+
+    def next_free_slot(self, user_ids, after, duration, until=None,
+                       day_start=WORK_DAY_START, day_end=WORK_DAY_END):
+        """
+        Earliest start >= `after` where every user in `user_ids` is free for
+        `duration` within working hours. Returns None if nothing fits before `until`.
+        """
+        candidate = _round_up(after)
+        while until is None or candidate + duration <= until:
+            candidate = _clamp_to_working_hours(candidate, duration, day_start, day_end)
+            if until is not None and candidate + duration > until:
+                break
+            hit = self.find_conflict(user_ids, candidate, candidate + duration)
+            if hit is None:
+                return candidate
+            # Jump straight past the blocking interval
+            candidate = _round_up(hit[1][1])
+        return None
+
+
+def load_busy_calendar(user_ids, start, end, exclude_interview_ids=()):
+    """
+    Builds a BusyCalendar for `user_ids` covering [start, end) from:
+    scheduled interviews (as interviewer or applicant), meetings (organizer or
+    invitee) and published events (organizer or crew).
+    Uses flat value queries only; no model instances are created.
+    """
+    user_ids = set(user_ids)
+    calendar = BusyCalendar()
+    if not user_ids:
+        return calendar
+
+    # 1. Interviews
+    interviews = Interview.objects.filter(
+        Q(interviewer_id__in=user_ids) | Q(applicant_id__in=user_ids),
+        status='SCHEDULED',
+        date_time__lt=end,
+        date_time__gte=start - MAX_INTERVIEW_LENGTH,
+    ).exclude(id__in=exclude_interview_ids).values_list(
+        'interviewer_id', 'applicant_id', 'date_time', 'duration_minutes'
+    )
+    for interviewer_id, applicant_id, date_time, minutes in interviews:
+        finish = date_time + timedelta(minutes=minutes)
+        for user_id in (interviewer_id, applicant_id):
+            if user_id in user_ids:
+                calendar.add(user_id, date_time, finish)
+
+    # 2. Meetings
+    meeting_window = Meeting.objects.overlapping(start, end)
+    for user_id, m_start, m_end in meeting_window.filter(organizer_id__in=user_ids).values_list(
+        'organizer_id', 'start_time', 'end_time'
+    ):
+        calendar.add(user_id, m_start, m_end)
+
+    invites = Meeting.participants.through.objects.filter(
+        user_id__in=user_ids,
+        meeting__start_time__lt=end,
+        meeting__end_time__gt=start,
+    ).values_list('user_id', 'meeting__start_time', 'meeting__end_time')
+    for user_id, m_start, m_end in invites:
+        calendar.add(user_id, m_start, m_end)
+
+    # 3. Events they run (organizer or crew)
+    event_window = Event.objects.published().overlapping(start, end)
+    for user_id, e_start, e_end in event_window.filter(organizer_id__in=user_ids).values_list(
+        'organizer_id', 'start_time', 'end_time'
+    ):
+        calendar.add(user_id, e_start, e_end)
+
+    crew = Event.crew.through.objects.filter(
+        user_id__in=user_ids,
+        event__status=Event.EventStatus.PUBLISHED,
+        event__start_time__lt=end,
+        event__end_time__gt=start,
+    ).values_list('user_id', 'event__start_time', 'event__end_time')
+    for user_id, e_start, e_end in crew:
+        calendar.add(user_id, e_start, e_end)
+
+    return calendar
+
+
+def plan_interviews(applicant_ids, interviewer_ids, start, end, duration,
+                    day_start=WORK_DAY_START, day_end=WORK_DAY_END):
+    """
+    Greedily assigns each applicant (in order) to whichever interviewer can see
+    them soonest, respecting both sides' existing commitments.
+
+    Returns (assignments, unassigned) where assignments is a list of
+    (applicant_id, interviewer_id, start_time).
+    """
+    calendar = load_busy_calendar(set(applicant_ids) | set(interviewer_ids), start, end)
+
+    # Min-heap of (next time this interviewer might be free, interviewer_id)
+    heap = []
+    for interviewer_id in interviewer_ids:
+        slot = calendar.next_free_slot([interviewer_id], start, duration, end, day_start, day_end)
+        if slot is not None:
+            heap.append((slot, interviewer_id))
+    heapq.heapify(heap)
+
+    assignments = []
+    unassigned = []
+    for applicant_id in applicant_ids:
+        # Heap keys are lower bounds on each interviewer's availability, so once
+        # the smallest key is no earlier than the best joint slot found we can stop.
+        best = None
+        popped = []
+        while heap:
+            slot, interviewer_id = heapq.heappop(heap)
+            popped.append((slot, interviewer_id))
+            if best is not None and slot >= best[0]:
+                break
+            joint = calendar.next_free_slot(
+                [interviewer_id, applicant_id], slot, duration, end, day_start, day_end
+            )
+            if joint is not None and (best is None or joint < best[0]):
+                best = (joint, interviewer_id)
+
+        if best is None:
+            for item in popped:
+                heapq.heappush(heap, item)
+            unassigned.append(applicant_id)
+            continue
+
+        slot, interviewer_id = best
+        calendar.add(interviewer_id, slot, slot + duration)
+        calendar.add(applicant_id, slot, slot + duration)
+        assignments.append((applicant_id, interviewer_id, slot))
+
+        # Put everyone back, with the booked interviewer requeued at their next opening
+        for item in popped:
+            if item[1] != interviewer_id:
+                heapq.heappush(heap, item)
+        next_slot = calendar.next_free_slot([interviewer_id], slot + duration, duration, end, day_start, day_end)
+        if next_slot is not None:
+            heapq.heappush(heap, (next_slot, interviewer_id))
+
+    return assignments, unassigned
@@ -2,8 +2,11 @@
 from rest_framework import serializers
 from .models import User, UserProfile, Interview, Badge, Notification, UserFeedback
 # Import the default token serializer
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import check_token_state
 from django.core.exceptions import ValidationError 
+from knowa_server.media import media_url
 import re 
 
 # --- SERIALIZER FOR USER PROFILE ---
@@ -16,9 +19,10 @@ class BadgeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'image_url', 'criteria_type', 'threshold']
 
     def get_image_url(self, obj):
+        # Badges are shown as small icons: the thumbnail (knowa_server/media.py)
         request = self.context.get('request')
         if obj.image and request:
-            return request.build_absolute_uri(obj.image.url)
+            return media_url(request, obj, 'image', size='thumb')
         return None
 
 # 2. UserProfileSerializer (Uses BadgeSerializer)
@@ -26,6 +30,11 @@ class UserProfileSerializer(serializers.ModelSerializer):
     resume_url = serializers.SerializerMethodField()
     identification_url = serializers.SerializerMethodField()
     payment_receipt_url = serializers.SerializerMethodField()
+    # Resized copies for photographed documents (None for PDFs or until ready);
+    # the *_url fields above stay full size for checking details
+    resume_preview_url = serializers.SerializerMethodField()
+    identification_preview_url = serializers.SerializerMethodField()
+    payment_receipt_preview_url = serializers.SerializerMethodField()
     status = serializers.CharField(source='user.member_status', read_only=True)
     
     # This includes the list of badges in the profile data
@@ -46,6 +55,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'resume_url',
             'identification_url',
             'payment_receipt_url',
+            'resume_preview_url',
+            'identification_preview_url',
+            'payment_receipt_preview_url',
             'earned_badges', 
             'total_events_joined', 
             'total_donations_made',
@@ -76,6 +88,15 @@ class UserProfileSerializer(serializers.ModelSerializer):
     def get_payment_receipt_url(self, obj):
         return self.get_full_url(obj.payment_receipt)
 
+    def get_resume_preview_url(self, obj):
+        return media_url(self.context.get('request'), obj, 'resume', fallback=False)
+
+    def get_identification_preview_url(self, obj):
+        return media_url(self.context.get('request'), obj, 'identification', fallback=False)
+
+    def get_payment_receipt_preview_url(self, obj):
+        return media_url(self.context.get('request'), obj, 'payment_receipt', fallback=False)
+
 # --- SERIALIZER FOR CUSTOM LOGIN ---
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -84,6 +105,8 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['username'] = user.username
         token['member_status'] = user.member_status
         token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token['ver'] = user.token_version  # checked by ClaimsJWTAuthentication
         token['first_name'] = user.first_name
         token['phone'] = user.phone
         
@@ -99,7 +122,30 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         return token
 
+# Refresh tokens carry the same 'ver' claim: a revoked (password reset,
+# role change) or deactivated user can't refresh their way back in
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if 'ver' in refresh:
+            check_token_state(refresh, int(refresh[api_settings.USER_ID_CLAIM]))
+        return super().validate(attrs)
+
 # --- SERIALIZER FOR REGISTRATION ---
+def password_problem(password):
+    """The first password rule `password` breaks, or None. Shared with users/bulk_import.py."""
+    if len(password) < 8:
+        return "Password must be at least 8 characters."
+    if not re.search(r'[A-Z]', password):
+        return "Must contain at least one capital letter."
+    if not re.search(r'[a-z]', password):
+        return "Must contain at least one small letter."
+    if not re.search(r'[0-9]', password):
+        return "Must contain at least one number."
+    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
+        return "Must contain at least one symbol."
+    return None
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password2 = serializers.CharField(style={'input_type': 'password'}, write_only=True)
     first_name = serializers.CharField(required=True) 
@@ -118,28 +164,22 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         if data['password'] != data['password2']:
             raise serializers.ValidationError({"password": "Passwords must match."})
         
-        password = data['password']
-        if len(password) < 8:
-            raise serializers.ValidationError({"password": "Password must be at least 8 characters."})
-        if not re.search(r'[A-Z]', password):
-            raise serializers.ValidationError({"password": "Must contain at least one capital letter."})
-        if not re.search(r'[a-z]', password):
-            raise serializers.ValidationError({"password": "Must contain at least one small letter."})
-        if not re.search(r'[0-9]', password):
-            raise serializers.ValidationError({"password": "Must contain at least one number."})
-        if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-            raise serializers.ValidationError({"password": "Must contain at least one symbol."})
+        problem = password_problem(data['password'])
+        if problem:
+            raise serializers.ValidationError({"password": problem})
         
         return data
 
     def create(self, validated_data):
+        # New sign-ups can log in but are not Members yet
         user = User.objects.create_user(
             username=validated_data['username'],
             email=validated_data['email'],
             password=validated_data['password'],
             first_name=validated_data.get('first_name', ''),
             phone=validated_data.get('phone', ''),
-            interests=validated_data.get('interests', '')
+            interests=validated_data.get('interests', ''),
+            member_status=User.MemberStatus.PUBLIC,
         )
         return user
 
@@ -210,15 +250,10 @@ class UserSerializer(serializers.ModelSerializer):
         return 'member'
 
     def get_total_events(self, obj):
-        participant_count = 0
-        crew_count = 0
-        
-        if hasattr(obj, 'joined_events_as_participant'):
-            participant_count = obj.joined_events_as_participant.count()
-        if hasattr(obj, 'joined_events_as_crew'):
-            crew_count = obj.joined_events_as_crew.count()
-            
-        return participant_count + crew_count
+        # Maintained counter (see users/activity.py), no COUNT queries
+        if hasattr(obj, 'profile'):
+            return obj.profile.total_events_joined
+        return 0
 
     # --- FIX: LOGIC FOR RECEIPT ---
     def get_has_receipt(self, obj):
@@ -234,61 +269,23 @@ class UserSerializer(serializers.ModelSerializer):
         return ""
 
     def get_badges(self, obj):
-        badges_data = []
-        total_events = self.get_total_events(obj)
-        
-        total_donations = 0
-        if hasattr(obj, 'profile') and hasattr(obj.profile, 'total_donations_made'):
-            total_donations = obj.profile.total_donations_made
-
-        event_badges_rules = [
-            (1, "NEWCOMER"),      
-            (5, "MEMBER"),        
-            (10, "ENTHUSIAST"),   
-            (20, "VETERAN"),
-            (50, "LEGEND"),
-        ]
-
-        donation_badges_rules = [
-            (1, "SUPPORTER"),
-            (5, "CONTRIBUTOR"),
-            (10, "PARTNER"),
-            (20, "PATRON"),
-            (50, "PHILANTHROPIST"),
-        ]
+        # Badges are awarded ahead of time by users/badges.py; this only reads
+        # profile.earned_badges (prefetched by CurrentUserView).
+        if not hasattr(obj, 'profile'):
+            return []
 
-        def try_add_badge(name):
-            from users.models import Badge 
-            try:
-                real_badge = Badge.objects.get(name=name)
-                image_url = None
-                if real_badge.image:
-                    request = self.context.get('request')
-                    if request:
-                        image_url = request.build_absolute_uri(real_badge.image.url)
-                    else:
-                        image_url = real_badge.image.url
-                
-                badges_data.append({
-                    "name": real_badge.name,
-                    "description": real_badge.description,
-                    "image_url": image_url,
-                    "icon": "star"
-                })
-            except Badge.DoesNotExist:
-                pass
-            except Exception as e:
-                # print(f"Error adding badge: {e}")
-                pass
-
-        for threshold, badge_name in event_badges_rules:
-            if total_events >= threshold:
-                try_add_badge(badge_name)
-
-        for threshold, badge_name in donation_badges_rules:
-            if total_donations >= threshold:
-                try_add_badge(badge_name)
+        request = self.context.get('request')
+        badges = sorted(obj.profile.earned_badges.all(), key=lambda b: (b.criteria_type != 'EVENT', b.threshold))
 
+        badges_data = []
+        for badge in badges:
+            image_url = media_url(request, badge, 'image', size='thumb')
+            badges_data.append({
+                "name": badge.name,
+                "description": badge.description,
+                "image_url": image_url,
+                "icon": "star"
+            })
         return badges_data
 
     def get_avatar(self, obj):
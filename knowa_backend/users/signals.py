@@ -1,47 +1,204 @@
 # users/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.db.models import F
 from django.dispatch import receiver
-from .models import User, UserProfile
+from .models import User, UserProfile, Badge
+from .badges import award_badges, clear_badge_catalog
+from .activity import adjust_events_joined, adjust_donations_made
+from . import leaderboards
+from .profile_cache import bump_all_users, bump_users
+from .authentication import forget_auth_state
+from events.models import Event
+from knowa_server.media import media_variants_saved, queue_media_variants
+from knowa_server.storage import release_blobs, track_blobs, update_blob_refs
+from donations.models import Donation, DonationStatus
+
+# User fields that are in neither the profile nor the /me payload. Saves
+# limited to them (last_login, password changes) need no profile or cache
+# work. Login codes are not on the user row at all (users.OneTimeCode).
+LOGIN_ONLY_FIELDS = frozenset({'last_login', 'password', 'token_version'})
+
+def _login_only(update_fields):
+    return update_fields is not None and set(update_fields) <= LOGIN_ONLY_FIELDS
 
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
     """
-    Create a UserProfile when a new User is created.
-    If an old user is saved (like an admin) and doesn't have one,
-    create it for them.
+    Create a UserProfile when a new User is created. That is the only time:
+    later saves never touch the profile (a re-save could overwrite the
+    activity counters with a stale copy) and run no queries here.
+    Users inserted with bulk_create or loaddata get theirs from
+    UserProfile.objects.create_missing(); migration 0022 backfilled older
+    accounts that had none.
     """
-    if created:
-        # 1. New user is created
+    if created and not raw:
         UserProfile.objects.create(user=instance)
+
+# --- TOKEN REVOCATION (users/authentication.py) ---
+# Tokens carry these fields as claims (or, for is_active, rely on them), so
+# a change revokes the user's tokens: a demoted admin's token stops working
+# instead of keeping its is_staff claim for the rest of its lifetime.
+AUTH_CLAIM_FIELDS = ('is_staff', 'is_superuser', 'is_active')
+# member_status changes as an application moves along, so it only refreshes
+# the auth stamp, which overrides the token's claim; tokens stay valid.
+AUTH_STATE_FIELDS = ('member_status', 'token_version')
+
+@receiver(pre_save, sender=User)
+def remember_auth_fields(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._auth_change = None
+    if raw or instance.pk is None:
+        return
+    watched = AUTH_CLAIM_FIELDS + AUTH_STATE_FIELDS
+    if update_fields is not None and not set(update_fields) & set(watched):
+        return  # e.g. the last_login save on every login
+    old = User.objects.filter(pk=instance.pk).values(*watched).first()
+    if old is None:
+        return
+    if any(old[field] != getattr(instance, field) for field in AUTH_CLAIM_FIELDS):
+        instance._auth_change = 'claims'
+    elif any(old[field] != getattr(instance, field) for field in AUTH_STATE_FIELDS):
+        instance._auth_change = 'state'  # a password reset (revoke_tokens()) or a new member_status
+
+@receiver(post_save, sender=User)
+def revoke_changed_tokens(sender, instance, raw=False, **kwargs):
+    change = getattr(instance, '_auth_change', None)
+    instance._auth_change = None
+    if raw or change is None:
+        return
+    if change == 'claims':
+        User.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        instance.token_version = User.objects.filter(pk=instance.pk).values_list('token_version', flat=True).first()
+    forget_auth_state([instance.pk])
+
+# --- BADGE ENGINE TRIGGERS ---
+# Badges are awarded when activity changes (joining an event, an approved
+# donation), not when a profile is read.
+
+@receiver([post_save, post_delete], sender=Badge)
+def reset_badge_catalog(sender, **kwargs):
+    clear_badge_catalog()
+    bump_all_users()  # badge names/images are part of every /me payload
+
+# --- RESIZED IMAGES (knowa_server/media.py) ---
+@receiver(post_save, sender=Badge)
+@receiver(post_save, sender=UserProfile)
+def media_uploaded(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue_media_variants(instance)
+
+@receiver(media_variants_saved, sender=Badge)
+def badge_image_resized(sender, **kwargs):
+    clear_badge_catalog()
+    bump_all_users()
+
+@receiver(media_variants_saved, sender=UserProfile)
+def profile_media_resized(sender, instance, **kwargs):
+    bump_users([instance.user_id])
+
+# --- DEDUPLICATED DOCUMENTS (knowa_server/storage.py) ---
+# Re-uploaded IDs/receipts/resumes share the stored file; these keep its use count
+@receiver(pre_save, sender=UserProfile)
+def remember_document_blobs(sender, instance, update_fields=None, raw=False, **kwargs):
+    track_blobs(instance, update_fields, raw)
+
+@receiver(post_save, sender=UserProfile)
+def count_document_blobs(sender, instance, **kwargs):
+    update_blob_refs(instance)
+
+@receiver(post_delete, sender=UserProfile)
+def release_document_blobs(sender, instance, **kwargs):
+    release_blobs(instance)
+
+# --- /me CACHE INVALIDATION ---
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+def user_or_profile_saved(sender, instance, update_fields=None, **kwargs):
+    if sender is User and _login_only(update_fields):
+        return
+    bump_users([instance.pk if sender is User else instance.user_id])
+
+@receiver(m2m_changed, sender=UserProfile.earned_badges.through)
+def earned_badges_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # badge.userprofile_set.add(...): pk_set holds profile ids (None on clear)
+        bump_all_users()
     else:
-        # 2. An existing user is saved
-        try:
-            # Try to save the existing profile
-            instance.profile.save()
-        except UserProfile.DoesNotExist:
-            # --- THIS IS THE FIX ---
-            # If the profile doesn't exist (like for aziidanadmin),
-            # create one for them on the fly.
-            UserProfile.objects.create(user=instance)
-
-def check_badge_milestones(sender, instance, created, **kwargs):
-    """
-    Checks counters and awards badges automatically.
-    """
-    # 1. Check Event Badges
-    event_badges = Badge.objects.filter(
-        criteria_type='EVENT', 
-        threshold__lte=instance.total_events_joined
-    )
-    for badge in event_badges:
-        if badge not in instance.earned_badges.all():
-            instance.earned_badges.add(badge)
-
-    # 2. Check Donation Badges
-    donation_badges = Badge.objects.filter(
-        criteria_type='DONATION', 
-        threshold__lte=instance.total_donations_made
-    )
-    for badge in donation_badges:
-        if badge not in instance.earned_badges.all():
-            instance.earned_badges.add(badge)
\ No newline at end of file
+        bump_users([instance.user_id])
+
+def check_badge_milestones(user_ids):
+    """Awards any newly reached badges to each user."""
+    for user_id in user_ids:
+        award_badges(user_id)
+
+@receiver(m2m_changed, sender=Event.participants.through)
+@receiver(m2m_changed, sender=Event.crew.through)
+def event_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keeps total_events_joined in step with event joins/leaves, then checks badges."""
+    # Forward: event.participants.add(users) -> the instance is the event, pk_set holds user ids
+    # Reverse: user.joined_events_as_crew.add(events) -> the instance is the user
+    if action in ('pre_remove', 'pre_clear'):
+        # Remember which rows really exist; pk_set on remove is whatever was passed in
+        rows = sender.objects.filter(**{('user_id' if reverse else 'event_id'): instance.pk})
+        if action == 'pre_remove':
+            rows = rows.filter(**{('event_id__in' if reverse else 'user_id__in'): pk_set})
+        instance._removed_memberships = list(rows.values_list('event_id', 'user_id'))
+        return
+
+    if action == 'post_add' and pk_set:
+        memberships = [(event_id, instance.pk) for event_id in pk_set] if reverse else [(instance.pk, user_id) for user_id in pk_set]
+        delta = +1
+    elif action in ('post_remove', 'post_clear'):
+        memberships = getattr(instance, '_removed_memberships', [])
+        instance._removed_memberships = []
+        delta = -1
+    else:
+        return
+
+    user_ids = [user_id for _, user_id in memberships]
+    adjust_events_joined(user_ids, delta)
+    if delta > 0:
+        check_badge_milestones(set(user_ids))
+
+    # Crew joins feed the "top volunteers" leaderboard, by the month of the event
+    if sender is Event.crew.through and memberships:
+        if reverse:
+            starts = dict(Event.objects.filter(pk__in={e for e, _ in memberships}).values_list('id', 'start_time'))
+        else:
+            starts = {instance.pk: instance.start_time}
+        for event_id, user_id in memberships:
+            leaderboards.record(leaderboards.Board.VOLUNTEERS, user_id, delta, starts[event_id])
+
+def _status_untouched(update_fields):
+    # save(update_fields=[...]) without 'status' can't change it, whatever
+    # status the (possibly stale) instance carries
+    return update_fields is not None and 'status' not in update_fields
+
+@receiver(pre_save, sender=Donation)
+def remember_donation_status(sender, instance, update_fields=None, **kwargs):
+    instance._previous_status = None
+    if instance.pk and not _status_untouched(update_fields):
+        instance._previous_status = Donation.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+@receiver(post_save, sender=Donation)
+def donation_status_changed(sender, instance, created, update_fields=None, **kwargs):
+    """Counts a donation once when it becomes APPROVED (and un-counts it if that is reversed)."""
+    if not instance.user_id or _status_untouched(update_fields):
+        return
+    was_approved = getattr(instance, '_previous_status', None) == DonationStatus.APPROVED
+    is_approved = instance.status == DonationStatus.APPROVED
+    if is_approved and not was_approved:
+        adjust_donations_made(instance.user_id, +1)
+        leaderboards.record(leaderboards.Board.DONORS, instance.user_id, instance.amount, instance.submitted_at)
+        check_badge_milestones([instance.user_id])
+    elif was_approved and not is_approved:
+        adjust_donations_made(instance.user_id, -1)
+        leaderboards.record(leaderboards.Board.DONORS, instance.user_id, -instance.amount, instance.submitted_at)
+    instance._previous_status = instance.status
+
+@receiver(post_delete, sender=Donation)
+def approved_donation_deleted(sender, instance, **kwargs):
+    if instance.user_id and instance.status == DonationStatus.APPROVED:
+        adjust_donations_made(instance.user_id, -1)
+        leaderboards.record(leaderboards.Board.DONORS, instance.user_id, -instance.amount, instance.submitted_at)
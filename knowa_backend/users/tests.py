@@ -1,3 +1,334 @@
-from django.test import TestCase
+# users/tests.py
+# Query budget of the two-step login (users/views.py LoginRequestTACView and
+# LoginVerifyTACView), the one-time codes behind it, token revocation
+# (users/authentication.py), reference counting of profile documents
+# (knowa_server/storage.py), CSV member imports (users/bulk_import.py), and
+# the admin user search.
+import io
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from knowa_server.storage import collect_blobs, dedup_storage
+from .authentication import user_cache
+from .bulk_import import MemberImport
+from .models import MediaBlob, MemberImportJob, OneTimeCode, User
+from .scheduling import WORK_DAY_MINUTES
+from .serializers import MyTokenObtainPairSerializer
+from .views import CappedCountPaginator
+
+PASSWORD = 'Sup3r-secret!'
+
+
+class TwoStepLoginTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('amy', 'amy@example.com', PASSWORD)
+
+    def request_code(self):
+        # Old enough to be replaced (RESEND_SECONDS)
+        OneTimeCode.objects.update(issued_at=timezone.now() - timedelta(seconds=OneTimeCode.RESEND_SECONDS + 1))
+        mail.outbox.clear()
+        response = self.client.post('/api/users/login/', {'username': 'amy', 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return re.search(r'\b\d{6}\b', mail.outbox[0].body).group()
+
+    def test_login_queries(self):
+        # The user, the previous code's throttle state, then one upsert of the
+        # code; no users_user or profile writes
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                '/api/users/login/', {'username': 'amy', 'password': PASSWORD}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OneTimeCode.objects.filter(user=self.user).count(), 1)
+
+    def test_verify_queries(self):
+        code = self.request_code()
+        # The user with their profile, the code, and deleting it
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                '/api/users/verify-2fa/', {'username': 'amy', 'tac_code': code}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
+
+    def test_new_code_replaces_the_old_one(self):
+        first = self.request_code()
+        second = self.request_code()
+        self.assertEqual(OneTimeCode.objects.filter(user=self.user).count(), 1)
+        if first != second:
+            response = self.client.post('/api/users/verify-2fa/', {'username': 'amy', 'tac_code': first}, format='json')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/users/verify-2fa/', {'username': 'amy', 'tac_code': second}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_code_is_single_use(self):
+        code = self.request_code()
+        self.client.post('/api/users/verify-2fa/', {'username': 'amy', 'tac_code': code}, format='json')
+        response = self.client.post('/api/users/verify-2fa/', {'username': 'amy', 'tac_code': code}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_asking_again_too_soon_is_refused(self):
+        self.request_code()
+        response = self.client.post('/api/users/login/', {'username': 'amy', 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 429)
+
+    def test_wrong_guesses_lock_across_new_codes(self):
+        purpose = OneTimeCode.Purpose.PASSWORD_RESET
+        for _ in range(OneTimeCode.MAX_ATTEMPTS - 1):
+            self.user.generate_tac(purpose)
+            self.assertFalse(self.user.is_tac_valid('000000', purpose))
+            OneTimeCode.objects.update(issued_at=timezone.now() - timedelta(seconds=OneTimeCode.RESEND_SECONDS + 1))
+        code = self.user.generate_tac(purpose)
+        self.assertEqual(OneTimeCode.objects.get().attempts, OneTimeCode.MAX_ATTEMPTS - 1)
+        self.assertFalse(self.user.is_tac_valid('000000', purpose))
+
+        # Locked: even the right code fails, and no new code is issued
+        self.assertFalse(self.user.is_tac_valid(code, purpose))
+        OneTimeCode.objects.update(issued_at=timezone.now() - timedelta(seconds=OneTimeCode.RESEND_SECONDS + 1))
+        self.assertIsNone(self.user.generate_tac(purpose))
+        mail.outbox.clear()
+        response = self.client.post('/api/users/password-reset/', {'email': 'amy@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+
+        # Once the lock period has passed, a fresh code with fresh attempts
+        OneTimeCode.objects.update(issued_at=timezone.now() - timedelta(seconds=OneTimeCode.LOCK_SECONDS + 1))
+        code = self.user.generate_tac(purpose)
+        self.assertTrue(self.user.is_tac_valid(code, purpose))
+
+
+class TokenStateTests(TestCase):
+    def setUp(self):
+        # Stamps outlive a test's rollback, and the next user may reuse its id
+        cache.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user('ben', 'ben@example.com', PASSWORD)
+        token = MyTokenObtainPairSerializer.get_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+
+    def test_applying_keeps_the_session(self):
+        # member_status changes (PUBLIC -> PENDING) must not log the applicant out
+        response = self.client.patch('/api/users/apply/', {'interests': 'Beach cleanups'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.member_status, User.MemberStatus.PENDING)
+
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['member_status'], User.MemberStatus.PENDING)
+
+    def test_losing_staff_revokes_tokens(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class InterviewInputTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser('boss', 'boss@example.com', PASSWORD)
+        self.applicant = User.objects.create_user('cara', 'cara@example.com', PASSWORD)
+        self.client.force_authenticate(self.admin)
+
+    def availability(self, **params):
+        return self.client.get('/api/users/admin/interviews/availability/', {'interviewer_id': self.admin.pk, **params})
+
+    def test_duration_outside_the_work_day_is_rejected(self):
+        for minutes in (0, -30, WORK_DAY_MINUTES + 1, 'abc'):
+            self.assertEqual(self.availability(duration_minutes=minutes).status_code, 400, minutes)
+            response = self.client.post(f'/api/users/admin/interview/{self.applicant.pk}/', {
+                'date_time': '2030-01-07T10:00:00', 'duration_minutes': minutes,
+            }, format='json')
+            self.assertEqual(response.status_code, 400, minutes)
+            response = self.client.post('/api/users/admin/interviews/auto-schedule/', {
+                'duration_minutes': minutes, 'dry_run': True,
+            }, format='json')
+            self.assertEqual(response.status_code, 400, minutes)
+
+    def test_full_work_day_fits(self):
+        response = self.availability(after='2030-01-07T08:00:00', duration_minutes=WORK_DAY_MINUTES)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['next_available'])
+
+    def test_aware_datetimes_are_accepted(self):
+        response = self.availability(after='2030-01-07T01:00:00Z')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(f'/api/users/admin/interview/{self.applicant.pk}/', {
+            'date_time': '2030-01-07T10:00:00+08:00', 'interviewer_id': self.admin.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.applicant.interview.date_time.tzinfo)
+
+        response = self.client.post('/api/users/admin/interviews/auto-schedule/', {
+            'start': '2030-01-07T00:00:00Z', 'end': '2030-01-09T00:00:00Z', 'dry_run': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_after_is_rejected(self):
+        self.assertEqual(self.availability(after='2030-13-45T10:00:00').status_code, 400)
+
+
+class MediaBlobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = self.settings(MEDIA_ROOT=media_root, MEDIA_BLOB_GRACE_SECONDS=3600)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def attach(self, username, content, field='resume'):
+        profile = User.objects.create_user(username, f'{username}@example.com', PASSWORD).profile
+        getattr(profile, field).save('cv.pdf', ContentFile(content))
+        return profile
+
+    def refs(self, name):
+        return MediaBlob.objects.get(name=name).ref_count
+
+    def test_attaching_takes_a_reference(self):
+        profile = self.attach('eve', b'resume v1')
+        self.assertTrue(profile.resume.name.startswith('blobs/'))
+        self.assertEqual(self.refs(profile.resume.name), 1)
+        self.assertTrue(dedup_storage.exists(profile.resume.name))
+
+    def test_replacing_releases_the_old_file_after_the_grace_period(self):
+        profile = self.attach('eve', b'resume v1')
+        old = profile.resume.name
+        profile.resume.save('cv.pdf', ContentFile(b'resume v2'))
+        self.assertEqual(self.refs(old), 0)
+        self.assertEqual(self.refs(profile.resume.name), 1)
+        # Uploaded moments ago: still inside the grace window
+        self.assertEqual(collect_blobs(), 0)
+        self.assertTrue(dedup_storage.exists(old))
+
+        self.assertEqual(collect_blobs(grace_seconds=0), 1)
+        self.assertFalse(dedup_storage.exists(old))
+        self.assertFalse(MediaBlob.objects.filter(name=old).exists())
+        self.assertTrue(dedup_storage.exists(profile.resume.name))
+
+    def test_deleting_the_row_releases_its_files(self):
+        profile = self.attach('eve', b'resume v1')
+        name = profile.resume.name
+        profile.user.delete()
+        self.assertEqual(self.refs(name), 0)
+        self.assertEqual(collect_blobs(grace_seconds=0), 1)
+        self.assertFalse(dedup_storage.exists(name))
+
+    def test_rows_sharing_a_file(self):
+        first = self.attach('eve', b'same receipt', field='payment_receipt')
+        second = self.attach('fay', b'same receipt', field='payment_receipt')
+        name = first.payment_receipt.name
+        self.assertEqual(second.payment_receipt.name, name)
+        self.assertEqual(self.refs(name), 2)
+
+        first.user.delete()
+        self.assertEqual(self.refs(name), 1)
+        self.assertEqual(collect_blobs(grace_seconds=0), 0)
+        self.assertTrue(dedup_storage.exists(name))
+
+    def test_drifted_count_is_repaired_not_collected(self):
+        first = self.attach('eve', b'same receipt')
+        self.attach('fay', b'same receipt')
+        name = first.resume.name
+        MediaBlob.objects.update(ref_count=0)  # e.g. a queryset update that skipped the signals
+
+        self.assertEqual(collect_blobs(grace_seconds=0), 0)
+        self.assertTrue(dedup_storage.exists(name))
+        self.assertEqual(self.refs(name), 2)
+
+
+class MemberImportTests(TestCase):
+    CSV = (
+        'username,email,first_name,member_status\n'
+        'gil,gil@example.com,Gil,\n'           # line 2: fine
+        'hana,not-an-email,Hana,\n'             # line 3: bad email
+        'ivan,ivan@example.com,,\n'             # line 4: no first name
+        'GIL,gil2@example.com,Gil,\n'           # line 5: username twice (any case)
+        'jo,GIL@example.com,Jo,\n'              # line 6: email twice
+        'kim,kim@example.com,Kim,CAPTAIN\n'     # line 7: unknown status
+        'amy,amy-new@example.com,Amy,member\n'  # line 8: taken in the database
+        'lee,lee@example.com,Lee,member\n'      # line 9: fine
+    )
+
+    def setUp(self):
+        User.objects.create_user('amy', 'amy@example.com', PASSWORD)
+
+    def run_import(self, **options):
+        return MemberImport(send_email=False, workers=1, **options).run(io.StringIO(self.CSV))
+
+    def test_rows_are_checked(self):
+        result = self.run_import()
+        self.assertEqual(result['processed'], 8)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([error['line'] for error in result['errors']], [3, 4, 5, 6, 7, 8])
+        self.assertIn('twice', result['errors'][2]['error'])
+        self.assertIn('twice', result['errors'][3]['error'])
+        lee = User.objects.get(username='lee')
+        self.assertEqual(lee.member_status, User.MemberStatus.MEMBER)
+        self.assertFalse(lee.has_usable_password())
+        self.assertTrue(User.objects.filter(username='gil', profile__isnull=False).exists())
+
+    def test_dry_run_creates_nothing(self):
+        result = self.run_import(dry_run=True)
+        self.assertEqual(result['valid'], 2)
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(result['error_count'], 6)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_missing_column_is_refused(self):
+        with self.assertRaises(ValueError):
+            MemberImport(send_email=False).run(io.StringIO('username,email\nmo,mo@example.com\n'))
+
+    @override_settings(MEMBER_IMPORT_STALE_SECONDS=60)
+    def test_poll_fails_a_job_that_stopped_reporting(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_superuser('boss', 'boss@example.com', PASSWORD))
+        job = MemberImportJob.objects.create(state=MemberImportJob.State.RUNNING)
+        url = f'/api/users/admin/import/members/{job.pk.hex}/'
+        self.assertEqual(client.get(url).json()['state'], 'running')
+
+        MemberImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        status = client.get(url).json()
+        self.assertEqual(status['state'], 'failed')
+        self.assertIn('stopped responding', status['error'])
+
+
+class UserDirectorySearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('boss', 'boss@example.com', PASSWORD))
+        for name in ('kai', 'kate', 'ken', 'kim', 'kurt'):
+            User.objects.create_user(name, f'{name}@example.com', PASSWORD)
+
+    def search(self, **params):
+        response = self.client.get('/api/users/admin/users/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_prefix_search(self):
+        data = self.search(q='ka')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([row['username'] for row in data['results']], ['kai', 'kate'])
+
+    def test_empty_search_counts_up_to_the_cap(self):
+        with mock.patch.object(CappedCountPaginator, 'COUNT_CAP', 3), CaptureQueriesContext(connection) as queries:
+            data = self.search(page_size=2)
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 2)
+        count_sql = next(query['sql'] for query in queries if 'COUNT(' in query['sql'])
+        self.assertIn('LIMIT 3', count_sql)
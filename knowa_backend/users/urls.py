@@ -7,6 +7,8 @@ from .views import (
     ApproveAsVolunteerView,
     RejectUserView,
     InterviewUserView,
+    InterviewAvailabilityView,
+    AutoScheduleInterviewsView,
     PasswordResetRequestView,
     PasswordResetConfirmView,
     LoginRequestTACView,
@@ -22,13 +24,21 @@ from .views import (
     NotificationListView,
     MarkNotificationReadView,
     UserSelectionListView,
+    AudienceListView,
+    UserDirectorySearchView,
+    AnnouncementView,
     AIChatbotView,
+    MemberExportView,
+    MemberImportView,
+    MemberImportStatusView,
     InterviewActionView,
     AdminInterviewHistoryView,
     UserOptionsView,
     CurrentUserView,
     SubmitFeedbackView,
     FeedbackListView,
+    LeaderboardView,
+    CacheStatsView,
 )
 
 urlpatterns = [
@@ -58,6 +68,8 @@ urlpatterns = [
     path('admin/approve-volunteer/<int:pk>/', ApproveAsVolunteerView.as_view(), name='approve-volunteer'),
     path('admin/reject/<int:pk>/', RejectUserView.as_view(), name='reject-user'),
     path('admin/interview/<int:pk>/', InterviewUserView.as_view(), name='interview-user'),
+    path('admin/interviews/availability/', InterviewAvailabilityView.as_view(), name='interview-availability'),
+    path('admin/interviews/auto-schedule/', AutoScheduleInterviewsView.as_view(), name='interview-auto-schedule'),
 
     # --- 2. ADD NEW URLs for payment confirmation ---
     path('admin/pending-payments/', PendingPaymentListView.as_view(), name='pending-payments'),
@@ -69,6 +81,12 @@ urlpatterns = [
     path('notifications/', NotificationListView.as_view(), name='notifications'),
     path('notifications/<int:pk>/read/', MarkNotificationReadView.as_view(), name='read-notification'),
     path('admin/user-selection-list/', UserSelectionListView.as_view()),
+    path('admin/audiences/', AudienceListView.as_view(), name='audience-list'),
+    path('admin/users/search/', UserDirectorySearchView.as_view(), name='user-directory-search'),
+    path('admin/export/members/', MemberExportView.as_view(), name='member-export'),
+    path('admin/import/members/', MemberImportView.as_view(), name='member-import'),
+    path('admin/import/members/<str:job_id>/', MemberImportStatusView.as_view(), name='member-import-status'),
+    path('admin/announcements/', AnnouncementView.as_view(), name='announcements'),
     path('chatbot/', AIChatbotView.as_view(), name='ai-chatbot'),
     path('admin/interview-result/<int:pk>/', InterviewActionView.as_view(), name='interview-result'),
     path('admin/interviews/history/', AdminInterviewHistoryView.as_view(), name='admin-interview-history'),
@@ -76,4 +94,6 @@ urlpatterns = [
     path('me/', CurrentUserView.as_view(), name='current-user'),
     path('feedback/', SubmitFeedbackView.as_view(), name='submit-feedback'),
     path('admin/feedback-list/', FeedbackListView.as_view(), name='admin-feedback-list'),
+    path('leaderboards/<str:board>/', LeaderboardView.as_view(), name='leaderboard'),
+    path('admin/cache-stats/', CacheStatsView.as_view(), name='admin-cache-stats'),
 ]
\ No newline at end of file
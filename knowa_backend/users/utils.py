@@ -1,5 +1,5 @@
 # users/utils.py
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail, send_mass_mail
 from django.conf import settings
 from .models import Notification, User
 import threading
@@ -33,4 +33,149 @@ def send_notification(user, title, message, type='INFO'):
 def notify_all_admins(title, message, type='WARNING'):
     admins = User.objects.filter(is_staff=True)
     for admin in admins:
-        send_notification(admin, title, message, type)
\ No newline at end of file
+        send_notification(admin, title, message, type)
+
+def queue_emails_bulk(datatuples):
+    """
+    Sends (subject, message, from_email, recipient_list) tuples on one background
+    thread over a single mail connection.
+    """
+    if not datatuples:
+        return
+    try:
+        email_thread = threading.Thread(
+            target=send_mass_mail,
+            args=(datatuples,),
+            kwargs={'fail_silently': True}
+        )
+        email_thread.start()
+    except Exception as e:
+        print(f"Failed to send emails: {e}")
+
+def _send_messages(messages):
+    try:
+        get_connection(fail_silently=True).send_messages(messages)
+    except Exception as e:
+        print(f"Failed to send emails: {e}")
+
+def queue_messages_bulk(messages):
+    """
+    Like queue_emails_bulk(), for prepared EmailMessage objects (HTML emails):
+    one background thread, one mail connection.
+    """
+    if not messages:
+        return
+    try:
+        email_thread = threading.Thread(target=_send_messages, args=(list(messages),))
+        email_thread.start()
+    except Exception as e:
+        print(f"Failed to send emails: {e}")
+
+def welcome_email(user, imported=False):
+    """
+    The HTML welcome email. `imported` accounts were created by an admin
+    (users/bulk_import.py) and may need to set a password first.
+    """
+    # --- A. SETUP LINKS ---
+    # REPLACE THIS URL with your actual logo link (from GitHub or Imgur)
+    logo_url = "https://github.com/AziidanNg/Application-Development-KNOWA/blob/main/knowa_backend/users/logo.png?raw=true" 
+    website_url = "https://knowa-app.online"
+
+    if imported:
+        intro = (
+            "An account has been created for you in our eco-community app.<br><br>"
+            "Log in with this username. If you were not given a password, use "
+            "<strong>Forgot Password?</strong> on the login screen to set one."
+        )
+        text = (
+            f"Hi {user.username},\n\nAn account has been created for you on KNOWA. "
+            "If you were not given a password, use 'Forgot Password?' on the login screen."
+        )
+    else:
+        intro = (
+            "Thank you for joining our eco-community! You can now log in to the app to start your journey.<br><br>"
+            "To become a verified Member, please go to your Profile and submit a "
+            "<strong>Membership Application</strong>."
+        )
+        text = f'Hi {user.username},\n\nThank you for registering. You can now log in to the app.'
+
+    # --- B. HTML DESIGN ---
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <body style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; background-color: #f4f6f8; margin: 0; padding: 40px;">
+        <div style="max-width: 500px; margin: 0 auto; background-color: #ffffff; padding: 40px; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.05); text-align: center;">
+
+            <img src="{logo_url}" alt="Knowa Logo" width="150" style="margin-bottom: 25px;">
+
+            <h1 style="color: #1a202c; font-size: 24px; margin-bottom: 10px; font-weight: 700;">Welcome to KNOWA!</h1>
+
+            <p style="color: #718096; font-size: 16px; margin-bottom: 30px; line-height: 1.6;">
+                Hi <strong>{user.username}</strong>,<br>
+                {intro}
+            </p>
+
+            <a href="{website_url}" style="background-color: #2f855a; color: #ffffff; text-decoration: none; padding: 12px 30px; border-radius: 6px; font-weight: bold; font-size: 16px; display: inline-block;">
+                Visit Website
+            </a>
+
+            <div style="margin-top: 40px; padding-top: 20px; border-top: 1px solid #edf2f7;">
+                <p style="color: #cbd5e0; font-size: 12px;">
+                    &copy; 2026 Knowa App. All rights reserved.
+                </p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+    message = EmailMultiAlternatives(
+        subject='Welcome to KNOWA!',
+        body=text,  # Plain text fallback for old devices
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+    )
+    message.attach_alternative(html_content, "text/html")
+    return message
+
+def send_notifications_bulk(entries, type='INFO'):
+    """
+    Sends many notifications at once.
+    `entries` is a list of (user, title, message) tuples. All in-app notifications
+    are written with a single bulk_create and the emails go out as one batch.
+    """
+    if not entries:
+        return
+
+    # 1. Create In-App Notifications (one INSERT)
+    Notification.objects.bulk_create([
+        Notification(recipient=user, title=title, message=message, notification_type=type)
+        for user, title, message in entries
+    ], batch_size=500)
+
+    # 2. Queue the emails in one batch
+    queue_emails_bulk([
+        (f"KNOWA Notification: {title}", message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        for user, title, message in entries
+        if user.email
+    ])
+
+def notify_user_ids(user_ids, title, message, type='INFO'):
+    """
+    Same message to many users, addressed by id.
+    Only (id, email) pairs are read, never full User rows.
+    """
+    recipients = list(User.objects.filter(pk__in=user_ids).values_list('id', 'email'))
+    if not recipients:
+        return
+
+    Notification.objects.bulk_create([
+        Notification(recipient_id=user_id, title=title, message=message, notification_type=type)
+        for user_id, _ in recipients
+    ], batch_size=500)
+
+    queue_emails_bulk([
+        (f"KNOWA Notification: {title}", message, settings.DEFAULT_FROM_EMAIL, [email])
+        for _, email in recipients
+        if email
+    ])
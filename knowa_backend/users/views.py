@@ -1,12 +1,19 @@
 # users/views.py
 
 # --- 1. STANDARD LIBRARIES & DJANGO IMPORTS ---
-from google import genai
+import os
+import re
+import tempfile
+import threading
 from django.conf import settings
 from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
+from django.core.paginator import Paginator
 from django.utils import timezone
-from django.db.models import Sum, Q
+from django.utils.functional import cached_property
+from django.db import connections, transaction
+from django.db.models import Sum, Q, Case, When, Value
 from datetime import timedelta
 
 # --- 2. REST FRAMEWORK IMPORTS ---
@@ -14,10 +21,28 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import MultiPartParser, FormParser
 
 # --- 3. LOCAL APP IMPORTS (Models & Serializers) ---
-from .models import User, UserProfile, Interview, Notification, UserFeedback
-from .utils import send_notification, notify_all_admins
+from .models import User, UserProfile, Interview, Notification, UserFeedback, OneTimeCode, MemberImportJob
+from .utils import (
+    send_notification, notify_all_admins, send_notifications_bulk, notify_user_ids,
+    queue_messages_bulk, welcome_email,
+)
+from .audiences import audience_summary, audience_user_ids, is_valid_audience
+from .bulk_import import MemberImport
+from . import leaderboards, profile_cache
+from .authentication import forget_auth_state, forget_user
+from chatbot.assistant import MissingAPIKey, answer_question
+from chatbot.memory import load_conversation, record_turn
+from chatbot.response_cache import response_cache
+from chatbot.throttling import ChatbotThrottle
+from knowa_server import caching
+from knowa_server.exports import export_response
+from .scheduling import (
+    WORK_DAY_MINUTES, load_busy_calendar, parse_duration_minutes, parse_local_datetime, plan_interviews,
+)
 from .serializers import (
     UserRegistrationSerializer, 
     AdminUserSerializer, 
@@ -31,6 +56,7 @@ from .serializers import (
 
 # --- 4. EXTERNAL APP IMPORTS (Events & Donations) ---
 from events.models import Event, Meeting
+from events.views import parse_time_window
 from donations.models import Donation, DonationStatus
 from chat.models import ChatRoom
 from chatbot.models import FAQ
@@ -46,65 +72,12 @@ class RegistrationView(APIView):
     def post(self, request, format=None):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
+            # Status is PUBLIC from creation: they can log in but are not a "Member" yet
             user = serializer.save()
 
-            # --- 1. SET STATUS TO PUBLIC ---
-            # This allows them to login, but they are not a "Member" yet.
-            user.member_status = User.MemberStatus.PUBLIC 
-            user.save()
-            # -------------------------------
-            
-            # --- 2. SEND PROFESSIONAL WELCOME EMAIL ---
-            try:
-                # --- A. SETUP LINKS ---
-                # REPLACE THIS URL with your actual logo link (from GitHub or Imgur)
-                logo_url = "https://github.com/AziidanNg/Application-Development-KNOWA/blob/main/knowa_backend/users/logo.png?raw=true" 
-                website_url = "https://knowa-app.online"
-                
-                # --- B. HTML DESIGN ---
-                html_content = f"""
-                <!DOCTYPE html>
-                <html>
-                <body style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; background-color: #f4f6f8; margin: 0; padding: 40px;">
-                    <div style="max-width: 500px; margin: 0 auto; background-color: #ffffff; padding: 40px; border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.05); text-align: center;">
-                        
-                        <img src="{logo_url}" alt="Knowa Logo" width="150" style="margin-bottom: 25px;">
-                        
-                        <h1 style="color: #1a202c; font-size: 24px; margin-bottom: 10px; font-weight: 700;">Welcome to KNOWA!</h1>
-                        
-                        <p style="color: #718096; font-size: 16px; margin-bottom: 30px; line-height: 1.6;">
-                            Hi <strong>{user.username}</strong>,<br>
-                            Thank you for joining our eco-community! You can now log in to the app to start your journey.
-                            <br><br>
-                            To become a verified Member, please go to your Profile and submit a <strong>Membership Application</strong>.
-                        </p>
-                        
-                        <a href="{website_url}" style="background-color: #2f855a; color: #ffffff; text-decoration: none; padding: 12px 30px; border-radius: 6px; font-weight: bold; font-size: 16px; display: inline-block;">
-                            Visit Website
-                        </a>
-                        
-                        <div style="margin-top: 40px; padding-top: 20px; border-top: 1px solid #edf2f7;">
-                            <p style="color: #cbd5e0; font-size: 12px;">
-                                &copy; 2026 Knowa App. All rights reserved.
-                            </p>
-                        </div>
-                    </div>
-                </body>
-                </html>
-                """
-
-                # --- C. SEND MAIL ---
-                send_mail(
-                    subject='Welcome to KNOWA!',
-                    # Plain text fallback for old devices
-                    message=f'Hi {user.username},\n\nThank you for registering. You can now log in to the app.',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    html_message=html_content # <--- This enables the design
-                )
-            except Exception as e:
-                print(f"Error sending welcome email: {e}")
-            # -----------------------------
+            # --- SEND PROFESSIONAL WELCOME EMAIL (users/utils.py) ---
+            # Sent on a background thread so sign-up doesn't wait on the mail provider
+            queue_messages_bulk([welcome_email(user)])
 
             return Response({
                 'message': 'Registration successful. Please login.',
@@ -124,6 +97,11 @@ class LoginRequestTACView(APIView):
 
         if user is not None:
             tac = user.generate_tac()
+            if tac is None:
+                return Response(
+                    {'error': 'Too many code requests. Please wait a few minutes and try again.'},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                )
             
             # --- PROFESSIONAL HTML EMAIL DESIGN ---
             # 1. SETUP LINKS
@@ -191,7 +169,8 @@ class LoginVerifyTACView(APIView):
         tac_code = request.data.get('tac_code')
 
         try:
-            user = User.objects.get(username=username)
+            # The token claims read the profile (receipt, rejection reason)
+            user = User.objects.select_related('profile').get(username=username)
         except User.DoesNotExist:
             return Response({'error': 'Invalid user or TAC code.'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -210,7 +189,10 @@ class PasswordResetRequestView(APIView):
         email = request.data.get('email')
         try:
             user = User.objects.get(email=email)
-            tac = user.generate_tac()
+            tac = user.generate_tac(OneTimeCode.Purpose.PASSWORD_RESET)
+            if tac is None:
+                # Asked again too soon, or locked: no new code, and the same reply
+                return Response({'status': 'Password reset email sent.'}, status=status.HTTP_200_OK)
             
             # --- PROFESSIONAL HTML EMAIL DESIGN ---
             # 1. SETUP LINKS
@@ -284,9 +266,11 @@ class PasswordResetConfirmView(APIView):
         except User.DoesNotExist:
             return Response({'error': 'Invalid user or TAC code.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if user.is_tac_valid(tac_code):
+        if user.is_tac_valid(tac_code, OneTimeCode.Purpose.PASSWORD_RESET):
             user.set_password(password)
+            user.revoke_tokens()  # log out every device still holding an old token
             user.save()
+            forget_user(user.pk)
             return Response({'status': 'Password reset successful.'}, status=status.HTTP_200_OK)
         return Response({'error': 'Invalid or expired TAC code.'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -352,15 +336,16 @@ class InterviewUserView(APIView):
     def post(self, request, pk, format=None):
         try:
             user = User.objects.get(pk=pk)
-            
-            # 1. Update Status
-            user.member_status = User.MemberStatus.INTERVIEW
-            user.save()
 
-            # 2. Get Interview Details
+            # 1. Get Interview Details
             date_time = request.data.get('date_time')
             meeting_link = request.data.get('meeting_link', '')
             interviewer_id = request.data.get('interviewer_id') 
+            force = str(request.data.get('force', '')).lower() in ('1', 'true', 'yes')
+            try:
+                duration_minutes = parse_duration_minutes(request.data.get('duration_minutes'))
+            except ValueError:
+                return Response({'error': f'duration_minutes must be a whole number from 1 to {WORK_DAY_MINUTES}.'}, status=status.HTTP_400_BAD_REQUEST)
             
             interviewer = None
             if interviewer_id:
@@ -369,7 +354,42 @@ class InterviewUserView(APIView):
                 except User.DoesNotExist:
                     pass
 
-            # 3. Create/Update Interview Record
+            if date_time:
+                date_time = parse_local_datetime(date_time)
+                if date_time is None:
+                    return Response({'error': 'Invalid date_time.'}, status=status.HTTP_400_BAD_REQUEST)
+
+                # 2. Conflict Check (interviewer + applicant), unless the admin overrides it
+                if not force:
+                    duration = timedelta(minutes=duration_minutes)
+                    people = [user.id] + ([interviewer.id] if interviewer else [])
+                    # Rescheduling: ignore the applicant's own current interview
+                    existing = Interview.objects.filter(applicant=user).values_list('id', flat=True)
+                    calendar = load_busy_calendar(
+                        people, date_time, date_time + duration, exclude_interview_ids=list(existing)
+                    )
+                    hit = calendar.find_conflict(people, date_time, date_time + duration)
+                    if hit:
+                        busy_user_id, (busy_start, busy_end) = hit
+                        # Suggest the next slot where everyone is free (within two weeks)
+                        horizon = date_time + timedelta(days=14)
+                        suggestion_calendar = load_busy_calendar(
+                            people, date_time, horizon, exclude_interview_ids=list(existing)
+                        )
+                        suggestion = suggestion_calendar.next_free_slot(people, date_time, duration, horizon)
+                        return Response({
+                            'error': 'Schedule conflict.',
+                            'conflict_user_id': busy_user_id,
+                            'busy_from': busy_start,
+                            'busy_until': busy_end,
+                            'next_available': suggestion,
+                        }, status=status.HTTP_409_CONFLICT)
+
+            # 3. Update Status
+            user.member_status = User.MemberStatus.INTERVIEW
+            user.save()
+
+            # 4. Create/Update Interview Record
             if date_time:
                 interview_instance, created = Interview.objects.update_or_create(
                     applicant=user,
@@ -377,6 +397,7 @@ class InterviewUserView(APIView):
                         'scheduler': request.user,
                         'interviewer': interviewer, # The staff member chosen
                         'date_time': date_time,
+                        'duration_minutes': duration_minutes,
                         'meeting_link': meeting_link,
                         'status': 'SCHEDULED'
                     }
@@ -414,6 +435,158 @@ class InterviewUserView(APIView):
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+class InterviewAvailabilityView(APIView):
+    """
+    GET ?interviewer_id=..&after=..&duration_minutes=..
+    Returns the next free slot for an interviewer (optionally together with ?applicant_id=).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        interviewer_id = request.query_params.get('interviewer_id')
+        if not interviewer_id:
+            return Response({'error': 'interviewer_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        after = timezone.now()
+        if request.query_params.get('after'):
+            after = parse_local_datetime(request.query_params['after'])
+            if after is None:
+                return Response({'error': 'Invalid after.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            duration = timedelta(minutes=parse_duration_minutes(request.query_params.get('duration_minutes')))
+        except ValueError:
+            return Response({'error': f'duration_minutes must be a whole number from 1 to {WORK_DAY_MINUTES}.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            people = [int(interviewer_id)]
+            if request.query_params.get('applicant_id'):
+                people.append(int(request.query_params['applicant_id']))
+        except ValueError:
+            return Response({'error': 'Invalid parameters.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        horizon = after + timedelta(days=14)
+        calendar = load_busy_calendar(people, after, horizon)
+        slot = calendar.next_free_slot(people, after, duration, horizon)
+        return Response({
+            'next_available': slot,
+            'end_time': slot + duration if slot else None,
+        }, status=status.HTTP_200_OK)
+
+class AutoScheduleInterviewsView(APIView):
+    """
+    Bulk-assigns pending applicants to the interviewers' free slots.
+
+    POST body (all optional):
+      applicant_ids    - defaults to every PENDING applicant without an interview, oldest application first
+      interviewer_ids  - defaults to all staff
+      start / end      - scheduling window (defaults: tomorrow 9am, +5 days)
+      duration_minutes - defaults to 30
+      meeting_link     - shared link for every interview
+      dry_run          - return the plan without saving it
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        # --- 1. READ OPTIONS ---
+        tomorrow = (timezone.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        start = parse_local_datetime(request.data.get('start')) if request.data.get('start') else tomorrow
+        end = parse_local_datetime(request.data.get('end')) if request.data.get('end') else None
+        if start is None or (request.data.get('end') and end is None):
+            return Response({'error': 'Invalid start or end.'}, status=status.HTTP_400_BAD_REQUEST)
+        end = end or start + timedelta(days=5)
+        meeting_link = request.data.get('meeting_link', '')
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            duration_minutes = parse_duration_minutes(request.data.get('duration_minutes'))
+        except ValueError:
+            return Response({'error': f'duration_minutes must be a whole number from 1 to {WORK_DAY_MINUTES}.'}, status=status.HTTP_400_BAD_REQUEST)
+        duration = timedelta(minutes=duration_minutes)
+
+        if end <= start:
+            return Response({'error': 'end must be after start.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        applicants = User.objects.filter(
+            member_status=User.MemberStatus.PENDING,
+            interview__isnull=True,
+        )
+        if request.data.get('applicant_ids'):
+            applicants = User.objects.filter(pk__in=request.data.get('applicant_ids'), interview__isnull=True)
+        applicants = list(applicants.order_by('profile__application_date', 'date_joined'))
+
+        interviewers = User.objects.filter(is_staff=True, is_active=True)
+        if request.data.get('interviewer_ids'):
+            interviewers = User.objects.filter(pk__in=request.data.get('interviewer_ids'))
+        interviewer_ids = list(interviewers.values_list('id', flat=True))
+
+        if not applicants or not interviewer_ids:
+            return Response({'scheduled': [], 'unassigned': [a.id for a in applicants]}, status=status.HTTP_200_OK)
+
+        # --- 2. PLAN ---
+        assignments, unassigned = plan_interviews(
+            [a.id for a in applicants], interviewer_ids, start, end, duration
+        )
+        plan = [
+            {'applicant_id': applicant_id, 'interviewer_id': interviewer_id, 'date_time': slot}
+            for applicant_id, interviewer_id, slot in assignments
+        ]
+        if dry_run or not assignments:
+            return Response({'scheduled': plan, 'unassigned': unassigned, 'dry_run': dry_run}, status=status.HTTP_200_OK)
+
+        # --- 3. SAVE IN BULK ---
+        applicants_by_id = {a.id: a for a in applicants}
+        assigned_ids = [applicant_id for applicant_id, _, _ in assignments]
+        with transaction.atomic():
+            Interview.objects.bulk_create([
+                Interview(
+                    applicant_id=applicant_id,
+                    scheduler=request.user,
+                    interviewer_id=interviewer_id,
+                    date_time=slot,
+                    duration_minutes=duration_minutes,
+                    meeting_link=meeting_link,
+                    status='SCHEDULED',
+                )
+                for applicant_id, interviewer_id, slot in assignments
+            ])
+            User.objects.filter(pk__in=assigned_ids).update(member_status=User.MemberStatus.INTERVIEW)
+            # The auth stamps carry member_status (users/authentication.py)
+            forget_auth_state(assigned_ids)
+            profile_cache.bump_users(assigned_ids)
+
+            # Re-read ids (bulk_create does not return primary keys on MySQL)
+            interview_ids = dict(
+                Interview.objects.filter(applicant_id__in=assigned_ids).values_list('applicant_id', 'id')
+            )
+            ChatRoom.objects.bulk_create([
+                ChatRoom(
+                    type=ChatRoom.RoomType.INTERVIEW,
+                    interview_id=interview_ids[applicant_id],
+                    name=f"Interview: {applicants_by_id[applicant_id].first_name} - SCHEDULED",
+                )
+                for applicant_id in assigned_ids
+            ])
+            room_ids = dict(
+                ChatRoom.objects.filter(interview_id__in=interview_ids.values()).values_list('interview_id', 'id')
+            )
+            Membership = ChatRoom.participants.through
+            memberships = []
+            for applicant_id, interviewer_id, slot in assignments:
+                room_id = room_ids[interview_ids[applicant_id]]
+                for member_id in {applicant_id, interviewer_id, request.user.id}:
+                    memberships.append(Membership(chatroom_id=room_id, user_id=member_id))
+            Membership.objects.bulk_create(memberships, ignore_conflicts=True)
+
+        # --- 4. NOTIFY APPLICANTS (one batch) ---
+        send_notifications_bulk([
+            (
+                applicants_by_id[applicant_id],
+                "Interview Scheduled",
+                f"Your membership interview is scheduled for {slot.strftime('%b %d, %I:%M %p')}.",
+            )
+            for applicant_id, _, slot in assignments
+        ], "INFO")
+
+        return Response({'scheduled': plan, 'unassigned': unassigned}, status=status.HTTP_201_CREATED)
+
 class StaffListView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
@@ -590,11 +763,18 @@ class MyScheduleView(APIView):
         schedule = []
         user = request.user
 
+        # Optional calendar window: ?from=...&to=... only returns items overlapping [from, to)
+        window_start, window_end = parse_time_window(request.query_params)
+
         # 1. Interviews
         interviews = Interview.objects.filter(
             Q(applicant=user) | Q(scheduler=user) | Q(interviewer=user),
             status='SCHEDULED'
-        )
+        ).select_related('applicant', 'scheduler', 'interviewer')
+        if window_start:
+            interviews = interviews.filter(date_time__gte=window_start)
+        if window_end:
+            interviews = interviews.filter(date_time__lt=window_end)
         for i in interviews:
             title = "Interview"
             if user == i.applicant:
@@ -619,9 +799,8 @@ class MyScheduleView(APIView):
         if user.is_staff:
             events = Event.objects.all()
         else:
-            events = Event.objects.filter(
-                Q(participants=user) | Q(crew=user) | Q(organizer=user)
-            ).distinct()
+            events = Event.objects.for_user(user)
+        events = events.overlapping(window_start, window_end)
 
         for e in events:
             schedule.append({
@@ -636,7 +815,7 @@ class MyScheduleView(APIView):
             })
 
         # 3. Meetings
-        meetings = Meeting.objects.filter(Q(participants=user) | Q(organizer=user)).distinct()
+        meetings = Meeting.objects.for_user(user).overlapping(window_start, window_end)
         for m in meetings:
             loc = m.location if not m.is_online else "Online"
             link = m.location if m.is_online else ""
@@ -775,28 +954,149 @@ class UserSelectionListView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        admins = User.objects.filter(is_staff=True)
-        members = User.objects.filter(member_status=User.MemberStatus.MEMBER)
-        volunteers = User.objects.filter(member_status=User.MemberStatus.VOLUNTEER)
+        # One query; the role is worked out in SQL (admins first, then members, then volunteers)
+        rows = User.objects.filter(
+            Q(is_staff=True) | Q(member_status__in=[User.MemberStatus.MEMBER, User.MemberStatus.VOLUNTEER])
+        ).annotate(
+            role=Case(
+                When(is_staff=True, then=Value('ADMIN')),
+                When(member_status=User.MemberStatus.MEMBER, then=Value('MEMBER')),
+                default=Value('VOLUNTEER'),
+            ),
+            role_order=Case(
+                When(is_staff=True, then=Value(0)),
+                When(member_status=User.MemberStatus.MEMBER, then=Value(1)),
+                default=Value(2),
+            ),
+        ).order_by('role_order', 'id').values('id', 'username', 'first_name', 'last_name', 'email', 'role')
+
+        def display_name(row):
+            full_name = f"{row['first_name']} {row['last_name']}".strip()
+            return full_name or row['first_name'].strip() or row['username']
+
+        results = [
+            {'id': row['id'], 'name': display_name(row), 'email': row['email'], 'role': row['role']}
+            for row in rows
+        ]
+        return Response(results, status=status.HTTP_200_OK)
 
-        def format_user(u, role):
-            name = u.get_full_name().strip() or u.first_name.strip() or u.username
-            return {'id': u.id, 'name': name, 'email': u.email, 'role': role}
+class CappedCountPaginator(Paginator):
+    """
+    Counts at most COUNT_CAP rows: COUNT(*) over a LIMITed subquery, so an empty
+    search doesn't count the whole users table for every page.
+    """
+    COUNT_CAP = 1000
 
-        results = []
-        for u in admins:
-            results.append(format_user(u, 'ADMIN'))
-        
-        admin_ids = [a.id for a in admins]
-        for u in members:
-            if u.id not in admin_ids:
-                results.append(format_user(u, 'MEMBER'))
+    @cached_property
+    def count(self):
+        return self.object_list[:self.COUNT_CAP].count()
 
-        for u in volunteers:
-             if u.id not in admin_ids:
-                results.append(format_user(u, 'VOLUNTEER'))
+class UserDirectoryPagination(PageNumberPagination):
+    django_paginator_class = CappedCountPaginator
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
 
-        return Response(results, status=status.HTTP_200_OK)
+class UserDirectorySearchView(APIView):
+    """
+    Typeahead search for picking participants.
+    GET ?q=<prefix>&role=ADMIN|MEMBER|VOLUNTEER|PUBLIC|PENDING&page=N
+
+    Matches the prefix against username, first name and email (all indexed),
+    returns one page at a time, and caches hot prefixes for a few seconds.
+    'count' stops at CappedCountPaginator.COUNT_CAP; past that, type more.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = UserDirectoryPagination
+    cache_timeout = 30  # seconds
+
+    ROLE_FILTERS = {
+        'ADMIN': Q(is_staff=True),
+        'MEMBER': Q(member_status=User.MemberStatus.MEMBER, is_staff=False),
+        'VOLUNTEER': Q(member_status=User.MemberStatus.VOLUNTEER, is_staff=False),
+        'PUBLIC': Q(member_status=User.MemberStatus.PUBLIC, is_staff=False),
+        'PENDING': Q(member_status=User.MemberStatus.PENDING, is_staff=False),
+    }
+
+    def get(self, request):
+        prefix = request.query_params.get('q', '').strip().lower()[:50]
+        role = request.query_params.get('role', '').upper()
+        if role and role not in self.ROLE_FILTERS:
+            return Response({'error': 'Unknown role.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.pagination_class()
+        cache_key = caching.versioned_key(
+            'user-search', role, prefix,
+            request.query_params.get(paginator.page_query_param, '1'),
+            request.query_params.get(paginator.page_size_query_param, ''),
+        )
+        cached = caching.cache_get('user-search', cache_key)
+        if cached is not None:
+            return Response(cached, status=status.HTTP_200_OK)
+
+        users = User.objects.filter(is_active=True)
+        if role:
+            users = users.filter(self.ROLE_FILTERS[role])
+        if prefix:
+            users = users.filter(
+                Q(username__istartswith=prefix) |
+                Q(first_name__istartswith=prefix) |
+                Q(email__istartswith=prefix)
+            )
+        users = users.order_by('username').values(
+            'id', 'username', 'first_name', 'email', 'is_staff', 'member_status'
+        )
+
+        page = paginator.paginate_queryset(users, request, view=self)
+        results = [
+            {
+                'id': row['id'],
+                'name': row['first_name'] or row['username'],
+                'username': row['username'],
+                'email': row['email'],
+                'role': 'ADMIN' if row['is_staff'] else row['member_status'],
+            }
+            for row in page
+        ]
+        data = paginator.get_paginated_response(results).data
+        caching.cache_set('user-search', cache_key, data, self.cache_timeout)
+        return Response(data, status=status.HTTP_200_OK)
+
+class AudienceListView(APIView):
+    """
+    Lists the group audiences (all members, all volunteers, ...) with their sizes,
+    so clients can target a whole group instead of sending every user id.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(audience_summary(), status=status.HTTP_200_OK)
+
+class AnnouncementView(APIView):
+    """
+    POST {"title": ..., "message": ..., "audiences": ["MEMBER", "EVENT_CREW:3"], "participants": [ids]}
+    Sends an announcement notification to everyone in the selected audiences.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        title = request.data.get('title')
+        message = request.data.get('message')
+        audiences = request.data.get('audiences', [])
+        participant_ids = request.data.get('participants', [])
+
+        if not title or not message:
+            return Response({'error': 'Title and message are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not audiences and not participant_ids:
+            return Response({'error': 'Select at least one audience.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        invalid = [key for key in audiences if not is_valid_audience(key)]
+        if invalid:
+            return Response({'error': f"Unknown audience(s): {', '.join(invalid)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The audience stays a subquery; recipients are read as (id, email) pairs only
+        notify_user_ids(audience_user_ids(audiences, participant_ids), title, message, "INFO")
+        return Response({'status': 'Announcement sent.'}, status=status.HTTP_200_OK)
 
 # ==========================================
 # AI CHATBOT VIEW
@@ -804,9 +1104,14 @@ class UserSelectionListView(APIView):
 
 class AIChatbotView(APIView):
     permission_classes = [permissions.AllowAny]
+    # Per-IP / per-user token buckets (chatbot/throttling.py)
+    throttle_classes = [ChatbotThrottle]
 
     def post(self, request):
         user_message = request.data.get('message')
+        # Optional: "new" to start a conversation, then the 'session' returned by
+        # the last reply to continue it. Without one nothing is saved.
+        session_key = request.data.get('session')
 
         if not user_message:
             return Response({'error': 'Message is required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -815,63 +1120,126 @@ class AIChatbotView(APIView):
             # DEBUG: Print that we started
             print(f"DEBUG: Processing chatbot request: {user_message}")
 
-            # --- 1. FETCH REAL DATA ---
-            upcoming_events = Event.objects.filter(
-                status='PUBLISHED',
-                start_time__gte=timezone.now()
-            ).order_by('start_time')[:3]
-
-            events_context = "UPCOMING EVENTS:\n"
-            if upcoming_events.exists():
-                for event in upcoming_events:
-                    date_str = event.start_time.strftime('%b %d, %I:%M %p')
-                    events_context += f"- {event.title} on {date_str} ({event.location})\n"
-            else:
-                events_context += "No upcoming events found.\n"
-
-            # --- 2. DEFINE MANUAL ---
-            app_manual = (
-                "APP INSTRUCTIONS (KNOWA MANUAL):\n"
-                "1. REGISTRATION: Click 'Sign Up' on the Login screen.\n"
-                "2. MEMBERSHIP: Status starts as 'Pending'. Once approved by Admin, pay fees to become a 'Member'.\n"
-                "3. DONATIONS: Use the blue 'Donate' button on the Dashboard.\n"
-                "4. EVENTS: Check the 'Events' tab. Online events have Zoom/Meet links.\n"
-                "5. MEETINGS: Admins create meetings; see them in 'Calendar'.\n"
-                "6. PASSWORD: Use 'Forgot Password?' on the login screen to get a TAC code.\n"
-            )
-
-            # --- 3. CONFIGURE NEW CLIENT ---
-            api_key = getattr(settings, 'GEMINI_API_KEY', None)
-            if not api_key:
-                print("CRITICAL: Missing API Key in settings")
-                return Response({'error': 'Missing API Key'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # --- NEW SDK SYNTAX ---
-            client = genai.Client(api_key=api_key)
-
-            full_prompt = (
-                "You are the friendly AI support for KNOWA app. "
-                "Answer using the manual and event list below. "
-                "If not sure, say 'Contact admin@knowa.org'.\n\n"
-                f"{app_manual}\n"
-                "---------------------\n"
-                f"{events_context}\n"
-                "---------------------\n"
-                f"USER QUESTION: {user_message}"
-            )
-
-            # Generate Content using the new method
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=full_prompt
+            # FAQ lookup first; Gemini only when the FAQ doesn't cover it (chatbot/assistant.py)
+            session, history = load_conversation(session_key, request.user)
+            result = answer_question(user_message, request.user, history=history)
+            session = record_turn(
+                session, request.user, user_message, result['reply'], result['source'], start=bool(session_key)
             )
-            # Access text via response.text
-            return Response({'reply': response.text}, status=status.HTTP_200_OK)
+            return Response({
+                'reply': result['reply'],
+                'source': result['source'],
+                'session': str(session.key) if session else None,
+            }, status=status.HTTP_200_OK)
 
+        except MissingAPIKey:
+            print("CRITICAL: Missing API Key in settings")
+            return Response({'error': 'Missing API Key'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         except Exception as e:
             print(f"CRITICAL CHATBOT ERROR: {str(e)}")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class MemberExportView(APIView):
+    """
+    GET /api/users/admin/export/members/?status=MEMBER&type=csv|xlsx
+    Streams the user directory (with activity counters) as a download.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    COLUMNS = [
+        ('User ID', 'id'),
+        ('Username', 'username'),
+        ('First Name', 'first_name'),
+        ('Last Name', 'last_name'),
+        ('Email', 'email'),
+        ('Phone', 'phone'),
+        ('Status', 'member_status'),
+        ('Staff', 'is_staff'),
+        ('Joined', 'date_joined'),
+        ('Application Type', 'profile__application_type'),
+        ('Events Joined', 'profile__total_events_joined'),
+        ('Donations Made', 'profile__total_donations_made'),
+    ]
+
+    def get(self, request):
+        users = User.objects.all()
+        filename = 'members'
+
+        member_status = request.query_params.get('status')
+        if member_status:
+            if member_status not in User.MemberStatus.values:
+                return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+            users = users.filter(member_status=member_status)
+            filename += f"-{member_status.lower()}"
+
+        return export_response(request, users, self.COLUMNS, filename)
+
+IMPORT_JOB_TTL = 24 * 60 * 60  # seconds an import's status stays readable (MemberImportJob rows)
+
+class MemberImportView(APIView):
+    """
+    POST /api/users/admin/import/members/  (multipart: file, dry_run, send_email)
+    Starts a CSV member import (users/bulk_import.py) in the background and
+    returns its job id. GET .../<job_id>/ reports progress and errors.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'A CSV file is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The upload's temp file goes away with the request, so keep a copy
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as copy:
+            for chunk in upload.chunks():
+                copy.write(chunk)
+
+        options = {
+            'dry_run': str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes'),
+            'send_email': str(request.data.get('send_email', 'true')).lower() in ('1', 'true', 'yes'),
+        }
+        # Old jobs are cleared out as new ones start
+        MemberImportJob.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=IMPORT_JOB_TTL)).delete()
+        job = MemberImportJob.objects.create(started_by=request.user)
+        threading.Thread(target=run_member_import, args=(job.pk, copy.name, options), daemon=True).start()
+        return Response({'job': job.pk.hex}, status=status.HTTP_202_ACCEPTED)
+
+class MemberImportStatusView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, job_id):
+        try:
+            job = MemberImportJob.objects.get(pk=job_id)
+        except (MemberImportJob.DoesNotExist, ValidationError):
+            return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+        job.fail_if_stale(settings.MEMBER_IMPORT_STALE_SECONDS)
+        return Response(job.as_status(), status=status.HTTP_200_OK)
+
+def run_member_import(job_id, path, options):
+    """Background thread body for MemberImportView."""
+    jobs = MemberImportJob.objects.filter(pk=job_id)
+    # update() skips auto_now; updated_at is what the status poll checks for a dead job
+    try:
+        jobs.update(state=MemberImportJob.State.RUNNING, updated_at=timezone.now())
+        job = MemberImport(
+            # A few processes, not one per CPU: this runs next to the web workers
+            workers=settings.MEMBER_IMPORT_WORKERS,
+            progress=lambda result: jobs.update(
+                state=MemberImportJob.State.RUNNING, result=result, updated_at=timezone.now()
+            ),
+            **options,
+        )
+        with open(path, newline='', encoding='utf-8-sig') as csv_file:
+            result = job.run(csv_file)
+        jobs.update(state=MemberImportJob.State.DONE, result=result, updated_at=timezone.now())
+    except Exception as e:
+        print(f"Member import {job_id} failed: {e}")
+        jobs.update(state=MemberImportJob.State.FAILED, error=str(e), updated_at=timezone.now())
+    finally:
+        os.remove(path)
+        connections.close_all()
+
 class UserOptionsView(APIView):
     """
     Returns a list of users (Admins & Members) that can be added to a chat.
@@ -880,16 +1248,19 @@ class UserOptionsView(APIView):
 
     def get(self, request):
         # Fetch Staff and Approved Members, excluding the current user
-        users = User.objects.filter(
+        rows = User.objects.filter(
             Q(is_staff=True) | Q(member_status=User.MemberStatus.MEMBER)
-        ).exclude(id=request.user.id)
-
-        data = []
-        for u in users:
-            role = "Admin" if u.is_staff else "Member"
-            name = u.first_name if u.first_name else u.username
-            data.append({'id': u.id, 'name': name, 'role': role, 'username': u.username})
-            
+        ).exclude(id=request.user.id).values('id', 'username', 'first_name', 'is_staff')
+
+        data = [
+            {
+                'id': row['id'],
+                'name': row['first_name'] or row['username'],
+                'role': "Admin" if row['is_staff'] else "Member",
+                'username': row['username'],
+            }
+            for row in rows
+        ]
         return Response(data, status=status.HTTP_200_OK)
 
 class CurrentUserView(APIView):
@@ -899,8 +1270,60 @@ class CurrentUserView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = UserSerializer(request.user, context={'request': request})
-        return Response(serializer.data)
+        def build():
+            # Profile + badges in two queries, no matter how many badges
+            user = User.objects.select_related('profile').prefetch_related(
+                'profile__earned_badges'
+            ).get(pk=request.user.pk)
+            return UserSerializer(user, context={'request': request}).data
+
+        # Cached per user; bumped whenever the profile, status or badges change
+        data = profile_cache.get_or_build(request.user.pk, request.get_host(), build)
+        return Response(data)
+
+class LeaderboardView(APIView):
+    """
+    GET /api/users/leaderboards/<board>/?period=YYYY-MM|ALL&limit=10
+    board: volunteers | donors. Defaults to the current month.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, board):
+        board = board.upper()
+        if board not in leaderboards.Board.values:
+            return Response({'error': 'Unknown leaderboard.'}, status=status.HTTP_404_NOT_FOUND)
+
+        period = request.query_params.get('period') or leaderboards.period_key(timezone.now())
+        if period != leaderboards.ALL_TIME and not re.fullmatch(r'\d{4}-\d{2}', period):
+            return Response({'error': "period must be 'YYYY-MM' or 'ALL'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), leaderboards.MAX_K))
+        except ValueError:
+            limit = 10
+
+        my_rank, my_score, rank_capped = leaderboards.rank_of(board, period, request.user.id)
+        return Response({
+            'board': board,
+            'period': period,
+            'top': leaderboards.top(board, period, limit),
+            # rank_capped: the rank is only known to be below leaderboards.RANK_SCAN_LIMIT
+            'me': {'rank': my_rank, 'score': my_score, 'rank_capped': rank_capped},
+        }, status=status.HTTP_200_OK)
+
+class CacheStatsView(APIView):
+    """
+    GET /api/users/admin/cache-stats/
+    Hit/miss counters per cache namespace, plus the chatbot reply cache
+    (hit rate, LLM latency and tokens saved), for this worker process.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'backend': settings.CACHES['default']['BACKEND'],
+            'namespaces': caching.cache_stats(),
+            'chatbot_responses': response_cache.stats(),
+        }, status=status.HTTP_200_OK)
 
 #==FEEDBACK==#
 class SubmitFeedbackView(generics.CreateAPIView):